@@ -0,0 +1,70 @@
+'''
+Compares the basic burn-in overlay against the previous full-frame compositing approach.
+
+Usage: python -m benchmarks.bench_burn_in_basic [megapixels]
+
+Each variant runs in a fresh process so peak RSS reflects only that variant.
+'''
+
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from run.photos import process_image_basic
+
+
+def full_frame_overlay(in_path, out_path, display_text) -> None:
+    # The approach process_image_basic used before region-only compositing
+    img = ImageOps.exif_transpose(Image.open(in_path)).convert("RGBA")
+    txt_overlay = Image.new("RGBA", img.size, (255,255,255,0))
+    draw = ImageDraw.Draw(txt_overlay)
+    font_size = int(min(img.size) * 0.045)
+    try: font = ImageFont.truetype("arial.ttf", font_size)
+    except: font = ImageFont.load_default()
+    text_bbox = draw.textbbox((0,0), display_text, font=font)
+    pos = (img.width - (text_bbox[2]-text_bbox[0]) - int(min(img.size)*0.01), img.height - (text_bbox[3]-text_bbox[1]) - int(min(img.size)*0.01))
+    for dx in range(-1,2):
+        for dy in range(-1,2):
+            if (dx or dy) and abs(dx)+abs(dy)<=2:
+                draw.text((pos[0]+dx,pos[1]+dy), display_text, font=font, fill=(0,0,0,255))
+    draw.text(pos, display_text, font=font, fill=(255,255,255,160))
+    Image.alpha_composite(img, txt_overlay).convert("RGB").save(out_path)
+
+
+def run_variant(name, in_path, out_path, queue) -> None:
+    start = time.perf_counter()
+    if name == "full-frame":
+        full_frame_overlay(in_path, out_path, "1st January 2024 | Benchmark")
+    else:
+        process_image_basic(in_path, out_path, "Benchmark", "20240101")
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main() -> None:
+    megapixels = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    width = int((megapixels * 1_000_000 * 1.5) ** 0.5)
+    height = int(width / 1.5)
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        in_path = Path(tmp) / "bench.jpg"
+        Image.new("RGB", (width, height), (90, 120, 150)).save(in_path, quality=90)
+        print(f"Source: {width}x{height} ({width * height / 1e6:.1f} MP)")
+        for name in ("full-frame", "region-only"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_variant, args=(name, in_path, Path(tmp) / f"{name}.jpg", queue))
+            proc.start()
+            elapsed, max_rss = queue.get()
+            proc.join()
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+            print(f"  {name:<12} {elapsed:6.2f}s  peak RSS {max_rss_mb:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
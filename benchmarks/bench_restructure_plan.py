@@ -0,0 +1,85 @@
+'''
+Times restructure planning on synthetic file names, and the empty-folder prune on a synthetic tree.
+
+Usage: python -m benchmarks.bench_restructure_plan [files]
+
+Planning (parsing names, grouping them into decade/year/event-or-month folders and expanding the destinations)
+works on names alone, so it runs on 1,000,000 names by default without touching the disk. The prune runs on a
+temporary tree of PRUNE_FOLDERS folders, half of them holding media, and is compared with the previous
+approach of walking every folder's subtree.
+'''
+
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from run.restructure import is_restructured, plan_restructure, prune_empty_folders, restructure_info
+from run.walker import walk_media
+
+
+SYNTHETIC_FILES = 1_000_000
+PRUNE_FOLDERS = 2000
+FILES_PER_FOLDER = 10
+EVENTS = ['trip', 'beach_party', 'party_2019', 'wedding', 'xmas', 'hike', 'concert']
+
+
+def synthetic_names(count):
+    rng = random.Random(0)
+    start = datetime(1990, 1, 1)
+    for i in range(count):
+        taken = start + timedelta(seconds=rng.randrange(35 * 365 * 86400))
+        event = f"_{rng.choice(EVENTS)}" if rng.random() < 0.3 else ''
+        index = f"_{rng.randint(1, 5)}" if rng.random() < 0.1 else ''
+        yield f"{taken:%Y%m%d_%H%M%S}{event}{index}{rng.choice(['.jpg', '.cr2', '.mp4'])}"
+
+
+def timed(label, count, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed:7.2f}s  {count / elapsed:12,.0f} /sec")
+    return result
+
+
+def walk_prune(root) -> list:
+    # The previous prune: every folder's whole subtree walked again, deepest folders first
+    return [folder for folder in sorted(root.rglob('*'), key=lambda f: -len(f.parts))
+            if folder.is_dir() and not any(is_restructured(m.path) for m in walk_media(folder, include_hidden=True))]
+
+
+def build_tree(root) -> None:
+    for i in range(PRUNE_FOLDERS):
+        folder = root / f"{1990 + i % 35}s" / str(i) / "sub"
+        folder.mkdir(parents=True)
+        for j in range(FILES_PER_FOLDER):
+            # Even folders hold media, odd ones only sidecar-like leftovers
+            (folder / f"{i:05}_{j:02}{'.jpg' if i % 2 == 0 else '.txt'}").touch()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else SYNTHETIC_FILES
+    root = Path('/archive')
+    paths = [Path('/photos', name) for name in synthetic_names(count)]
+    print(f"Planning {count:,} file(s)")
+    infos = timed("parse names", count, lambda: [restructure_info(path) for path in paths])
+    layout = timed("plan layout", count, plan_restructure, infos, False)
+    tasks = timed("expand destinations", count,
+                  lambda: [(src, target / src.name) for folder, sources in layout.items() for target in [root / folder] for src in sources])
+    print(f"  {len(layout):,} folder(s), {len(tasks):,} placement(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_tree(Path(tmp))
+        folders = PRUNE_FOLDERS * 2 + 35
+        print(f"Pruning a tree of {folders:,} folder(s) and {PRUNE_FOLDERS * FILES_PER_FOLDER:,} file(s)")
+        pruned = timed("single bottom-up pass", folders, prune_empty_folders, Path(tmp))
+        walked = timed("walk per folder", folders, walk_prune, Path(tmp))
+        # The old approach lists every empty folder; the new one only the topmost of each empty subtree
+        covered = {folder for folder in walked if any(folder == p or p in folder.parents for p in pruned)}
+        print(f"  {len(pruned):,} folder(s) to delete; {'same' if covered == set(walked) else 'DIFFERENT'} folders as before")
+
+
+if __name__ == '__main__':
+    main()
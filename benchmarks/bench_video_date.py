@@ -0,0 +1,67 @@
+'''
+Compares reading video creation times with the in-process MP4/MOV parser against spawning ffprobe.
+
+Usage: python -m benchmarks.bench_video_date [folder]
+
+With a folder, every MP4/MOV/3GP file in it is used; otherwise synthetic MP4 files (with moov after a
+large mdat, as phones write them) are generated. The ffprobe variant is skipped if ffprobe isn't installed.
+'''
+
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from run.video_date import BMFF_EXTENSIONS, MAC_EPOCH, read_bmff_creation_date
+from run.videos import get_ffprobe_creation_date
+
+
+SYNTHETIC_FILES = 500
+SYNTHETIC_MDAT_BYTES = 4 * 1024 * 1024
+
+
+def box(box_type, payload) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def write_synthetic_mp4(path, created) -> None:
+    seconds = int((created - MAC_EPOCH).total_seconds())
+    # Version 0 mvhd: version/flags, creation, modification, timescale, duration, then the fixed fields
+    mvhd = struct.pack('>IIIII', 0, seconds, seconds, 1000, 0) + bytes(80)
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41'))
+        f.write(struct.pack('>I4s', 8 + SYNTHETIC_MDAT_BYTES, b'mdat'))
+        f.seek(SYNTHETIC_MDAT_BYTES, 1)  # Sparse, so generating the files stays quick
+        f.write(box(b'moov', box(b'mvhd', mvhd)))
+
+
+def time_reader(name, reader, paths) -> None:
+    start = time.perf_counter()
+    found = sum(1 for path in paths if reader(path))
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<8} {elapsed:7.2f}s  {len(paths) / elapsed:9.1f} files/sec  ({found}/{len(paths)} dated)")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            paths = sorted(p for p in Path(sys.argv[1]).rglob('*') if p.suffix.lower() in BMFF_EXTENSIONS)
+        else:
+            paths = [Path(tmp) / f"clip_{i:04}.mp4" for i in range(SYNTHETIC_FILES)]
+            for i, path in enumerate(paths):
+                write_synthetic_mp4(path, datetime(2024, 1, 1, 12, 0, i % 60))
+        print(f"{len(paths)} video file(s)")
+        time_reader("native", read_bmff_creation_date, paths)
+        if shutil.which("ffprobe"):
+            time_reader("ffprobe", get_ffprobe_creation_date, paths)
+            mismatched = [p for p in paths if read_bmff_creation_date(p) != get_ffprobe_creation_date(p)]
+            print(f"  {len(mismatched)} file(s) where the two readers disagree" + (f", e.g. {mismatched[0]}" if mismatched else ""))
+        else:
+            print("  ffprobe  not installed, skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
+import sys
 from . import photos
 from . import videos
+from . import cli
 
 
 ############# Supporting Functions #############
@@ -119,4 +121,7 @@ def main() -> None:
 
 
 if __name__ == '__main__':
+    # Any arguments select the non-interactive command line interface; none opens the menu
+    if len(sys.argv) > 1:
+        sys.exit(cli.main(sys.argv[1:]))
     main()
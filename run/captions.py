@@ -0,0 +1,58 @@
+'''
+Caption manifests let burn-in captions be supplied up front instead of typed in for each file.
+
+A manifest maps file names, relative paths or glob patterns to captions, either as
+  - JSON: {"IMG_0001.jpg": "Arrival", "italy/*.jpg": "Italy"} or [{"file": ..., "caption": ...}, ...]
+  - CSV:  a header row with "file" and "caption" columns
+Exact file names and relative paths take precedence over patterns; patterns are tried in manifest order.
+'''
+
+import csv
+import json
+from fnmatch import fnmatch
+from pathlib import Path, PurePath
+
+
+GLOB_CHARS = set('*?[')
+
+
+def load_caption_manifest(manifest_path) -> dict:
+    manifest_path = Path(manifest_path).expanduser()
+    if manifest_path.suffix.lower() == '.json':
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            entries = list(data.items())
+        else:
+            entries = [(item['file'], item.get('caption', '')) for item in data]
+    elif manifest_path.suffix.lower() == '.csv':
+        with open(manifest_path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'file' not in reader.fieldnames or 'caption' not in reader.fieldnames:
+                raise ValueError("CSV caption manifest needs 'file' and 'caption' columns")
+            entries = [(row['file'], row['caption']) for row in reader]
+    else:
+        raise ValueError("Caption manifest must be a .csv or .json file")
+
+    manifest = {'exact': {}, 'patterns': []}
+    for key, caption in entries:
+        key = str(key).strip().replace('\\', '/')
+        caption = (caption or '').strip()
+        if any(c in GLOB_CHARS for c in key):
+            manifest['patterns'].append((key, caption))
+        else:
+            manifest['exact'][key] = caption
+    return manifest
+
+
+def caption_for(manifest, path, root=None):
+    # Returns the caption for path, or None if the manifest has no entry for it
+    path = PurePath(path)
+    rel = path.relative_to(root).as_posix() if root and path.is_relative_to(root) else path.name
+    for key in (rel, path.name):
+        if key in manifest['exact']:
+            return manifest['exact'][key]
+    for pattern, caption in manifest['patterns']:
+        if fnmatch(rel, pattern) or fnmatch(path.name, pattern):
+            return caption
+    return None
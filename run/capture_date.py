@@ -0,0 +1,175 @@
+'''
+Capture date resolution for photographs without decoding or fully opening them.
+
+JPEG and TIFF-based files (including most RAW formats) are read by walking only the JPEG marker
+segments and TIFF IFDs with a few small seeks and reads. Formats that need a full container parser
+(HEIC/HEIF, CR3, PNG, WebP, ...) go through pyexiv2. Every file handle is closed before returning.
+
+The fallback order matches the rest of the module: the capture date in an XMP sidecar (see sidecar.py),
+EXIF DateTimeOriginal, then a date in the filename (YYYYMMDD_HHMMSS or YYYYMMDD), then the file's
+modification time.
+'''
+
+from datetime import datetime
+from pathlib import Path
+import re
+import struct
+import threading
+
+
+JPEG_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.jpe', '.jif', '.jfif', '.jfi'])
+# Formats that are plain TIFF containers, possibly with a vendor-specific magic number
+TIFF_EXTENSIONS = frozenset([
+    '.tif', '.tiff', '.dng', '.nef', '.nrw', '.cr2', '.arw', '.srf', '.sr2', '.rw2', '.raw', '.rwl',
+    '.orf', '.pef', '.ptx', '.erf', '.mef', '.mos', '.iiq', '.3fr', '.fff', '.srw', '.k25', '.kdc', '.mdc',
+])
+RAF_EXTENSIONS = frozenset(['.raf'])
+
+TIFF_MAGIC = (42, 0x4F52, 0x5352, 0x55)  # Standard, Olympus ORF ("RO" / "RS"), Panasonic RW2
+EXIF_IFD_POINTER = 0x8769
+DATETIME_ORIGINAL = 0x9003
+MAX_IFD_ENTRIES = 1024
+MAX_SEGMENTS = 64
+
+EXIF_DATE_FORMATS = ('%Y:%m:%d %H:%M:%S.%f', '%Y:%m:%d %H:%M:%S')
+
+# Dates may be resolved from several threads; pyexiv2 makes no thread-safety promises, the parsers above need none
+PYEXIV2_LOCK = threading.Lock()
+
+
+def parse_exif_date(value):
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'ignore')
+    value = str(value).strip('\x00 ')
+    for fmt in EXIF_DATE_FORMATS:
+        try: return datetime.strptime(value, fmt)
+        except ValueError: continue
+    return None
+
+
+def read_ifd_entries(f, base, offset, endian) -> dict:
+    # Returns {tag: (type, count, raw 4-byte value field)} for the IFD at base + offset
+    f.seek(base + offset)
+    data = f.read(2)
+    if len(data) < 2:
+        return {}
+    (count,) = struct.unpack(endian + 'H', data)
+    if count > MAX_IFD_ENTRIES:
+        return {}
+    data = f.read(count * 12)
+    entries = {}
+    for i in range(len(data) // 12):
+        tag, type_, n, value = struct.unpack(endian + 'HHI4s', data[i * 12:(i + 1) * 12])
+        entries[tag] = (type_, n, value)
+    return entries
+
+
+def read_tiff_capture_date(f, base=0):
+    # Reads DateTimeOriginal from the TIFF structure starting at file offset `base`
+    f.seek(base)
+    head = f.read(8)
+    if len(head) < 8 or head[:2] not in (b'II', b'MM'):
+        return None
+    endian = '<' if head[:2] == b'II' else '>'
+    magic, ifd0 = struct.unpack(endian + 'HI', head[2:8])
+    if magic not in TIFF_MAGIC:
+        return None
+    entries = read_ifd_entries(f, base, ifd0, endian)
+    if DATETIME_ORIGINAL not in entries and EXIF_IFD_POINTER in entries:
+        (exif_ifd,) = struct.unpack(endian + 'I', entries[EXIF_IFD_POINTER][2])
+        entries = read_ifd_entries(f, base, exif_ifd, endian)
+    if DATETIME_ORIGINAL not in entries:
+        return None
+    type_, count, value = entries[DATETIME_ORIGINAL]
+    if type_ != 2 or count > 64:
+        return None
+    if count > 4:
+        (offset,) = struct.unpack(endian + 'I', value)
+        f.seek(base + offset)
+        value = f.read(count)
+    return parse_exif_date(value[:count])
+
+
+def read_jpeg_capture_date(f, start=0):
+    # Walks the marker segments up to the start of the image data, looking for the APP1 Exif block
+    f.seek(start)
+    if f.read(2) != b'\xff\xd8':
+        return None
+    for _ in range(MAX_SEGMENTS):
+        marker = f.read(2)
+        while marker[:1] == b'\xff' and marker[1:2] == b'\xff':  # Fill bytes
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):  # EOI / start of scan
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack('>H', length_bytes)
+        segment_start = f.tell()
+        if marker[1] == 0xE1 and f.read(6) == b'Exif\x00\x00':
+            return read_tiff_capture_date(f, segment_start + 6)
+        f.seek(segment_start + length - 2)
+    return None
+
+
+def read_raf_capture_date(f):
+    # Fujifilm RAF files embed a full JPEG (with EXIF) whose offset is stored at byte 84
+    f.seek(84)
+    data = f.read(4)
+    if len(data) < 4:
+        return None
+    (jpeg_offset,) = struct.unpack('>I', data)
+    return read_jpeg_capture_date(f, jpeg_offset)
+
+
+def read_pyexiv2_capture_date(path):
+    import pyexiv2
+    with PYEXIV2_LOCK, pyexiv2.Image(str(path)) as img:
+        value = img.read_exif().get('Exif.Photo.DateTimeOriginal')
+    return parse_exif_date(value) if value else None
+
+
+def read_capture_date(path):
+    # EXIF DateTimeOriginal using the cheapest reader for the file type, or None
+    path = Path(path)
+    ext = path.suffix.lower()
+    try:
+        if ext in JPEG_EXTENSIONS or ext in TIFF_EXTENSIONS or ext in RAF_EXTENSIONS:
+            with open(path, 'rb') as f:
+                if ext in RAF_EXTENSIONS:
+                    return read_raf_capture_date(f)
+                # Some cameras save TIFFs as .jpg and vice versa, so go by the first bytes
+                head = f.read(2)
+                return read_jpeg_capture_date(f) if head == b'\xff\xd8' else read_tiff_capture_date(f)
+        return read_pyexiv2_capture_date(path)
+    except Exception:
+        return None
+
+
+def date_from_filename(name):
+    m = re.search(r'(\d{8})[_\-]?(\d{6})', name)
+    if m:
+        try: return datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S")
+        except ValueError: pass
+    m = re.search(r'(\d{8})', name)
+    if m:
+        try: return datetime.strptime(m.group(1), "%Y%m%d")
+        except ValueError: pass
+    return None
+
+
+def resolve_capture_date(path, stat=None) -> tuple:
+    # Returns (datetime, source) where source is 'xmp' (an XMP sidecar), 'exif', 'filename' or 'mtime'
+    from .sidecar import sidecar_capture_date
+    path = Path(path)
+    dt = sidecar_capture_date(path)
+    if dt:
+        return dt, 'xmp'
+    dt = read_capture_date(path)
+    if dt:
+        return dt, 'exif'
+    dt = date_from_filename(path.name)
+    if dt:
+        return dt, 'filename'
+    stat = stat or path.stat()
+    return datetime.fromtimestamp(stat.st_mtime), 'mtime'
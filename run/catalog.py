@@ -0,0 +1,359 @@
+'''
+On-disk catalog of per-file metadata, so that running rename, export, burn-in and restructure over the same
+archive extracts each file's EXIF / IPTC / XMP / ffprobe data once rather than once per operation.
+
+Entries are keyed by absolute path and are only trusted while the file's size and mtime_ns are unchanged;
+a stale entry is discarded and rebuilt on the next lookup. The catalog is a cache: if it cannot be opened
+(or CATALOG_PATH is None) every helper here falls back to reading the file directly.
+'''
+
+import contextlib
+import concurrent.futures
+from datetime import datetime, timedelta
+from pathlib import Path
+import itertools
+import json
+import os
+import re
+import sqlite3
+from .config import CATALOG_PATH, DATE_WORKERS, EXIF_TAG_MAP, RESOLVE_BATCH
+from .capture_date import PYEXIV2_LOCK, resolve_capture_date
+from .sidecar import read_sidecar, sidecar_mtime_ns
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    capture_date TEXT,
+    date_source TEXT,
+    width INTEGER,
+    height INTEGER,
+    make TEXT COLLATE NOCASE,
+    model TEXT COLLATE NOCASE,
+    event TEXT,
+    metadata TEXT,
+    video_created TEXT,
+    video_source TEXT,
+    sidecar_mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_capture_date ON files (capture_date);
+CREATE INDEX IF NOT EXISTS files_make_model ON files (make, model);
+CREATE INDEX IF NOT EXISTS files_event ON files (event);
+'''
+
+COLUMNS = ['path', 'size', 'mtime_ns', 'capture_date', 'date_source', 'width', 'height', 'make', 'model', 'event',
+           'metadata', 'video_created', 'video_source', 'sidecar_mtime_ns']
+# Columns added since the first catalogs were created, with their types
+ADDED_COLUMNS = {'metadata': 'TEXT', 'sidecar_mtime_ns': 'INTEGER', 'video_source': 'TEXT'}
+# The date a file sorts and filters by: its capture date, or for a video only ever read for its creation time, that
+TAKEN = 'COALESCE(capture_date, video_created)'
+
+# Friendly names (as PIL reports them) for the EXIF tags exports have always used; other tags keep their exiv2 keys
+EXIF_NAMES = {key: name for name, key in EXIF_TAG_MAP.items()}
+
+# Standard names are YYYYMMDD_HHMMSS[_suffix][_n]; the event is the suffix without the trailing index
+EVENT_PATTERN = re.compile(r'^\d{6,8}_\d{6}((?:_[a-z0-9]+)*?)(?:_\d+)?$', re.IGNORECASE)
+
+
+def open_catalog(catalog_path=CATALOG_PATH):
+    if not catalog_path:
+        return None
+    try:
+        catalog_path = Path(catalog_path).expanduser()
+        catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(catalog_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        # Catalogs created before a column was added get it empty (it is filled in as files are read again)
+        existing = {row['name'] for row in conn.execute('PRAGMA table_info(files)')}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f'ALTER TABLE files ADD COLUMN {column} {column_type}')
+        if 'video_source' not in existing:
+            # Catalogs from before video_source copied video creation times into capture_date, where they
+            # could stand in for resolve_capture_date's answer; those video dates are read again
+            conn.execute('UPDATE files SET capture_date = NULL, date_source = NULL, video_created = NULL '
+                         'WHERE video_created IS NOT NULL')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS files_taken ON files ({TAKEN})')
+        return conn
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️  Metadata catalog unavailable ({e}); reading every file directly.")
+        return None
+
+
+@contextlib.contextmanager
+def catalog_session(catalog_path=CATALOG_PATH):
+    # Yields a connection (or None if the catalog is disabled) and commits once at the end
+    conn = open_catalog(catalog_path)
+    try:
+        yield conn
+    finally:
+        if conn:
+            conn.commit()
+            conn.close()
+
+
+def catalog_key(path) -> str:
+    return str(Path(path).absolute())
+
+
+def event_from_name(name):
+    m = EVENT_PATTERN.match(Path(name).stem)
+    if not m or not m.group(1):
+        return None
+    return m.group(1).strip('_').lower()
+
+
+def lookup(conn, path, stat):
+    # Returns the entry for path if it still matches the file on disk, discarding it otherwise
+    key = catalog_key(path)
+    row = conn.execute('SELECT * FROM files WHERE path = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    # An XMP sidecar added, changed or removed since also invalidates the entry
+    if row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns and row['sidecar_mtime_ns'] == sidecar_mtime_ns(path):
+        return row
+    conn.execute('DELETE FROM files WHERE path = ?', (key,))
+    return None
+
+
+def store(conn, path, stat, **fields) -> None:
+    # Fills in the given columns, creating the entry if needed; callers must have called lookup() first
+    columns = ['path', 'size', 'mtime_ns', 'sidecar_mtime_ns', 'event'] + list(fields)
+    values = [catalog_key(path), stat.st_size, stat.st_mtime_ns, sidecar_mtime_ns(path), event_from_name(path)] + list(fields.values())
+    updates = ', '.join(f'{c} = excluded.{c}' for c in fields) or 'event = excluded.event'
+    conn.execute(
+        f"INSERT INTO files ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (path) DO UPDATE SET {updates}",
+        values,
+    )
+
+
+def cached_capture_date(row):
+    return (datetime.fromisoformat(row['capture_date']), row['date_source']) if row and row['capture_date'] else None
+
+
+def store_capture_date(conn, path, stat, value) -> None:
+    store(conn, path, stat, capture_date=value[0].isoformat(sep=' '), date_source=value[1])
+
+
+def capture_date(conn, path, stat=None) -> tuple:
+    # (datetime, source) as from resolve_capture_date, cached
+    path = Path(path)
+    stat = stat or path.stat()
+    value = cached_capture_date(lookup(conn, path, stat)) if conn else None
+    if value is None:
+        value = resolve_capture_date(path, stat)
+        if conn:
+            store_capture_date(conn, path, stat, value)
+    return value
+
+
+def capture_dates(conn, paths, workers=DATE_WORKERS) -> list:
+    # capture_date() for many files (paths or walker entries), in input order
+    return resolve_many(conn, paths, cached_capture_date, resolve_capture_date, store_capture_date, workers)
+
+
+def read_pil_exif(path) -> tuple:
+    # For formats exiv2 can't open (e.g. GIF): EXIF tags by name with string values, width, height
+    from PIL import Image, ExifTags
+    # Opening is lazy (only the header is parsed); the context manager closes the handle
+    with Image.open(path) as img:
+        raw = img._getexif() if hasattr(img, '_getexif') else None
+        width, height = img.size
+    return {str(ExifTags.TAGS.get(k, k)): str(v) for k, v in raw.items()} if raw else {}, width, height
+
+
+def read_metadata(path, stat=None) -> tuple:
+    # ({'EXIF Data': ..., 'IPTC Data': ..., 'XMP Data': ...}, width, height), all from a single open of the file
+    # (and of its XMP sidecar, if it has one)
+    import pyexiv2
+    try:
+        with PYEXIV2_LOCK, pyexiv2.Image(str(path)) as img:
+            try:
+                exif, iptc, xmp = img.read_exif(), img.read_iptc(), img.read_xmp()
+            except UnicodeDecodeError:
+                exif, iptc, xmp = (img.read_exif('iso-8859-1'), img.read_iptc('iso-8859-1'), img.read_xmp('iso-8859-1'))
+            width, height = img.get_pixel_width(), img.get_pixel_height()
+    except RuntimeError:
+        exif, width, height = read_pil_exif(path)
+        iptc, xmp = {}, {}
+    exif = {EXIF_NAMES.get(key, key): value for key, value in exif.items()}
+    # A sidecar's XMP takes precedence over what is embedded
+    return {'EXIF Data': exif, 'IPTC Data': iptc, 'XMP Data': {**xmp, **read_sidecar(path)}}, width, height
+
+
+def cached_metadata(row):
+    return json.loads(row['metadata']) if row and row['metadata'] is not None else None
+
+
+def store_metadata(conn, path, stat, value) -> None:
+    metadata, width, height = value
+    exif = metadata['EXIF Data']
+    store(conn, path, stat, metadata=json.dumps(metadata), width=width, height=height,
+          make=str(exif.get('Make', '')).strip('\x00 ') or None, model=str(exif.get('Model', '')).strip('\x00 ') or None)
+
+
+def metadata(conn, path, stat=None) -> dict:
+    # EXIF, IPTC and XMP tags ({'EXIF Data': {...}, 'IPTC Data': {...}, 'XMP Data': {...}}), cached along with
+    # dimensions and camera
+    path = Path(path)
+    stat = stat or path.stat()
+    value = cached_metadata(lookup(conn, path, stat)) if conn else None
+    if value is None:
+        computed = read_metadata(path)
+        if conn:
+            store_metadata(conn, path, stat, computed)
+        value = computed[0]
+    return value
+
+
+def iter_metadata(conn, paths, workers=1, known=None):
+    # metadata() for many files (paths or walker entries) as (path, stat, metadata) in input order, streamed
+    # batch by batch and read in worker processes; a file that can't be read yields its exception instead.
+    # known(path, stat), if given, can supply a file's metadata from elsewhere (e.g. a previous export).
+    for path, stat, value in iter_resolved(conn, paths, cached_metadata, read_metadata, store_metadata, workers,
+                                           processes=True, known=known):
+        yield path, stat, value[0] if isinstance(value, tuple) else value
+
+
+def cached_video_created(row):
+    if not row or not row['video_created']:
+        return None
+    return datetime.fromisoformat(row['video_created']), row['video_source']
+
+
+def store_video_created(conn, path, stat, value) -> None:
+    # value is (datetime, source) as from videos.resolve_video_date. It is kept apart from capture_date, which
+    # only resolve_capture_date fills in, so neither resolver's answer depends on which ran first; date range
+    # queries use whichever is set (TAKEN).
+    dt, source = value
+    store(conn, path, stat, video_created=dt.isoformat(sep=' '), video_source=source)
+
+
+def video_created(conn, path, resolve, stat=None) -> datetime:
+    # Creation time of a video, from resolve(path) returning (datetime, source), cached
+    path = Path(path)
+    stat = stat or path.stat()
+    value = cached_video_created(lookup(conn, path, stat)) if conn else None
+    if value is None:
+        value = resolve(path)
+        if conn and value:
+            store_video_created(conn, path, stat, value)
+    return value[0] if value else None
+
+
+def videos_created(conn, paths, resolve, workers=DATE_WORKERS) -> list:
+    # video_created() for many files (paths or walker entries), in input order
+    values = resolve_many(conn, paths, cached_video_created, lambda path, stat: resolve(path), store_video_created, workers)
+    return [value[0] if value else None for value in values]
+
+
+def resolve_many(conn, paths, from_row, compute, save, workers) -> list:
+    # iter_resolved() collected into a list of values; the first error is raised
+    results = []
+    for _, stat, value in iter_resolved(conn, paths, from_row, compute, save, workers):
+        for result in (stat, value):
+            if isinstance(result, Exception):
+                raise result
+        results.append(value)
+    return results
+
+
+def call_safely(function, *args):
+    # Returns the exception instead of raising it (a module-level function, so it can run in a worker process)
+    try:
+        return function(*args)
+    except Exception as e:
+        return e
+
+
+def item_stat(item):
+    # Walker entries reuse their DirEntry's (cached) stat
+    return item.stat() if hasattr(item, 'entry') else os.stat(item)
+
+
+def iter_resolved(conn, paths, from_row, compute, save, workers, batch=RESOLVE_BATCH, processes=False, known=None):
+    # Stats and uncached values (header reads, ffprobe calls) are fanned out over a bounded thread pool, or
+    # for compute functions that hold the GIL (pyexiv2) a process pool; catalog reads and writes stay on this
+    # thread, which owns the connection. Items are taken batch by batch, so memory stays flat however many
+    # paths are given, and executor.map keeps the results in input order, so callers see exactly what a
+    # serial loop would have produced. Yields (path, stat, value); errors are yielded in place of the stat or
+    # value rather than raised. known(path, stat) is asked first, in input order, and its values aren't stored.
+    def cached(path, stat):
+        if isinstance(stat, Exception):
+            return None
+        value = known(path, stat) if known else None
+        if value is None and conn:
+            value = from_row(lookup(conn, path, stat))
+        return value
+
+    items = iter(paths)
+    workers = max(1, workers)
+    processes = processes and workers > 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as threads, \
+            (concurrent.futures.ProcessPoolExecutor(max_workers=workers) if processes else contextlib.nullcontext()) as pool:
+        compute_executor = pool if processes else threads
+        while chunk := list(itertools.islice(items, batch)):
+            paths = [Path(getattr(item, 'path', item)) for item in chunk]
+            stats = list(threads.map(call_safely, itertools.repeat(item_stat), chunk))
+            results = [cached(path, stat) for path, stat in zip(paths, stats)]
+            misses = [i for i, value in enumerate(results) if value is None and not isinstance(stats[i], Exception)]
+            chunksize = max(1, len(misses) // (workers * 4)) if processes else 1
+            computed = compute_executor.map(call_safely, itertools.repeat(compute), [paths[i] for i in misses],
+                                            [stats[i] for i in misses], chunksize=chunksize)
+            for i, value in zip(misses, computed):
+                results[i] = value
+                if conn and value and not isinstance(value, Exception):
+                    save(conn, paths[i], stats[i], value)
+            yield from zip(paths, stats, results)
+
+
+def record_move(conn, old_path, new_path, keep_old=False) -> None:
+    # Carries an entry over to a renamed, moved or copied file (none of which change size or mtime_ns)
+    if not conn:
+        return
+    old_key, new_key = catalog_key(old_path), catalog_key(new_path)
+    if old_key == new_key:
+        return
+    conn.execute('DELETE FROM files WHERE path = ?', (new_key,))
+    if keep_old:
+        copied = [c for c in COLUMNS if c not in ('path', 'event')]
+        conn.execute(
+            f"INSERT INTO files (path, event, {', '.join(copied)}) SELECT ?, ?, {', '.join(copied)} FROM files WHERE path = ?",
+            (new_key, event_from_name(new_path), old_key),
+        )
+    else:
+        conn.execute('UPDATE files SET path = ?, event = ? WHERE path = ?', (new_key, event_from_name(new_path), old_key))
+
+
+def query(conn, start=None, end=None, make=None, model=None, event=None, under=None) -> list:
+    # Catalogued paths matching every given filter. start/end are inclusive dates (YYYYMMDD);
+    # make/model match case-insensitively; event is a rename suffix such as "trip to yorkshire".
+    clauses, params = [], []
+    if start:
+        clauses.append(f'{TAKEN} >= ?')
+        params.append(datetime.strptime(start, '%Y%m%d').isoformat(sep=' '))
+    if end:
+        clauses.append(f'{TAKEN} < ?')
+        params.append((datetime.strptime(end, '%Y%m%d') + timedelta(days=1)).isoformat(sep=' '))
+    if make:
+        clauses.append('make = ?')
+        params.append(make)
+    if model:
+        clauses.append('model = ?')
+        params.append(model)
+    if event:
+        clauses.append('event = ?')
+        params.append('_'.join(event.split()).lower())
+    if under:
+        # Range scan on the primary key rather than LIKE, so the prefix match can use the index
+        prefix = catalog_key(under).rstrip(os.sep) + os.sep
+        clauses.append('path >= ? AND path < ?')
+        params += [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+    sql = 'SELECT path FROM files' + (' WHERE ' + ' AND '.join(clauses) if clauses else '') + f' ORDER BY {TAKEN}, path'
+    return [Path(row['path']) for row in conn.execute(sql, params)]
@@ -0,0 +1,272 @@
+'''
+Non-interactive command line interface, e.g. `python -m run photos rename /path/to/folder --subdirs --yes`.
+
+Every option can also be supplied through a JSON config file (--config) whose keys match the option names
+(e.g. {"subdirs": true, "suffix": "italy"}); options given on the command line take precedence.
+
+Exit status: 0 on success, 1 if the operation was aborted or any file failed, 2 for usage errors.
+'''
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from . import photos
+from . import videos
+from . import prompts
+from . import catalog
+from . import renamer
+from .metadata_files import COMPRESSIONS
+from .placement import PLACEMENTS
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+############# Command Handlers #############
+
+
+def photos_rename(args) -> bool:
+    if args.film:
+        return photos.rename_film(args.path, args.subdirs, args.raw, args.suffix, args.date, args.yes, args.plan or None)
+    return photos.rename_digital(args.path, args.subdirs, args.raw, args.suffix, args.date, args.videos, args.yes,
+                                 args.plan or None)
+
+
+def photos_burn_in(args) -> bool:
+    if args.style == 'border':
+        if not args.text:
+            raise prompts.MissingOptionError("Missing required option: --text (needed for --style border)")
+        return photos.burn_in_metadata_verbose(args.path, args.output, args.subdirs, args.text)
+    return photos.burn_in_metadata_basic(args.path, args.output, bool(args.captions), args.text, args.date, args.subdirs,
+                                         args.workers, args.captions or None)
+
+
+def photos_clone(args) -> bool:
+    return photos.clone_metadata(args.source, args.targets or None, args.subdirs, args.workers, args.sidecar)
+
+
+def photos_export(args) -> bool:
+    return photos.export_metadata(args.path, args.subdirs, args.output_dir, args.format, args.compress, args.incremental)
+
+
+def photos_import(args) -> bool:
+    return photos.import_metadata(args.metadata_file, args.images, args.yes, args.workers, args.sidecar)
+
+
+def photos_restructure(args) -> bool:
+    return photos.restructure_folders(args.source, args.root, args.group_year_gaps, args.yes, args.placement,
+                                      args.sync, args.delete_orphans, args.dry_run, args.compare)
+
+
+def videos_rename(args) -> bool:
+    return videos.rename_videos(args.path, args.subdirs, args.suffix, args.date, args.yes, args.plan or None)
+
+
+def videos_burn_in(args) -> bool:
+    return videos.burn_in_metadata_video(args.path, args.output, bool(args.captions), args.text, args.date, args.subdirs,
+                                         args.captions or None)
+
+
+def catalog_query(args) -> bool:
+    with catalog.catalog_session() as conn:
+        if conn is None:
+            raise ValueError("The metadata catalog is disabled (CATALOG_PATH is None)")
+        for path in catalog.query(conn, args.start, args.end, args.make, args.model, args.event, args.under):
+            print(path)
+    return True
+
+
+def renames_resume(args) -> bool:
+    with catalog.catalog_session() as conn:
+        return renamer.resume_renames(args.journal, lambda old, new: catalog.record_move(conn, old, new)) == 0
+
+
+def renames_rollback(args) -> bool:
+    with catalog.catalog_session() as conn:
+        return renamer.rollback_renames(args.journal, lambda old, new: catalog.record_move(conn, old, new)) == 0
+
+
+def renames_apply(args) -> bool:
+    with catalog.catalog_session() as conn:
+        return renamer.apply_plan(args.plan, args.yes, lambda old, new: catalog.record_move(conn, old, new)) == 0
+
+
+def renames_list(args) -> bool:
+    for path in renamer.incomplete_journals():
+        print(path)
+    return True
+
+
+############# Argument Parsing #############
+
+
+def add_flag(parser, name, help) -> None:
+    parser.add_argument(name, action=argparse.BooleanOptionalAction, default=None, help=help)
+
+
+def add_command(subparsers, name, handler, help, **headless_defaults) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(name, help=help)
+    parser.add_argument('--config', help="JSON file with option values")
+    # Values used when an option is given neither on the command line nor in the config file
+    parser.set_defaults(handler=handler, headless_defaults=headless_defaults)
+    return parser
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m run', description="Archivist utility (run without arguments for the interactive menu).")
+    groups = parser.add_subparsers(dest='group', required=True)
+
+    photo_commands = groups.add_parser('photos', help="Photograph operations").add_subparsers(dest='command', required=True)
+
+    p = add_command(photo_commands, 'rename', photos_rename, "Rename photographs to the standard format",
+                    film=False, subdirs=False, raw=False, videos=False, suffix='', date='', yes=False, plan='')
+    p.add_argument('path', nargs='?', help="Folder containing the photographs")
+    add_flag(p, '--film', "Rename film scans using --date instead of EXIF dates")
+    add_flag(p, '--subdirs', "Include subdirectories")
+    add_flag(p, '--raw', "Include RAW files")
+    add_flag(p, '--videos', "Include videos (digital only)")
+    p.add_argument('--suffix', help="Custom suffix, e.g. an event name")
+    p.add_argument('--date', help="Custom date (YYYYMMDD; film also accepts YYYYMM or YYYY)")
+    add_flag(p, '--yes', "Apply the renames without asking for confirmation")
+    p.add_argument('--plan', help="Save the planned renames to this .jsonl or .csv file instead of applying them")
+
+    p = add_command(photo_commands, 'burn-in', photos_burn_in, "Burn the date and a caption into photographs",
+                    style='overlay', output='', text='', captions='', date='', subdirs=False, workers='')
+    p.add_argument('path', nargs='?', help="Image or folder of images")
+    p.add_argument('--style', choices=['overlay', 'border'], help="overlay: date in the corner (default); border: caption below the image")
+    p.add_argument('--output', help="Output file or folder (default: overwrite originals)")
+    p.add_argument('--text', help="Caption to burn into every image (required for --style border)")
+    p.add_argument('--captions', help="CSV/JSON manifest of captions keyed by file name or glob (overlay style)")
+    p.add_argument('--date', help="Custom date (YYYYMMDD, YYYYMM or YYYY) instead of the capture date")
+    add_flag(p, '--subdirs', "Include subdirectories")
+    p.add_argument('--workers', type=int, help="Maximum number of worker processes")
+
+    p = add_command(photo_commands, 'clone', photos_clone, "Copy metadata from one photograph to others",
+                    subdirs=False, workers='', sidecar=False)
+    p.add_argument('source', nargs='?', help="Image to copy metadata from")
+    p.add_argument('targets', nargs='*', default=None, help="Images, folders of images or glob patterns (quoted) to copy metadata to")
+    add_flag(p, '--subdirs', "Include subdirectories of target folders")
+    p.add_argument('--workers', type=int, help="Maximum number of worker processes")
+    add_flag(p, '--sidecar', "Write XMP sidecars (IMAGE.xmp) instead of modifying the targets")
+
+    p = add_command(photo_commands, 'export', photos_export, "Export image metadata to CSV, JSON, JSON Lines or SQLite",
+                    subdirs=False, format='json', compress='none', incremental=False)
+    p.add_argument('path', nargs='?', help="Folder containing the images")
+    p.add_argument('--output-dir', help="Directory to write metadata.json / .jsonl / .csv / .sqlite to")
+    p.add_argument('--format', choices=['csv', 'json', 'jsonl', 'sqlite', 'both'], help="Export format (default: json)")
+    p.add_argument('--compress', choices=['none', *COMPRESSIONS], help="Compress the export files (default: none)")
+    add_flag(p, '--incremental', "Only re-read images added or changed since the last export to --output-dir")
+    add_flag(p, '--subdirs', "Include subdirectories")
+
+    p = add_command(photo_commands, 'import', photos_import, "Rewrite image metadata from a metadata export",
+                    yes=False, workers='', sidecar=False)
+    p.add_argument('metadata_file', nargs='?', help="Metadata export (.json, .jsonl, .csv or .sqlite, optionally compressed)")
+    p.add_argument('--images', help="Folder containing the images to update")
+    add_flag(p, '--yes', "Do not ask to confirm the metadata file")
+    p.add_argument('--workers', type=int, help="Maximum number of worker processes")
+    add_flag(p, '--sidecar', "Write XMP sidecars (IMAGE.xmp) instead of modifying the images")
+
+    p = add_command(photo_commands, 'restructure', photos_restructure, "Restructure photos and videos into decade/year/event folders",
+                    group_year_gaps=False, yes=False, placement='', sync=False,
+                    delete_orphans=False, dry_run=False, compare='mtime')
+    p.add_argument('source', nargs='?', help="Folder containing the photos and videos")
+    p.add_argument('--root', help="Root folder for the restructured files (its contents are replaced unless --sync)")
+    add_flag(p, '--group-year-gaps', "Keep event files more than a year apart in one folder (default: split them)")
+    add_flag(p, '--yes', "Do not ask for confirmation before replacing or moving files")
+    p.add_argument('--placement', choices=PLACEMENTS,
+                   help="How files reach the root folder: auto (default), reflink, hardlink, copy_file_range, copy or symlink")
+    add_flag(p, '--sync', "Update an existing root folder, placing only new and changed files (default: replace its contents)")
+    add_flag(p, '--delete-orphans', "With --sync, delete photos and videos in the root folder that are no longer in the source")
+    add_flag(p, '--dry-run', "Only report what would be placed, moved and deleted")
+    p.add_argument('--compare', choices=['mtime', 'hash'], help="How --sync checks files already in the root folder: size and mtime (default) or content hash")
+
+    video_commands = groups.add_parser('videos', help="Video operations").add_subparsers(dest='command', required=True)
+
+    p = add_command(video_commands, 'rename', videos_rename, "Rename videos to the standard format",
+                    subdirs=False, suffix='', date='', yes=False, plan='')
+    p.add_argument('path', nargs='?', help="Folder containing the videos")
+    add_flag(p, '--subdirs', "Include subdirectories")
+    p.add_argument('--suffix', help="Custom suffix, e.g. an event name")
+    p.add_argument('--date', help="Custom date (YYYYMMDD)")
+    add_flag(p, '--yes', "Apply the renames without asking for confirmation")
+    p.add_argument('--plan', help="Save the planned renames to this .jsonl or .csv file instead of applying them")
+
+    p = add_command(video_commands, 'burn-in', videos_burn_in, "Burn the date and a caption into videos",
+                    output='', text='', captions='', date='', subdirs=False)
+    p.add_argument('path', nargs='?', help="Video or folder of videos")
+    p.add_argument('--output', help="Output file or folder (default: overwrite originals)")
+    p.add_argument('--text', help="Caption to burn into every video")
+    p.add_argument('--captions', help="CSV/JSON manifest of captions keyed by file name or glob")
+    p.add_argument('--date', help="Custom date (YYYYMMDD, YYYYMM or YYYY) instead of the creation date")
+    add_flag(p, '--subdirs', "Include subdirectories")
+
+    renames_help = "Apply saved rename plans, and list, resume or roll back rename runs"
+    rename_commands = groups.add_parser('renames', help=renames_help, description=renames_help).add_subparsers(dest='command', required=True)
+
+    p = add_command(rename_commands, 'apply', renames_apply, "Apply a rename plan saved with --plan", yes=False)
+    p.add_argument('plan', nargs='?', help="Rename plan (.jsonl or .csv)")
+    add_flag(p, '--yes', "Apply the plan without asking for confirmation")
+
+    p = add_command(rename_commands, 'list', renames_list, "List journals of rename runs that did not finish")
+
+    p = add_command(rename_commands, 'resume', renames_resume, "Finish an interrupted rename run")
+    p.add_argument('journal', help="Rename journal (see `renames list`)")
+
+    p = add_command(rename_commands, 'rollback', renames_rollback, "Restore the original names of a rename run")
+    p.add_argument('journal', help="Rename journal (see `renames list`)")
+
+    catalog_commands = groups.add_parser('catalog', help="Metadata catalog operations").add_subparsers(dest='command', required=True)
+
+    p = add_command(catalog_commands, 'query', catalog_query, "List catalogued files matching every given filter")
+    p.add_argument('--from', dest='start', help="Earliest capture date (YYYYMMDD)")
+    p.add_argument('--to', dest='end', help="Latest capture date (YYYYMMDD), inclusive")
+    p.add_argument('--make', help="Camera make, e.g. Canon")
+    p.add_argument('--model', help="Camera model")
+    p.add_argument('--event', help="Event suffix given when renaming, e.g. italy")
+    p.add_argument('--under', help="Only files inside this folder")
+
+    return parser
+
+
+def apply_config(args, config_path) -> None:
+    with open(Path(config_path).expanduser(), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("Config file must contain a JSON object")
+    unknown = [key for key in config if key.replace('-', '_') not in vars(args) or key in ('handler', 'headless_defaults')]
+    if unknown:
+        raise ValueError(f"Unknown option(s) in config file: {', '.join(unknown)}")
+    for key, value in config.items():
+        key = key.replace('-', '_')
+        if getattr(args, key) in (None, []):
+            setattr(args, key, value)
+
+
+################ Main Function ################
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.config:
+            apply_config(args, args.config)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not load config file {args.config}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    for key, value in args.headless_defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+
+    prompts.INTERACTIVE = False
+    try:
+        ok = args.handler(args)
+    except prompts.MissingOptionError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+    return EXIT_OK if ok else EXIT_FAILED
@@ -5,10 +5,42 @@ Configuration options for the run module, including file extensions and EXIF tag
 
 # Determines the minimum number of photos required to create an event folder when restructuring folders.
 EVENT_FOLDER_THRESHOLD = 10
+# How restructure places files in a separate root folder: 'auto' (reflink, else an in-kernel copy, else a copy),
+# 'reflink', 'hardlink', 'copy_file_range', 'copy' or 'symlink'. See run/placement.py.
+RESTRUCTURE_PLACEMENT = 'auto'
+SYNC_MTIME_WINDOW = 2  # Seconds two modification times may differ by and still match when syncing a restructure
 
 FONT = 'Arial.ttf'  # Default font for metadata burning
 
-IMAGE_EXTENSIONS = [
+# Upper limit on worker processes used for parallel processing. None uses every available core.
+MAX_WORKERS = None
+
+# Uncompressed TIFF scans at or above this many pixels are captioned strip by strip instead of in memory.
+STRIP_RENDER_MIN_PIXELS = 200_000_000
+STRIP_ROWS = 256  # Rows decoded, converted and written per strip
+
+PREVIEW_PREFETCH = 4  # Previews decoded ahead of the one being captioned in verbose burn-in
+PREVIEW_SIZE = 300  # Longest side, in pixels, of preview thumbnails
+THUMBNAIL_CACHE_DIR = '~/.cache/archivist/thumbnails'  # Previews are cached here, keyed by path, size and mtime
+
+# SQLite catalog of per-file metadata (capture dates, EXIF, video creation times) shared between operations.
+# Set to None to always read files directly.
+CATALOG_PATH = '~/.cache/archivist/catalog.sqlite3'
+DATE_WORKERS = 8  # Threads reading capture dates (EXIF headers, ffprobe) while planning renames
+WALK_WORKERS = 4  # Threads listing subfolders ahead of a recursive walk (helps most on network drives)
+RESOLVE_BATCH = 500  # Files whose metadata is read (and held in memory) at a time by the batch readers
+# Worker processes reading EXIF/IPTC/XMP while exporting metadata (pyexiv2 holds the GIL, so threads wouldn't help).
+# None uses every available core, capped by MAX_WORKERS.
+EXPORT_WORKERS = None
+
+# Every bulk rename is journalled here first so an interrupted run can be resumed or rolled back.
+RENAME_JOURNAL_DIR = '~/.cache/archivist/rename-journals'
+RENAME_JOURNAL_BATCH = 1000  # Renames between journal fsyncs
+RENAME_JOURNALS_KEPT = 10  # Journals of finished runs kept (newest first) so they can still be rolled back
+RENAME_PREVIEW_LINES = 50  # Planned renames listed before asking to proceed (the rest are summarised)
+
+# Extension sets (lowercase). TIFF and HEIC/HEIF are listed as both images and RAW.
+IMAGE_EXTENSIONS = frozenset([
     '.jpg', '.jpeg', '.jpe', '.jif', '.jfif', '.jfi',
     '.png', '.apng',
     '.tiff', '.tif',
@@ -21,8 +53,8 @@ IMAGE_EXTENSIONS = [
     '.ico', '.cur',
     '.emf', '.wmf',
     '.ras', '.sun', '.im', '.pcx', '.xbm', '.xpm'
-]
-RAW_EXTENSIONS = [
+])
+RAW_EXTENSIONS = frozenset([
     '.cr2',  # Canon
     '.cr3',  # Canon
     '.nef',  # Nikon
@@ -52,17 +84,16 @@ RAW_EXTENSIONS = [
     '.bay',  # Casio
     '.x3f',  # Sigma
     '.cap',  # Phase One
-    '.iiq',  # Phase One
     '.mdc',  # Minolta
     '.tif',  # Some cameras use TIFF as RAW
     '.heic', # Some modern cameras/phones
     '.heif'  # Some modern cameras/phones
-]
-VIDEO_EXTENSIONS = [
+])
+VIDEO_EXTENSIONS = frozenset([
     '.mp4', '.mov', '.avi', '.mkv', '.wmv', '.mts', '.m2ts', '.3gp', '.webm',
     '.flv', '.f4v', '.f4p', '.f4a', '.f4b',  # Flash video
     '.mpg', '.mpeg', '.mpe', '.mpv', '.mp2', '.m2v',  # MPEG
-    '.ts', '.vob', '.mxf', '.roq', '.nsv',  # Misc
+    '.ts', '.vob', '.mxf', '.roq', '.nsv',  # Misc (.vob: DVD Video)
     '.ogv', '.ogg',  # Ogg
     '.rm', '.rmvb',  # RealMedia
     '.asf', '.asx',  # Advanced Streaming Format
@@ -78,13 +109,12 @@ VIDEO_EXTENSIONS = [
     '.m4v',  # Apple video
     '.skm',  # Samsung video
     '.trp',  # HD video
-    '.vob',  # DVD Video
     '.wtv',  # Windows Recorded TV Show
     '.mve',  # Interplay MVE
     '.ogm',  # OGM
     '.bik',  # Bink Video
     '.iso'   # Disc image (sometimes used for video)
-]
+])
 EXIF_TAG_MAP = {
     "ImageWidth": "Exif.Image.ImageWidth",
     "ImageLength": "Exif.Image.ImageLength",
@@ -172,3 +202,37 @@ EXIF_TAG_MAP = {
     "GPSDifferential": "Exif.GPSInfo.GPSDifferential",
     "GPSHPositioningError": "Exif.GPSInfo.GPSHPositioningError"
 }
+
+# XMP sidecars (written instead of modifying the image when requested) get each EXIF_TAG_MAP tag under the XMP
+# namespace of its EXIF group (Exif.Image.* -> Xmp.tiff.*, Exif.Photo.* and Exif.GPSInfo.* -> Xmp.exif.*)
+# unless listed here. Sub-second and time zone tags are folded into the dates, GPS references into coordinates.
+EXIF_XMP_OVERRIDES = {
+    "Exif.Image.DateTime": "Xmp.xmp.ModifyDate",
+    "Exif.Photo.DateTimeDigitized": "Xmp.xmp.CreateDate",
+    "Exif.Photo.LensMake": "Xmp.exifEX.LensMake",
+    "Exif.Photo.LensModel": "Xmp.exifEX.LensModel",
+    "Exif.Photo.CompositeImage": "Xmp.exifEX.CompositeImage",
+}
+IPTC_XMP_MAP = {
+    "Iptc.Application2.ObjectName": "Xmp.dc.title",
+    "Iptc.Application2.Caption": "Xmp.dc.description",
+    "Iptc.Application2.Keywords": "Xmp.dc.subject",
+    "Iptc.Application2.Byline": "Xmp.dc.creator",
+    "Iptc.Application2.Copyright": "Xmp.dc.rights",
+    "Iptc.Application2.Headline": "Xmp.photoshop.Headline",
+    "Iptc.Application2.BylineTitle": "Xmp.photoshop.AuthorsPosition",
+    "Iptc.Application2.Writer": "Xmp.photoshop.CaptionWriter",
+    "Iptc.Application2.Credit": "Xmp.photoshop.Credit",
+    "Iptc.Application2.Source": "Xmp.photoshop.Source",
+    "Iptc.Application2.City": "Xmp.photoshop.City",
+    "Iptc.Application2.ProvinceState": "Xmp.photoshop.State",
+    "Iptc.Application2.CountryName": "Xmp.photoshop.Country",
+    "Iptc.Application2.CountryCode": "Xmp.iptc.CountryCode",
+    "Iptc.Application2.SubLocation": "Xmp.iptc.Location",
+    "Iptc.Application2.SpecialInstructions": "Xmp.photoshop.Instructions",
+    "Iptc.Application2.TransmissionReference": "Xmp.photoshop.TransmissionReference",
+    "Iptc.Application2.Urgency": "Xmp.photoshop.Urgency",
+    "Iptc.Application2.Category": "Xmp.photoshop.Category",
+    "Iptc.Application2.SuppCategory": "Xmp.photoshop.SupplementalCategories",
+    "Iptc.Application2.DateCreated": "Xmp.photoshop.DateCreated",
+}
@@ -0,0 +1,128 @@
+'''
+Lossless metadata updates for JPEGs without re-serialising the whole file.
+
+A JPEG's metadata lives in segments ahead of the compressed image data: APP1 "Exif", APP1 XMP and APP13
+"Photoshop 3.0" (IPTC). splice_metadata memory-maps the file, hands just those segments to pyexiv2 inside a
+1x1 template JPEG and lets the caller edit them there. The file is then written anew as the rebuilt header
+followed by one sequential copy of everything from the image data on, and atomically replaces the original,
+so an interrupted write never leaves a torn file (but hard links to the original keep the old version). Image
+data is never decoded, so the cost is I/O rather than CPU whatever the file size.
+'''
+
+from functools import lru_cache
+from pathlib import Path
+import io
+import mmap
+import os
+import shutil
+import pyexiv2
+from PIL import Image
+
+
+SOI = b'\xff\xd8'
+SOS, EOI = 0xDA, 0xD9
+APP0, APP1, APP13 = 0xE0, 0xE1, 0xED
+# Markers with no length field (TEM and the restart markers)
+STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xD8)])
+METADATA_HEADERS = {
+    APP1: (b'Exif\x00\x00', b'http://ns.adobe.com/xap/1.0/\x00'),
+    APP13: (b'Photoshop 3.0\x00',),
+}
+
+
+def header_segments(data):
+    # ([(marker, start, end)] for the segments before the image data, offset of the image data), or None
+    # if data isn't a JPEG we can parse
+    if data[:2] != SOI:
+        return None
+    segments, pos = [], 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+        elif marker in (SOS, EOI):
+            return segments, pos
+        elif marker in STANDALONE_MARKERS:
+            pos += 2
+        else:
+            end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+            if end <= pos + 3 or end > len(data):
+                return None
+            segments.append((marker, pos, end))
+            pos = end
+    return None
+
+
+def is_metadata(data, marker, start) -> bool:
+    return any(data[start + 4:start + 4 + len(header)] == header for header in METADATA_HEADERS.get(marker, ()))
+
+
+@lru_cache(maxsize=1)
+def template_jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('L', (1, 1)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def copy_owner(src, dest) -> None:
+    # Ownership, where the platform has it and we're allowed to set it
+    if hasattr(os, 'chown'):
+        stat = os.stat(src)
+        try:
+            os.chown(dest, stat.st_uid, stat.st_gid)
+        except PermissionError:
+            pass
+
+
+def splice_metadata(path, edit) -> bool:
+    # Calls edit(img) with a pyexiv2 image holding path's metadata and writes the result into path, leaving
+    # the image data untouched. Returns False, without calling edit, if path isn't a JPEG this can handle.
+    path = Path(path)
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return False
+    with mm:
+        parsed = header_segments(mm)
+        if parsed is None:
+            return False
+        segments, image_start = parsed
+        old = [mm[start:end] for marker, start, end in segments if is_metadata(mm, marker, start)]
+        with pyexiv2.ImageData(SOI + b''.join(old) + template_jpeg()[2:]) as img:
+            edit(img)
+            edited = img.get_bytes()
+        edited_segments, _ = header_segments(edited)
+        new = [edited[start:end] for marker, start, end in edited_segments if is_metadata(edited, marker, start)]
+
+        # JFIF/JFXX segments must stay first; the metadata follows them, then the file's other segments in order
+        kept = [mm[start:end] for marker, start, end in segments if not is_metadata(mm, marker, start)]
+        leading = 0
+        while leading < len(kept) and kept[leading][1] == APP0:
+            leading += 1
+        header = b''.join([SOI, *kept[:leading], *new, *kept[leading:]])
+
+        # The file is rewritten beside the original, flushed to disk and swapped in, which gives it a new inode:
+        # hard links to the original keep the old version. Mode, flags, extended attributes and (where allowed)
+        # the owner are carried over; the modification time is left as now, as the file has changed.
+        part = path.with_name(path.name + '.part')
+        try:
+            with open(part, 'wb') as out, memoryview(mm) as view:
+                out.write(header)
+                out.write(view[image_start:])
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+    try:
+        shutil.copystat(path, part)
+        os.utime(part)
+        copy_owner(path, part)
+        os.replace(part, path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return True
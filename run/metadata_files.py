@@ -0,0 +1,361 @@
+'''
+Reading and writing metadata export files, one record at a time, so exporting or importing a large library
+never holds more than a batch of records in memory.
+
+Records are dicts such as {'File Name': ..., 'File Size': ..., 'EXIF Data': {tag: value}}. Formats:
+
+- json: the same indented array `json.dump` would write
+- jsonl: one record per line
+- csv and sqlite: one column per tag ('EXIF:Make', 'EXIF:DateTimeOriginal', ...), plus the file columns and
+  a 'Capture Date' column (ISO 8601, from the EXIF dates) for sorting and filtering. The set of columns is
+  the union over every record, gathered while records are spooled to a temporary file, and ordered file
+  columns first, then tags by name. SQLite columns are typed INTEGER, REAL or TEXT, a type only being chosen
+  if every value in the column converts to it and back unchanged, and the table is indexed on file name and
+  capture date. Non-scalar values (lists, dicts) are stored as JSON, in columns marked '[json]' in CSV
+  headers and declared JSON in SQLite, so every format reads back as the records that were written. (In CSV
+  an empty cell reads back as a missing tag.)
+
+Every export also writes a state file (metadata.state.jsonl.gz) holding each file's path relative to the
+exported folder, size, mtime_ns (and its XMP sidecar's) and tags, in walk order. An incremental export reads
+it alongside the walk and only re-reads files that are new or whose size or mtimes changed.
+
+Any format but sqlite can be compressed with a stdlib codec. Each file is written under a '.part' name and
+only renamed into place once it is complete, so an interrupted export never leaves a truncated file that
+looks finished.
+'''
+
+import bz2
+import csv
+import gzip
+import itertools
+import json
+import lzma
+import math
+import os
+import re
+import sqlite3
+import textwrap
+from pathlib import Path
+from .capture_date import parse_exif_date
+
+
+EXPORT_FORMATS = {'json': '.json', 'jsonl': '.jsonl', 'csv': '.csv', 'sqlite': '.sqlite'}
+TABULAR_FORMATS = ('csv', 'sqlite')
+
+# Nested tag dicts and the column prefix their tags get in tabular formats
+TAG_GROUPS = {'EXIF Data': 'EXIF', 'IPTC Data': 'IPTC', 'XMP Data': 'XMP'}
+FILE_COLUMNS = ['File Name', 'File Size', 'Date Created', 'Date Modified', 'Capture Date']
+CAPTURE_DATE_TAGS = ['DateTimeOriginal', 'DateTimeDigitized', 'DateTime']
+JSON_MARKER = '[json]'
+SQLITE_TABLE = 'metadata'
+SQLITE_BATCH = 1000  # Rows inserted per executemany
+JSON_READ_CHUNK = 1 << 16  # Characters read at a time when streaming a JSON array
+WHITESPACE = re.compile(r'\s*')
+
+# Column types, from the narrowest; a column takes the widest type any of its values needs
+COLUMN_TYPES = ['INTEGER', 'REAL', 'TEXT', 'JSON']
+
+STATE_FILE = 'metadata.state.jsonl.gz'
+STATE_HEADER = 'archivist-export-state'
+
+COMPRESSIONS = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+try:
+    from compression import zstd  # Python 3.14+
+    COMPRESSIONS['zst'] = zstd.open
+except ImportError:
+    pass
+
+
+def export_path(output_dir, fmt, compression=None) -> Path:
+    return Path(output_dir) / ("metadata" + EXPORT_FORMATS[fmt] + (f".{compression}" if compression else ""))
+
+
+def metadata_format(path) -> tuple:
+    # (format, compression) from a file name such as metadata.csv.gz, or (None, None) if unsupported
+    suffixes = [s.lower().lstrip('.') for s in Path(path).suffixes[-2:]]
+    compression = suffixes.pop() if suffixes and suffixes[-1] in COMPRESSIONS else None
+    fmt = suffixes[-1] if suffixes and suffixes[-1] in EXPORT_FORMATS else None
+    if fmt == 'sqlite' and compression:
+        return None, None
+    return (fmt, compression) if fmt else (None, None)
+
+
+############# Tabular Records #############
+
+
+def value_type(value) -> str:
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return 'JSON'
+    if isinstance(value, int):
+        return 'INTEGER' if abs(value) < 2 ** 63 else 'TEXT'
+    if isinstance(value, float):
+        return 'REAL' if math.isfinite(value) else 'TEXT'
+    # Only if the text is exactly what the number converts back to, so nothing is lost on import
+    try:
+        if str(int(value)) == value and abs(int(value)) < 2 ** 63:
+            return 'INTEGER'
+    except ValueError:
+        pass
+    try:
+        if math.isfinite(float(value)) and repr(float(value)) == value:
+            return 'REAL'
+    except ValueError:
+        pass
+    return 'TEXT'
+
+
+def capture_date_column(exif):
+    for tag in CAPTURE_DATE_TAGS:
+        dt = parse_exif_date(exif[tag]) if exif.get(tag) else None
+        if dt:
+            return dt.isoformat(sep=' ')
+    return None
+
+
+def flatten_record(record) -> dict:
+    row = {k: v for k, v in record.items() if k not in TAG_GROUPS}
+    row['Capture Date'] = capture_date_column(record.get('EXIF Data') or {})
+    for group, prefix in TAG_GROUPS.items():
+        for tag, value in (record.get(group) or {}).items():
+            row[f'{prefix}:{tag}'] = value
+    return {k: v for k, v in row.items() if v is not None}
+
+
+def unflatten_row(row, json_columns=()) -> dict:
+    # The record a flattened row was made from; tag values read back as strings, as they were exported
+    record = {}
+    groups = {prefix: group for group, prefix in TAG_GROUPS.items()}
+    for column, value in row.items():
+        if value is None or column == 'Capture Date':
+            continue
+        if column in json_columns:
+            value = json.loads(value)
+        prefix, _, tag = column.partition(':')
+        if tag and prefix in groups:
+            record.setdefault(groups[prefix], {})[tag] = value if column in json_columns else str(value)
+        elif column == 'File Size':
+            record[column] = int(value)
+        else:
+            record[column] = value
+    return record
+
+
+def ordered_columns(types) -> list:
+    return [c for c in FILE_COLUMNS if c in types] + sorted(c for c in types if c not in FILE_COLUMNS)
+
+
+def spooled_rows(writer):
+    writer['spool'].seek(0)
+    for line in writer['spool']:
+        yield json.loads(line)
+
+
+def finish_csv(writer) -> None:
+    columns = ordered_columns(writer['types'])
+    json_columns = {c for c in columns if writer['types'][c] == 'JSON'}
+    out = csv.writer(writer['file'])
+    out.writerow([c + JSON_MARKER if c in json_columns else c for c in columns])
+    for row in spooled_rows(writer):
+        out.writerow([json.dumps(row[c], ensure_ascii=False) if c in json_columns and c in row else row.get(c, '')
+                      for c in columns])
+
+
+def finish_sqlite(writer) -> None:
+    types = writer['types']
+    columns = ordered_columns(types)
+    converters = {'INTEGER': int, 'REAL': float, 'TEXT': str, 'JSON': lambda v: json.dumps(v, ensure_ascii=False)}
+    quote = lambda name: '"' + name.replace('"', '""') + '"'
+    conn = sqlite3.connect(writer['part'])
+    try:
+        conn.execute(f"CREATE TABLE {SQLITE_TABLE} ({', '.join(f'{quote(c)} {types[c]}' for c in columns)})")
+        insert = f"INSERT INTO {SQLITE_TABLE} VALUES ({', '.join('?' * len(columns))})"
+        rows = ([converters[types[c]](row[c]) if c in row else None for c in columns] for row in spooled_rows(writer))
+        while batch := list(itertools.islice(rows, SQLITE_BATCH)):
+            conn.executemany(insert, batch)
+        conn.execute(f"CREATE INDEX {SQLITE_TABLE}_file_name ON {SQLITE_TABLE} (\"File Name\")")
+        conn.execute(f"CREATE INDEX {SQLITE_TABLE}_capture_date ON {SQLITE_TABLE} (\"Capture Date\")")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+############# Writing #############
+
+
+# A writer is a dict holding the open (possibly compressed) file, its format and the number of records written.
+# Tabular formats also hold a spool of flattened rows and the type of every column seen so far.
+def open_writer(path, fmt, compression=None) -> dict:
+    path = Path(path)
+    part = path.with_name(path.name + '.part')
+    writer = {'path': path, 'part': part, 'format': fmt, 'count': 0, 'file': None}
+    if fmt != 'sqlite':
+        opener = COMPRESSIONS[compression] if compression else open
+        writer['file'] = opener(part, 'wt', encoding='utf-8', newline='')
+    if fmt in TABULAR_FORMATS:
+        writer['spool_path'] = path.with_name(path.name + '.spool')
+        writer['spool'] = open(writer['spool_path'], 'w+', encoding='utf-8')
+        writer['types'] = {c: 'INTEGER' if c == 'File Size' else 'TEXT' for c in FILE_COLUMNS}
+    elif fmt == 'json':
+        writer['file'].write('[')
+    return writer
+
+
+def write_record(writer, record) -> None:
+    fmt = writer['format']
+    if fmt in TABULAR_FORMATS:
+        row = flatten_record(record)
+        types = writer['types']
+        for column, value in row.items():
+            types[column] = max(types.get(column, 'INTEGER'), value_type(value), key=COLUMN_TYPES.index)
+        writer['spool'].write(json.dumps(row, ensure_ascii=False) + '\n')
+    elif fmt == 'jsonl':
+        writer['file'].write(json.dumps(record, ensure_ascii=False) + '\n')
+    else:
+        # Indented one level further, as an element of the top-level array
+        writer['file'].write((',\n' if writer['count'] else '\n') + textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), '  '))
+    writer['count'] += 1
+
+
+def close_writer(writer, complete=True) -> None:
+    # Moves the finished file into place, or discards it if the export didn't complete
+    try:
+        if complete and writer['format'] == 'json':
+            writer['file'].write('\n]' if writer['count'] else ']')
+        elif complete and writer['format'] == 'csv':
+            finish_csv(writer)
+        elif complete and writer['format'] == 'sqlite':
+            writer['part'].unlink(missing_ok=True)
+            finish_sqlite(writer)
+    finally:
+        if writer['file']:
+            writer['file'].close()
+        if 'spool' in writer:
+            writer['spool'].close()
+            writer['spool_path'].unlink(missing_ok=True)
+    if complete:
+        # Flushed to disk first, so a crash can't leave a truncated file in place of the previous one
+        with open(writer['part'], 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(writer['part'], writer['path'])
+    else:
+        writer['part'].unlink(missing_ok=True)
+
+
+############# Reading #############
+
+
+def iter_json_array(f, chunk_size=JSON_READ_CHUNK):
+    # Yields the elements of the JSON array in text file f one at a time, holding only the current element and
+    # one chunk of text in memory. Raises ValueError if f isn't an array.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    expect = '['  # Then 'first' (an element or ']'), 'element', or 'next' (',' or ']')
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if expect in ('first', 'element') and pos < len(buffer) and not (expect == 'first' and buffer[pos] == ']'):
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number cut off by the end of the chunk ("1." of "1.5") parses as a shorter one, so an element
+                # only counts once the ',' or ']' after it has been read
+                after = WHITESPACE.match(buffer, end).end()
+                if eof or (after < len(buffer) and buffer[after] in ',]'):
+                    yield value
+                    pos, expect = end, 'next'
+                    continue
+        elif pos < len(buffer):
+            char = buffer[pos]
+            if expect == '[' and char == '[':
+                expect = 'first'
+            elif expect in ('first', 'next') and char == ']':
+                return
+            elif expect == 'next' and char == ',':
+                expect = 'element'
+            else:
+                raise ValueError(f"Unexpected {char!r} at character {pos} of a JSON array chunk")
+            pos += 1
+            continue
+        if eof:
+            raise ValueError("JSON array ends before its closing ']'")
+        chunk = f.read(chunk_size)
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+
+
+def read_records(path):
+    # Yields the records of an export in any of the formats above (or a CSV from before tags had columns), one
+    # at a time whatever the format
+    path = Path(path)
+    fmt, compression = metadata_format(path)
+    if fmt == 'sqlite':
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            json_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({SQLITE_TABLE})') if row[2].upper() == 'JSON'}
+            cursor = conn.execute(f'SELECT * FROM {SQLITE_TABLE}')
+            columns = [d[0] for d in cursor.description]
+            for values in cursor:
+                yield unflatten_row(dict(zip(columns, values)), json_columns)
+        finally:
+            conn.close()
+        return
+    opener = COMPRESSIONS[compression] if compression else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if fmt == 'json':
+            yield from iter_json_array(f)
+        elif fmt == 'jsonl':
+            yield from (json.loads(line) for line in f if line.strip())
+        elif fmt == 'csv':
+            reader = csv.reader(f)
+            header = next(reader, [])
+            json_columns = {c[:-len(JSON_MARKER)] for c in header if c.endswith(JSON_MARKER)}
+            columns = [c[:-len(JSON_MARKER)] if c.endswith(JSON_MARKER) else c for c in header]
+            legacy = not any(c.partition(':')[0] in TAG_GROUPS.values() for c in columns)
+            for values in reader:
+                row = dict(zip(columns, values))
+                if legacy:
+                    # Whole tag dicts as JSON in 'EXIF Data' etc.
+                    for group in TAG_GROUPS:
+                        if isinstance(row.get(group), str):
+                            try:
+                                row[group] = json.loads(row[group])
+                            except ValueError:
+                                row[group] = {}
+                    yield row
+                else:
+                    yield unflatten_row({c: v if v != '' else None for c, v in row.items()}, json_columns)
+
+
+############# Export State #############
+
+
+def export_state_path(output_dir) -> Path:
+    return Path(output_dir) / STATE_FILE
+
+
+def open_state_writer(output_dir, folder, include_subdirs) -> dict:
+    writer = open_writer(export_state_path(output_dir), 'jsonl', 'gz')
+    write_record(writer, {'state': STATE_HEADER, 'version': 1, 'folder': str(folder), 'subdirs': bool(include_subdirs)})
+    return writer
+
+
+def write_state(writer, relative_path, stat, tags, sidecar_mtime_ns=None) -> None:
+    write_record(writer, {'path': relative_path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                          'sidecar_mtime_ns': sidecar_mtime_ns, 'tags': tags})
+
+
+def read_state(output_dir, folder, include_subdirs):
+    # The entries of the previous export of the same folder (with the same subfolder setting), or None
+    path = export_state_path(output_dir)
+    if not path.exists():
+        return None
+    records = read_records(path)
+    try:
+        header = next(records, {})
+    except (OSError, EOFError, ValueError):
+        return None
+    if header.get('state') != STATE_HEADER or header.get('folder') != str(folder) or header.get('subdirs') != bool(include_subdirs):
+        records.close()
+        return None
+    return records
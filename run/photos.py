@@ -1,19 +1,37 @@
-from .config import IMAGE_EXTENSIONS, RAW_EXTENSIONS, VIDEO_EXTENSIONS, EXIF_TAG_MAP, EVENT_FOLDER_THRESHOLD
+from .config import IMAGE_EXTENSIONS, EXIF_TAG_MAP, RESTRUCTURE_PLACEMENT, MAX_WORKERS, STRIP_RENDER_MIN_PIXELS, STRIP_ROWS, PREVIEW_PREFETCH, PREVIEW_SIZE, THUMBNAIL_CACHE_DIR, WALK_WORKERS, RESOLVE_BATCH, EXPORT_WORKERS
+from .prompts import ask, ask_yes_no, confirm
+from .captions import load_caption_manifest, caption_for
+from .capture_date import resolve_capture_date
+from .catalog import catalog_session
+from .jpeg_segments import splice_metadata
+from .placement import PLACEMENTS
+from .restructure import (restructure_info, is_restructured, plan_restructure, plan_sync, create_folders, place_files,
+                          prune_empty_folders)
+from .metadata_files import (EXPORT_FORMATS, COMPRESSIONS, export_path, metadata_format, open_writer, write_record, close_writer,
+                             read_records, export_state_path, open_state_writer, write_state, read_state)
+from . import catalog
+from .renamer import rename_files, review_plan, write_plan, warn_incomplete_journals
+from .sidecar import read_sidecar, sidecar_mtime_ns, to_xmp, with_sidecars, write_sidecar
+from .walker import walk_media, media_paths, walk_order, IMAGE, RAW, VIDEO
 import platform
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog
-from PIL import Image, ImageDraw, ImageFont, ImageOps, ExifTags, TiffImagePlugin, ImageTk
+from PIL import Image, ImageDraw, ImageFont, ImageOps, ExifTags, ImageTk
 from datetime import datetime
 import concurrent.futures
+import itertools
+import multiprocessing
 import threading
+import time
 import warnings
-from queue import Queue
 import re
-import csv
-import json
+import glob
 import shutil
-from collections import defaultdict
+import struct
+import hashlib
+import io
+from collections import Counter, defaultdict
 import pyexiv2
 import os
 
@@ -24,6 +42,16 @@ import os
 Image.MAX_IMAGE_PIXELS = None # Disable the limit on image size to prevent DecompressionBombError
 warnings.simplefilter('ignore', Image.DecompressionBombWarning)
 
+BURN_IN_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.png'])  # Formats the burn-in functions can write back
+
+# EXIF entries describing where data sits in the file they were exported from, never written back on import
+EXIF_LAYOUT_KEYS = frozenset([
+    'Exif.Image.ExifTag', 'Exif.Image.GPSTag', 'Exif.Photo.InteroperabilityTag',
+    'Exif.Image.StripOffsets', 'Exif.Image.StripByteCounts', 'Exif.Image.TileOffsets', 'Exif.Image.TileByteCounts',
+    'Exif.Image.JPEGInterchangeFormat', 'Exif.Image.JPEGInterchangeFormatLength',
+    'Exif.Thumbnail.JPEGInterchangeFormat', 'Exif.Thumbnail.JPEGInterchangeFormatLength',
+])
+
 
 ################### SUPPORTING FUNCTIONS ###################
 
@@ -61,51 +89,10 @@ def format_custom_date(date_str) -> str:
     return date_str
 
 
-def export_json(path, data):
-
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"Metadata exported to {path} (JSON)")
-
-
-def export_csv(path, data, fieldnames=None):
-    
-    if not fieldnames:
-        # Use keys from the first item if not provided
-        if data:
-            fieldnames = list(data[0].keys())
-        else:
-            fieldnames = []
-
-    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for meta in data:
-            row = meta.copy()
-            # Convert dict fields to string for CSV compatibility
-            for k, v in row.items():
-                if isinstance(v, dict):
-                    row[k] = str(v)
-            writer.writerow(row)
-    print(f"Metadata exported to {path} (CSV)")
-
-
-def process_image(in_path, out_path, custom_text) -> None:
-    try:
-        # Open the image and ensure proper orientation
-        img = Image.open(in_path)
-        img = ImageOps.exif_transpose(img).convert("RGB")
-    except Exception as e:
-        print(f"Error opening image {in_path}: {e}")
-        return
-
-    # Hardcode the bottom layer color to white and the text color to black
-    bottom_color = (255, 255, 255)  # Always white
-    text_color = (0, 0, 0)  # Always black
-
+def caption_layout(width, height, custom_text) -> dict:
     # Define font size relative to the image height (70% smaller than before)
     font_path = Path("fonts/arial.ttf")  # Path to the font file
-    font_size = int(img.height * 0.015)  # Fixed font size (~1.5% of image height)
+    font_size = int(height * 0.015)  # Fixed font size (~1.5% of image height)
     try:
         font = ImageFont.truetype(str(font_path), font_size)
     except OSError:
@@ -113,8 +100,8 @@ def process_image(in_path, out_path, custom_text) -> None:
         font = ImageFont.load_default()
 
     # Wrap the text if it exceeds the maximum width
-    draw = ImageDraw.Draw(img)
-    max_width = int(img.width * 0.8)  # Text width should not exceed 80% of image width
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    max_width = int(width * 0.8)  # Text width should not exceed 80% of image width
 
     def wrap_text(text, font, max_width):
         lines = []
@@ -138,31 +125,325 @@ def process_image(in_path, out_path, custom_text) -> None:
     line_height = draw.textbbox((0, 0), "A", font=font)[3]  # Height of one line
     total_text_height = line_height * len(wrapped_text) + int(font_size * 0.5)
 
+    # Position each line, centred, relative to the top of the bottom layer
+    lines = []
+    text_y = int(font_size * 0.25)
+    for line in wrapped_text:
+        text_width = draw.textbbox((0, 0), line, font=font)[2]
+        lines.append((line, (width - text_width) // 2, text_y))
+        text_y += line_height
+
+    return {
+        'font': font,
+        'lines': lines,
+        # Add a bottom layer proportional to the total text height
+        'bottom_height': total_text_height + int(font_size * 0.5),
+    }
+
+
+def draw_caption(img, layout, top) -> None:
+    # Draw the caption lines with the bottom layer starting at row `top` of img (may be negative for strips)
+    draw = ImageDraw.Draw(img)
+    for line, text_x, text_y in layout['lines']:
+        draw.text((text_x, top + text_y), line, font=layout['font'], fill=(0, 0, 0))  # Always black
+
+
+def process_image(in_path, out_path, custom_text) -> bool:
+    out_file = Path(out_path).with_name(re.sub(r'[ \(\)]', '_', Path(out_path).name))
+    try:
+        # Open the image and ensure proper orientation
+        img = Image.open(in_path)
+        if can_render_in_strips(img, out_file):
+            process_image_strips(img, out_file, custom_text)
+            return True
+        img = ImageOps.exif_transpose(img).convert("RGB")
+    except Exception as e:
+        print(f"Error opening image {in_path}: {e}")
+        return False
+
+    # Hardcode the bottom layer color to white and the text color to black
+    bottom_color = (255, 255, 255)  # Always white
+    layout = caption_layout(img.width, img.height, custom_text)
+
     # Add a bottom layer proportional to the total text height
-    bottom_height = total_text_height + int(font_size * 0.5)
-    new_img = Image.new("RGB", (img.width, img.height + bottom_height), bottom_color)
+    new_img = Image.new("RGB", (img.width, img.height + layout['bottom_height']), bottom_color)
     new_img.paste(img, (0, 0))
 
     # Draw the wrapped text on the bottom layer
-    draw = ImageDraw.Draw(new_img)
-    text_y = img.height + int(font_size * 0.25)
-    for line in wrapped_text:
-        text_width = draw.textbbox((0, 0), line, font=font)[2]
-        text_x = (new_img.width - text_width) // 2
-        draw.text((text_x, text_y), line, font=font, fill=text_color)
-        text_y += line_height
+    draw_caption(new_img, layout, img.height)
 
     # Save the modified image
-    out_file = Path(out_path).with_name(re.sub(r'[ \(\)]', '_', Path(out_path).name))
     new_img.save(out_file)
     print(f"Burned-in metadata to {out_file}")
+    return True
+
+
+# Huge uncompressed TIFF scans are rendered strip by strip so that neither the source nor the
+# captioned output is ever fully resident. Anything else goes through the in-memory path above.
+def can_render_in_strips(img, out_file) -> bool:
+    if img.format != 'TIFF' or out_file.suffix.lower() not in ('.tif', '.tiff'):
+        return False
+    if img.width * img.height < STRIP_RENDER_MIN_PIXELS or getattr(img, 'n_frames', 1) > 1:
+        return False
+    if img.mode in ('1', 'P', 'PA') or img.tag_v2.get(284, 1) != 1 or img.tag_v2.get(274, 1) != 1:
+        return False
+    return bool(img.tile) and all(tile[0] == 'raw' for tile in img.tile)
+
+
+def read_tiff_rows(img, rows=STRIP_ROWS):
+    # Yields (y, band) pairs covering the image top to bottom, reading raw tile data straight from disk
+    bytes_per_pixel = sum(img.tag_v2.get(258, (8,))) // 8
+    bands = defaultdict(list)
+    for tile in img.tile:
+        bands[(tile[1][1], tile[1][3])].append(tile)
+    with open(img.filename, 'rb') as f:
+        for (y0, y1), tiles in sorted(bands.items()):
+            if len(tiles) == 1 and tiles[0][1][0] == 0 and tiles[0][1][2] == img.width:
+                # Full-width strip: read it in chunks of `rows` rows, however tall the strip is
+                _, _, offset, (rawmode, stride, ystep) = tiles[0]
+                stride = stride or img.width * bytes_per_pixel
+                for y in range(y0, y1, rows):
+                    n = min(rows, y1 - y)
+                    f.seek(offset + (y - y0) * stride)
+                    data = f.read(n * stride)
+                    yield y, Image.frombytes(img.mode, (img.width, n), data, 'raw', rawmode, stride, ystep)
+            else:
+                # Tiled image: assemble one row of tiles at a time
+                band = Image.new(img.mode, (img.width, y1 - y0))
+                for _, (x0, _, x1, _), offset, (rawmode, stride, ystep) in tiles:
+                    stride = stride or (x1 - x0) * bytes_per_pixel
+                    f.seek(offset)
+                    data = f.read((y1 - y0) * stride)
+                    band.paste(Image.frombytes(img.mode, (x1 - x0, y1 - y0), data, 'raw', rawmode, stride, ystep), (x0, 0))
+                yield y0, band
+
+
+def write_tiff_header(f, width, height, rows_per_strip) -> None:
+    # Uncompressed 8-bit RGB, one strip per `rows_per_strip` rows, with pixel data following the IFD.
+    # Switches to BigTIFF when the pixel data would not fit in 32-bit offsets.
+    strip_bytes = width * 3 * rows_per_strip
+    strips = (height + rows_per_strip - 1) // rows_per_strip
+    big = width * height * 3 + 4096 + strips * 16 > 0xFFFFFFFF
+    entry, offset_fmt, long_type = (20, '<Q', 16) if big else (12, '<I', 4)
+    n_entries = 10
+    ifd_start = 16 if big else 8
+    extra_start = ifd_start + (8 if big else 2) + n_entries * entry + (8 if big else 4)
+    bps_offset = extra_start
+    offsets_offset = bps_offset + 6
+    counts_offset = offsets_offset + strips * struct.calcsize(offset_fmt)
+    data_start = counts_offset + strips * struct.calcsize(offset_fmt)
+    offsets = [data_start + i * strip_bytes for i in range(strips)]
+    counts = [min(rows_per_strip, height - i * rows_per_strip) * width * 3 for i in range(strips)]
+
+    def tag(code, type_, count, value):
+        if big:
+            return struct.pack('<HHQQ', code, type_, count, value)
+        return struct.pack('<HHII', code, type_, count, value)
+
+    def inline(code, value):
+        # SHORT and LONG values that fit in the entry are stored directly
+        return tag(code, 3, 1, value) if value < 0x10000 else tag(code, 4, 1, value)
+
+    def array(code, values, at):
+        if len(values) == 1:
+            return tag(code, long_type, 1, values[0])
+        return tag(code, long_type, len(values), at)
+
+    header = struct.pack('<2sHHHQ', b'II', 43, 8, 0, ifd_start) if big else struct.pack('<2sHI', b'II', 42, ifd_start)
+    # BitsPerSample (8, 8, 8) fits inside a BigTIFF entry, so it is only stored out of line for classic TIFF
+    bps = struct.pack('<HHQHHHH', 258, 3, 3, 8, 8, 8, 0) if big else tag(258, 3, 3, bps_offset)
+    entries = [
+        inline(256, width), inline(257, height), bps, inline(259, 1), inline(262, 2),
+        array(273, offsets, offsets_offset), inline(277, 3), inline(278, rows_per_strip),
+        array(279, counts, counts_offset), inline(284, 1),
+    ]
+    f.write(header)
+    f.write(struct.pack('<Q' if big else '<H', n_entries))
+    f.write(b''.join(entries))
+    f.write(struct.pack(offset_fmt, 0))  # No further IFDs
+    f.write(struct.pack('<HHH', 8, 8, 8))
+    f.write(b''.join(struct.pack(offset_fmt, o) for o in offsets))
+    f.write(b''.join(struct.pack(offset_fmt, c) for c in counts))
+
+
+def process_image_strips(img, out_file, custom_text) -> None:
+    layout = caption_layout(img.width, img.height, custom_text)
+    height = img.height + layout['bottom_height']
+    rows = STRIP_ROWS
+    # Written beside the target and swapped in at the end, as the target is usually the source being read
+    part = out_file.with_name(out_file.name + '.part')
+    try:
+        with open(part, 'wb') as f:
+            write_tiff_header(f, img.width, height, rows)
+            # The original rows pass straight through, converted to RGB a strip at a time
+            for _, band in read_tiff_rows(img, rows):
+                f.write(band.convert("RGB").tobytes())
+            # Then the caption band is rendered and appended in strips of the same height
+            for top in range(0, layout['bottom_height'], rows):
+                strip = Image.new("RGB", (img.width, min(rows, layout['bottom_height'] - top)), (255, 255, 255))
+                draw_caption(strip, layout, -top)
+                f.write(strip.tobytes())
+        img.close()
+        os.replace(part, out_file)
+    except BaseException:
+        img.close()
+        part.unlink(missing_ok=True)
+        raise
+    print(f"Burned-in metadata to {out_file} (rendered in strips)")
+
+
+# Basic burn-in for a single image. Lives at module level (rather than inside burn_in_metadata_basic)
+# so it can be sent to worker processes; returns (success, message) instead of printing so the caller
+# can report results in a deterministic order.
+def process_image_basic(in_path, out_path, custom_text=None, custom_date=None, capture_dt=None) -> tuple:
+    # Transpose in place and keep the decoded mode so the only full-frame work is the decode and save
+    try:
+        img = Image.open(in_path); img.load(); ImageOps.exif_transpose(img, in_place=True)
+        if img.mode not in ("RGB", "L"): img = img.convert("RGB")
+    except Exception as e: return False, f"Error opening image {in_path}: {e}"
+    # The capture date is only looked up when there's no custom date to show instead
+    if custom_date:
+        timestamp = format_custom_date(custom_date)
+    else:
+        timestamp = format_datetime(capture_dt or resolve_capture_date(in_path)[0])
+    display_text = f"{timestamp}{f' | {custom_text}' if custom_text else ''}"
+    font_size = int(min(img.size) * 0.045)
+    try: font = ImageFont.truetype("arial.ttf", font_size)
+    except: font = ImageFont.load_default()
+    text_bbox = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0,0), display_text, font=font)
+    pos = (img.width - (text_bbox[2]-text_bbox[0]) - int(min(img.size)*0.01), img.height - (text_bbox[3]-text_bbox[1]) - int(min(img.size)*0.01))
+    # Only the text's bounding box (plus the 1px outline) is composited; the rest of the frame is untouched
+    box = (max(pos[0]+text_bbox[0]-1, 0), max(pos[1]+text_bbox[1]-1, 0),
+           min(pos[0]+text_bbox[2]+1, img.width), min(pos[1]+text_bbox[3]+1, img.height))
+    if box[2] > box[0] and box[3] > box[1]:
+        txt_overlay = Image.new("RGBA", (box[2]-box[0], box[3]-box[1]), (255,255,255,0))
+        draw = ImageDraw.Draw(txt_overlay)
+        origin = (pos[0]-box[0], pos[1]-box[1])
+        for dx in range(-1,2):
+            for dy in range(-1,2):
+                if (dx or dy) and abs(dx)+abs(dy)<=2:
+                    draw.text((origin[0]+dx,origin[1]+dy), display_text, font=font, fill=(0,0,0,255))
+        draw.text(origin, display_text, font=font, fill=(255,255,255,160))
+        region = Image.alpha_composite(img.crop(box).convert("RGBA"), txt_overlay)
+        img.paste(region.convert(img.mode), box[:2])
+    out_file = Path(out_path).with_name(re.sub(r'[ \(\)]', '_', Path(out_path).name))
+    try: img.save(out_file)
+    except Exception as e: return False, f"Error saving image {out_file}: {e}"
+    return True, f"Burned-in metadata to {out_file}"
+
+
+def resolve_worker_count(requested=None) -> int:
+    cap = os.cpu_count() or 1
+    if MAX_WORKERS:
+        cap = min(cap, MAX_WORKERS)
+    if requested:
+        cap = min(cap, requested)
+    return max(1, cap)
+
+
+# Run process_image_basic over many images. Results are printed in input order regardless of
+# which worker finishes first, so output and error reporting stay the same between runs.
+def run_burn_in_basic(tasks, workers=1) -> int:
+    failed = 0
+    start = time.perf_counter()
+    if workers > 1 and len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(process_image_basic, *zip(*tasks), chunksize=max(1, len(tasks) // (workers * 8)))
+            for ok, message in results:
+                print(message)
+                if not ok: failed += 1
+    else:
+        for task in tasks:
+            ok, message = process_image_basic(*task)
+            print(message)
+            if not ok: failed += 1
+    elapsed = time.perf_counter() - start
+    rate = len(tasks) / elapsed if elapsed > 0 else 0.0
+    print(f"\n📊 Processed {len(tasks)} image(s) in {elapsed:.1f}s ({rate:.2f} images/sec, {workers} worker(s)), {failed} failed.")
+    return failed
+
+
+# Rotations/flips for each EXIF orientation, for thumbnails that have no EXIF of their own
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180, 4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE, 6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE, 8: Image.Transpose.ROTATE_90,
+}
+
+
+def embedded_thumbnail(img, size):
+    # The camera's EXIF (IFD1) JPEG thumbnail, if present and at least half the preview size
+    raw_exif = img.info.get('exif')
+    if not raw_exif:
+        return None
+    exif = img.getexif()
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset, length = ifd1.get(0x0201), ifd1.get(0x0202)  # JPEGInterchangeFormat, JPEGInterchangeFormatLength
+    if not offset or not length:
+        return None
+    start = offset + (6 if raw_exif.startswith(b"Exif\x00\x00") else 0)
+    try:
+        thumb = Image.open(io.BytesIO(raw_exif[start:start + length]))
+        thumb.load()
+    except Exception:
+        return None
+    if max(thumb.size) < size // 2:
+        return None
+    transpose = ORIENTATION_TRANSPOSE.get(exif.get(0x0112))
+    return thumb.transpose(transpose) if transpose else thumb
+
+
+def reduced_decode(img, size):
+    # Decode at the smallest scale that still covers the preview: JPEG draft mode (1/2, 1/4 or 1/8 scale
+    # DCT decoding), or a reduced-resolution subfile of a multi-page TIFF
+    if img.format == 'JPEG':
+        img.draft('RGB', (size, size))
+    elif img.format == 'TIFF' and getattr(img, 'n_frames', 1) > 1:
+        best = (img.width * img.height, 0)
+        for frame in range(img.n_frames):
+            img.seek(frame)
+            if frame == 0 or img.tag_v2.get(254, 0) & 1:  # NewSubfileType: reduced-resolution image
+                if min(img.size) >= size and img.width * img.height < best[0]:
+                    best = (img.width * img.height, frame)
+        img.seek(best[1])
+    transpose = ORIENTATION_TRANSPOSE.get(img.getexif().get(0x0112))
+    img.thumbnail((size, size))
+    return img.transpose(transpose) if transpose else img
+
+
+def load_preview(image_path, size=PREVIEW_SIZE):
+    # Shrink an image for show_preview; safe to run off the Tk main thread. Tries the on-disk thumbnail
+    # cache (keyed by path, size and mtime), then the embedded EXIF thumbnail, then a reduced-scale decode.
+    image_path = Path(image_path)
+    stat = image_path.stat()
+    key = hashlib.sha1(f"{image_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{size}".encode()).hexdigest()
+    cache_file = Path(THUMBNAIL_CACHE_DIR).expanduser() / key[:2] / f"{key}.jpg"
+    try:
+        with Image.open(cache_file) as cached:
+            cached.load()
+            return cached
+    except (OSError, ValueError):
+        pass
+
+    with Image.open(image_path) as img:
+        preview = embedded_thumbnail(img, size) or reduced_decode(img, size)
+        preview.load()
+    if preview.mode not in ("RGB", "L"):
+        preview = preview.convert("RGB")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"{cache_file.stem}.{threading.get_ident()}.tmp")
+        preview.save(tmp_file, format="JPEG", quality=85)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"⚠️  Warning: Could not cache preview for {image_path}: {e}")
+    return preview
 
 
-def show_preview(image_path, root):
+def show_preview(image_path, root, img=None):
     try:
-        # Load the image
-        img = Image.open(image_path)
-        img.thumbnail((300, 300))  # Resize the image for preview
+        # Load the image unless it was prefetched
+        if img is None:
+            img = load_preview(image_path)
 
         # Create a new top-level window for the preview
         preview_window = tk.Toplevel(root)
@@ -182,8 +463,8 @@ def show_preview(image_path, root):
         label.pack()
 
         # Center the window on the screen
-        window_width = 320
-        window_height = 320
+        window_width = PREVIEW_SIZE + 20
+        window_height = PREVIEW_SIZE + 20
         screen_width = root.winfo_screenwidth()
         screen_height = root.winfo_screenheight()
         position_top = int(screen_height / 2 - window_height / 2)
@@ -199,16 +480,20 @@ def show_preview(image_path, root):
 
 
 # Burn-in metadata to photographs with optional custom text and date for longjevity
-def burn_in_metadata_basic() -> None:
+def burn_in_metadata_basic(image_path=None, output_path=None, per_photo_suffix=None, custom_text=None,
+                           custom_date=None, include_subdirs=None, workers=None, caption_manifest=None) -> bool:
     print("\n" + "═" * 50)
     print("🔥  Burn-in (basic) Metadata to Photographs  🔥".center(50))
     print("═" * 50)
-    image_path = input(" Enter path to the image or folder: ").strip()
-    output_path = input(" Enter output path (leave blank to overwrite original): ").strip()
-    per_photo_suffix = input(" Add suffix to each photo individually? (y/n): ").strip().lower() == 'y'
-    custom_text = None if per_photo_suffix else input(" Enter custom text to burn in to all photos: ").strip()
-    use_custom_date = input(" Use custom date? (y/n): ").strip().lower() == 'y'
-    custom_date = input(" Enter date (YYYYMMDD): ").strip() if use_custom_date else None
+    image_path = ask(image_path, " Enter path to the image or folder: ")
+    output_path = ask(output_path, " Enter output path (leave blank to overwrite original): ")
+    per_photo_suffix = ask_yes_no(per_photo_suffix, " Add suffix to each photo individually? (y/n): ")
+    custom_text = None if per_photo_suffix else ask(custom_text, " Enter custom text to burn in to all photos: ")
+    caption_manifest = ask(caption_manifest, " Caption manifest file (CSV/JSON, leave blank to type each caption): ") if per_photo_suffix else None
+    try: manifest = load_caption_manifest(caption_manifest) if caption_manifest else None
+    except Exception as e: print(f"Could not read caption manifest {caption_manifest}: {e}"); return False
+    use_custom_date = ask_yes_no(None if custom_date is None else bool(custom_date), " Use custom date? (y/n): ")
+    custom_date = ask(custom_date, " Enter date (YYYYMMDD): ") if use_custom_date else None
 
     # Convert Windows paths to WSL format if running on Linux
     if platform.system() == 'Linux' and ':' in image_path and '\\' in image_path:
@@ -218,107 +503,118 @@ def burn_in_metadata_basic() -> None:
 
     # Validate paths
     if Path(image_path).is_dir():
-        include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
+        include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
+        # Every available core (capped by MAX_WORKERS) unless the caller asked for fewer
+        workers = resolve_worker_count(workers)
     else:
         include_subdirs = False
-
-    # Main image processing logic
-    def process_image(in_path, out_path, custom_text=None) -> None:
-        try: img = Image.open(in_path); img = ImageOps.exif_transpose(img).convert("RGBA")
-        except Exception as e: print(f"Error opening image {in_path}: {e}"); return
-        try: raw = img._getexif(); exif = {ExifTags.TAGS.get(k, k): v for k, v in raw.items()} if raw else {}
-        except: exif = {}
-        dt_obj = None
-        for k in ['SubSecDateTimeOriginal', 'DateTimeOriginal', 'SubSecCreateDate']:
-            if k in exif:
-                for fmt in ('%Y:%m:%d %H:%M:%S.%f', '%Y:%m:%d %H:%M:%S'):
-                    try: dt_obj = datetime.strptime(exif[k], fmt); break
-                    except: continue
-            if dt_obj: break
-        if not dt_obj:
-            m = re.search(r'(\d{8})[_\-]?(\d{6})', in_path.name)
-            if m:
-                try: dt_obj = datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S")
-                except: pass
-            if not dt_obj:
-                m = re.search(r'(\d{8})', in_path.name)
-                if m:
-                    try: dt_obj = datetime.strptime(m.group(1), "%Y%m%d")
-                    except: pass
-        if not dt_obj:
-            stat = in_path.stat()
-            dt_obj = datetime.fromtimestamp(stat.st_mtime)
-        timestamp = format_custom_date(custom_date) if custom_date else format_datetime(dt_obj)
-        display_text = f"{timestamp}{f' | {custom_text}' if custom_text else ''}"
-        txt_overlay = Image.new("RGBA", img.size, (255,255,255,0))
-        draw = ImageDraw.Draw(txt_overlay)
-        font_size = int(min(img.size) * 0.045)
-        try: font = ImageFont.truetype("arial.ttf", font_size)
-        except: font = ImageFont.load_default()
-        text_bbox = draw.textbbox((0,0), display_text, font=font)
-        pos = (img.width - (text_bbox[2]-text_bbox[0]) - int(min(img.size)*0.01), img.height - (text_bbox[3]-text_bbox[1]) - int(min(img.size)*0.01))
-        for dx in range(-1,2):
-            for dy in range(-1,2):
-                if (dx or dy) and abs(dx)+abs(dy)<=2:
-                    draw.text((pos[0]+dx,pos[1]+dy), display_text, font=font, fill=(0,0,0,255))
-        draw.text(pos, display_text, font=font, fill=(255,255,255,160))
-        out_file = Path(out_path).with_name(re.sub(r'[ \(\)]', '_', Path(out_path).name))
-        Image.alpha_composite(img, txt_overlay).convert("RGB").save(out_file)
-        print(f"Burned-in metadata to {out_file}")
+        workers = 1
 
     path = Path(image_path)
-    if not path.exists(): print(f"Path not found: {image_path}"); return
+    if not path.exists(): print(f"Path not found: {image_path}"); return False
     if path.is_dir():
         output_folder = Path(output_path) if output_path else None
         if output_folder: output_folder.mkdir(parents=True, exist_ok=True)
-        files = path.rglob('*') if include_subdirs else path.glob('*')
-        images = [p for p in files if p.suffix.lower() in ['.jpg', '.jpeg', '.png']]
-        if not images: print(f"No images found in {image_path}"); return
+        images = sorted(m.path for m in walk_media(path, include_subdirs, [IMAGE]) if m.ext in BURN_IN_EXTENSIONS)
+        if not images: print(f"No images found in {image_path}"); return False
+        # Collect every caption before any work starts so the images can be processed in parallel
+        tasks = []
+        uncaptioned = []
         for img_path in images:
             out_file = (output_folder / img_path.name) if output_folder else img_path
-            if per_photo_suffix:
-                try: custom_text = input(f"Enter custom suffix for '{img_path.name}' (leave blank for none): ").strip()
+            if manifest:
+                custom_text = caption_for(manifest, img_path, path)
+                if custom_text is None: uncaptioned.append(img_path.name)
+                tasks.append((img_path, out_file, custom_text if custom_text else None, custom_date))
+            elif per_photo_suffix:
+                try: custom_text = ask(None, f"Enter custom suffix for '{img_path.name}' (leave blank for none): ")
                 except EOFError: custom_text = ""
-                process_image(img_path, out_file, custom_text if custom_text else None)
-            else: process_image(img_path, out_file, custom_text)
+                tasks.append((img_path, out_file, custom_text if custom_text else None, custom_date))
+            else: tasks.append((img_path, out_file, custom_text, custom_date))
+        if uncaptioned:
+            print(f"⚠️  {len(uncaptioned)} image(s) have no entry in the caption manifest and will only show the date: {', '.join(uncaptioned[:10])}{' ...' if len(uncaptioned) > 10 else ''}")
+        # Capture dates come from the catalog here so the workers never need their own connection
+        if not custom_date:
+            with catalog_session() as conn:
+                tasks = [task + (catalog.capture_date(conn, task[0])[0],) for task in tasks]
+        return run_burn_in_basic(tasks, workers) == 0
     else:
-        if not path.suffix.lower() in [".jpg", ".jpeg", ".png"]:
-            print(f"File is not a supported image: {image_path}"); return
+        if not path.suffix.lower() in BURN_IN_EXTENSIONS:
+            print(f"File is not a supported image: {image_path}"); return False
         out_file = Path(output_path) if output_path else path
-        if per_photo_suffix:
-            try: custom_text = input(f"Enter custom suffix for '{path.name}' (leave blank for none): ").strip()
+        if manifest:
+            custom_text = caption_for(manifest, path)
+        elif per_photo_suffix:
+            try: custom_text = ask(None, f"Enter custom suffix for '{path.name}' (leave blank for none): ")
             except EOFError: custom_text = ""
-            process_image(path, out_file, custom_text if custom_text else None)
-        else: process_image(path, out_file, custom_text)
-
+        task = (path, out_file, custom_text if custom_text else None, custom_date)
+        # The capture date comes from the catalog, as for a folder
+        if not custom_date:
+            with catalog_session() as conn:
+                task += (catalog.capture_date(conn, path)[0],)
+        return run_burn_in_basic([task]) == 0
+
+
+# Caption each photo in a Tk window, or with custom_text set, burn the same caption into every photo without a GUI
+def burn_in_metadata_verbose(image_path=None, output_path=None, include_subdirs=None, custom_text=None) -> bool:
+    def prefetch_previews():
+        # Decode the next few previews in the background while the current one is being captioned
+        for upcoming in image_paths[:PREVIEW_PREFETCH]:
+            if upcoming not in previews:
+                previews[upcoming] = preview_pool.submit(load_preview, upcoming)
+
+    def finish():
+        nonlocal current_window
+        if current_window:
+            current_window.destroy()  # Close the last preview window
+            current_window = None
+        pending = sum(1 for _, future in renders if not future.done())
+        if pending:
+            caption_label.config(text=f"Saving {pending} remaining image(s)...")
+            submit_button.config(state=tk.DISABLED)
+            root.update()
+            print(f"⏳ Waiting for {pending} image(s) to finish saving...")
+        for rendered_path, future in renders:
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"Error processing image {rendered_path}: {e}")
+                ok = False
+            if not ok: failed.append(rendered_path)
+        preview_pool.shutdown(cancel_futures=True)
+        render_pool.shutdown()
+        print(f"📊 Saved {len(renders) - len(failed)} of {len(renders)} captioned image(s).")
+        root.destroy()  # Close the main Tkinter window
 
-def burn_in_metadata_verbose():
     def process_next_image():
-        nonlocal image_paths, current_window
+        nonlocal current_window
 
         # If there are no more images, exit the application
         if not image_paths:
             print("✅ All images have been processed.")
-            if current_window:
-                current_window.destroy()  # Close the last preview window
-            root.destroy()  # Close the main Tkinter window
+            finish()
             return
 
         # Get the next image path from the list
         img_path = image_paths.pop(0)
+        prefetched = previews.pop(img_path, None)
+        prefetch_previews()
 
         # Show the preview for the current image
         if current_window:
             current_window.destroy()  # Close the previous window
-        current_window = show_preview(img_path, root)
+        try: preview_img = prefetched.result() if prefetched else None
+        except Exception: preview_img = None  # show_preview retries and reports the error
+        current_window = show_preview(img_path, root, preview_img)
 
         # Prompt the user for input (non-blocking)
         def on_submit():
             # Get the caption entered by the user
             custom_text = caption_entry.get().strip()
             if custom_text:
+                # Render and save in a worker process so the next caption can be typed straight away
                 out_file = (output_folder / img_path.name) if output_folder else img_path
-                process_image(img_path, out_file, custom_text)
+                renders.append((img_path, render_pool.submit(process_image, img_path, out_file, custom_text)))
             caption_entry.delete(0, tk.END)  # Clear the input field
 
             # Process the next image
@@ -329,37 +625,48 @@ def burn_in_metadata_verbose():
         submit_button.config(command=on_submit)
 
     # Initialize paths
-    image_path = input(" Enter path to the image or folder: ").strip()
-    output_path = input(" Enter output path (leave blank to overwrite original): ").strip()
-    include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
+    image_path = ask(image_path, " Enter path to the image or folder: ")
+    output_path = ask(output_path, " Enter output path (leave blank to overwrite original): ")
+    include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
 
     path = Path(image_path)
     if not path.exists():
         print(f"❌ Path not found: {image_path}")
-        return
+        return False
 
     # Gather all images
     if path.is_dir():
-        files = path.rglob('*') if include_subdirs else path.glob('*')
-        image_paths = [p for p in files if p.suffix.lower() in ['.jpg', '.jpeg', '.png']]
+        image_paths = [m.path for m in walk_media(path, include_subdirs, [IMAGE]) if m.ext in BURN_IN_EXTENSIONS]
     else:
-        if path.suffix.lower() not in [".jpg", ".jpeg", ".png"]:
+        if path.suffix.lower() not in BURN_IN_EXTENSIONS:
             print(f"❌ File is not a supported image: {image_path}")
-            return
+            return False
         image_paths = [path]
 
     if not image_paths:
         print(f"❌ No images found in {image_path}")
-        return
+        return False
 
     # Prepare output folder
     output_folder = Path(output_path) if output_path else None
     if output_folder:
         output_folder.mkdir(parents=True, exist_ok=True)
 
+    if custom_text:
+        results = [process_image(img_path, (output_folder / img_path.name) if output_folder else img_path, custom_text)
+                   for img_path in image_paths]
+        return all(results)
+
+    # Renders run in spawned (not forked) processes so workers never inherit the Tk connection
+    previews, renders, failed = {}, [], []
+    preview_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    render_pool = concurrent.futures.ProcessPoolExecutor(max_workers=resolve_worker_count(),
+                                                         mp_context=multiprocessing.get_context('spawn'))
+
     # Create the Tkinter root window
     root = tk.Tk()
     root.title("Burn-in Metadata")
+    root.protocol("WM_DELETE_WINDOW", finish)  # Closing the window still saves what was captioned
 
     # Add UI components to the main window
     caption_label = tk.Label(root, text="Enter custom text:", wraplength=400)
@@ -373,60 +680,42 @@ def burn_in_metadata_verbose():
 
     # Start processing the first image
     current_window = None
+    prefetch_previews()
     process_next_image()
 
     # Run the Tkinter event loop
     root.mainloop()
+    return not failed
 
 
 # Rename digital or film photographs based on EXIF data or custom date
-def rename_digital() -> None:
+def rename_digital(folder_path=None, include_subdirs=None, include_raw=None, custom_suffix=None, custom_date=None,
+                   include_video=None, assume_yes=False, plan_file=None) -> bool:
     print("\n" + "═" * 50)
     print("🖼️  Rename Digital Photographs  🖼️".center(50))
     print("═" * 50)
+    warn_incomplete_journals()
     print("\nNote: For events, please use strings without numbers e.g. Italy, or Trip to Yorkshire.\nIf you fail to do this the the Restructure Folders function will not work correctly.\n")
-    folder_path = input(" Enter folder path: ").strip()
-    include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
-    include_raw = input(" Include RAW files? (y/n): ").strip().lower() == 'y'
-    custom_suffix = input(" Custom suffix (leave blank for none): ").strip()
-    use_custom_date = input(" Use custom date? (y/n): ").strip().lower() == 'y'
-    custom_date = input(" Enter date (YYYYMMDD): ").strip() if use_custom_date else None
-    include_video = input(" Include videos? (y/n): ").strip().lower() == 'y'
+    folder_path = ask(folder_path, " Enter folder path: ")
+    include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
+    include_raw = ask_yes_no(include_raw, " Include RAW files? (y/n): ")
+    custom_suffix = ask(custom_suffix, " Custom suffix (leave blank for none): ")
+    use_custom_date = ask_yes_no(None if custom_date is None else bool(custom_date), " Use custom date? (y/n): ")
+    custom_date = ask(custom_date, " Enter date (YYYYMMDD): ") if use_custom_date else None
+    include_video = ask_yes_no(include_video, " Include videos? (y/n): ")
 
     # Convert Windows paths to WSL format if running on Linux
     folder = convert_windows_path_to_wsl(folder_path) if (platform.system() == 'Linux' and ':' in folder_path and '\\' in folder_path) else folder_path
     folder = Path(folder).resolve()
     if not folder.is_dir(): raise ValueError(f"Not a directory: {folder}")
-    files = folder.rglob('*') if include_subdirs else folder.iterdir()
-    valid_exts = IMAGE_EXTENSIONS + RAW_EXTENSIONS if include_raw else IMAGE_EXTENSIONS
-    if include_video: valid_exts += VIDEO_EXTENSIONS
+    kinds = [IMAGE] + ([RAW] if include_raw else []) + ([VIDEO] if include_video else [])
     custom_suffix = '_'.join(custom_suffix.split()).lower() if custom_suffix else ""
     base_name_to_files = {}
-    for file_path in files:
-        if not file_path.is_file() or file_path.suffix.lower() not in valid_exts: continue
-        # --- Get EXIF or fallback date ---
-        try: img = Image.open(file_path); raw = img._getexif(); exif = {ExifTags.TAGS.get(k, k): v for k, v in raw.items()} if raw else {}
-        except: exif = {}
-        dt = None
-        for k in ['SubSecDateTimeOriginal', 'DateTimeOriginal', 'SubSecCreateDate']:
-            if k in exif:
-                for fmt in ('%Y:%m:%d %H:%M:%S.%f', '%Y:%m:%d %H:%M:%S'):
-                    try: dt = datetime.strptime(exif[k], fmt); break
-                    except: continue
-            if dt: break
-        if not dt:
-            m = re.search(r'(\d{8})[_\-]?(\d{6})', file_path.name)
-            if m:
-                try: dt = datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S")
-                except: pass
-            if not dt:
-                m = re.search(r'(\d{8})', file_path.name)
-                if m:
-                    try: dt = datetime.strptime(m.group(1), "%Y%m%d")
-                    except: pass
-        if not dt:
-            stat = file_path.stat()
-            dt = datetime.fromtimestamp(stat.st_mtime)
+    candidates = list(walk_media(folder, include_subdirs, kinds, workers=WALK_WORKERS))
+    # --- Get EXIF or fallback dates (from the catalog, or the metadata headers read concurrently) ---
+    with catalog_session() as conn:
+        dates = catalog.capture_dates(conn, candidates)
+    for file_path, (dt, _) in zip((m.path for m in candidates), dates):
         if custom_date:
             try: custom_date_obj = datetime.strptime(custom_date, "%Y%m%d")
             except: custom_date_obj = None
@@ -448,37 +737,35 @@ def rename_digital() -> None:
             new_name = f"{base}{f'_{idx}' if len(files_list) > 1 else ''}{suffix}"
             new_path = file_path.with_name(new_name)
             preview.append((file_path, new_path))
+    preview = with_sidecars(preview)
 
-    print("\nPlanned renames:")
-    for old, new in preview:
-        print(f"{old.name} -> {new.name}")
+    groups = {base: len(files_list) for base, files_list in base_name_to_files.items()}
+    if plan_file:
+        return write_plan(plan_file, preview, groups)
+    if not review_plan(preview, groups, assume_yes):
+        return False
 
-    confirm = input("\nProceed with renaming? (y/n): ").strip().lower()
-    if confirm != 'y':
-        print("Aborted.")
-        return
-
-    for old, new in preview:
-        try:
-            old.rename(new)
-            print(f"Renamed {old.name} -> {new.name}")
-        except Exception as e:
-            print(f"Failed to rename {old.name}: {e}")
+    with catalog_session() as conn:
+        failed = rename_files(preview, lambda old, new: catalog.record_move(conn, old, new))
+    return failed == 0
 
 
 # Rename digital or film photographs based on EXIF data or custom date
-def rename_film() -> None:
+def rename_film(folder_path=None, include_subdirs=None, include_raw=None, custom_suffix=None, custom_date=None,
+                assume_yes=False, plan_file=None) -> bool:
     print("\n" + "═" * 50)
     print("🎞️  Rename Film Photographs  🎞️".center(50))
     print("═" * 50)
-    folder_path = input(" Enter folder path: ").strip()
-    include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
-    include_raw = input(" Include RAW files? (y/n): ").strip().lower() == 'y'
-    custom_suffix = input(" Custom suffix (leave blank for none): ").strip()
+    warn_incomplete_journals()
+    folder_path = ask(folder_path, " Enter folder path: ")
+    include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
+    include_raw = ask_yes_no(include_raw, " Include RAW files? (y/n): ")
+    custom_suffix = ask(custom_suffix, " Custom suffix (leave blank for none): ")
     while True:
-        custom_date = input(" 📆  Enter date for all files (YYYYMMDD, YYYYMM, or YYYY): ").strip()
+        custom_date = ask(custom_date, " 📆  Enter date for all files (YYYYMMDD, YYYYMM, or YYYY): ")
         if custom_date and len(custom_date) in [4, 6, 8] and custom_date.isdigit(): break
         print("❌  Invalid date format. Please enter date as YYYY or YYYYMM or YYYYMMDD.")
+        custom_date = None
 
     folder = convert_windows_path_to_wsl(folder_path) if (platform.system() == 'Linux' and ':' in folder_path and '\\' in folder_path) else folder_path
     folder = Path(folder).resolve()
@@ -493,28 +780,51 @@ def rename_film() -> None:
         datetime.strptime(padded, "%Y%m%d")
     except: raise ValueError("Invalid date value. Use YYYYMMDD, YYYYMM, or YYYY.")
     base_name = date_str
-    files = folder.rglob('*') if include_subdirs else folder.iterdir()
-    valid_exts = IMAGE_EXTENSIONS + RAW_EXTENSIONS if include_raw else IMAGE_EXTENSIONS
+    kinds = [IMAGE, RAW] if include_raw else [IMAGE]
     custom_suffix = '_'.join(custom_suffix.split()).lower() if custom_suffix else ""
     if custom_suffix: base_name += f"_{custom_suffix}"
-    files_list = sorted([f for f in files if f.is_file() and f.suffix.lower() in valid_exts])
+    files_list = sorted(media_paths(folder, include_subdirs, kinds, workers=WALK_WORKERS))
+    preview = []
     for idx, file_path in enumerate(files_list, start=1):
         suffix = file_path.suffix.lower()
         new_name = f"{base_name}_{idx}{suffix}" if len(files_list) > 1 else f"{base_name}{suffix}"
-        new_path = file_path.with_name(new_name)
-        try: file_path.rename(new_path); print(f"Renamed {file_path.name} -> {new_name}")
-        except Exception as e: print(f"Failed to rename {file_path.name}: {e}")
+        preview.append((file_path, file_path.with_name(new_name)))
+    preview = with_sidecars(preview)
+
+    groups = {base_name: len(files_list)}
+    if plan_file:
+        return write_plan(plan_file, preview, groups)
+    if not review_plan(preview, groups, assume_yes):
+        return False
+
+    with catalog_session() as conn:
+        failed = rename_files(preview, lambda old, new: catalog.record_move(conn, old, new))
+    return failed == 0
 
 
 # Export metadata from images in a folder to CSV or JSON for longjevity
-def export_metadata() -> None:
+def export_metadata(folder_path=None, include_subdirs=None, output_dir=None, output_formats=None, compression=None,
+                    incremental=None) -> bool:
     print("\n" + "═" * 50)
     print("📤  Export Image Metadata  📤".center(50))
     print("═" * 50)
-    folder_path = input(" Enter folder path: ").strip()
-    include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
-    output_dir = input(" Enter output directory: ").strip()
-    output_formats = input(" Export format? (csv/json/both): ").strip().lower()
+    folder_path = ask(folder_path, " Enter folder path: ")
+    include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
+    output_dir = ask(output_dir, " Enter output directory: ")
+    output_formats = ask(output_formats, " Export format? (csv/json/jsonl/sqlite/both): ").lower()
+    compression = ask(compression, f" Compress the export? (none/{'/'.join(COMPRESSIONS)}): ").lower()
+
+    formats = ['json', 'csv'] if output_formats == 'both' else [output_formats]
+    if any(fmt not in EXPORT_FORMATS for fmt in formats):
+        print("Unknown format. Please choose 'csv', 'json', 'jsonl', 'sqlite' or 'both'.")
+        return False
+    compression = None if compression in ('', 'none', 'n') else compression
+    if compression and compression not in COMPRESSIONS:
+        print(f"Unknown compression. Please choose 'none' or one of: {', '.join(COMPRESSIONS)}.")
+        return False
+    if compression and 'sqlite' in formats:
+        print("SQLite exports can't be compressed.")
+        return False
 
     folder = convert_windows_path_to_wsl(folder_path) if (platform.system() == 'Linux' and ':' in folder_path and '\\' in folder_path) else folder_path
     folder = Path(folder).resolve()
@@ -525,142 +835,257 @@ def export_metadata() -> None:
     output_dir = Path(output_dir).resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    files = folder.rglob('*') if include_subdirs else folder.iterdir()
-    metadata_list = []
-
-    for file_path in files:
-        if (
-            not file_path.is_file()
-            or file_path.suffix.lower() not in IMAGE_EXTENSIONS
-        ):
+    # An incremental export reuses the previous export's tags for files whose size and mtime are unchanged.
+    # Both the state file and the walk are in walk order, so they are merged as they stream past.
+    previous = None
+    if export_state_path(output_dir).exists() and ask_yes_no(incremental, " Only re-read files changed since the last export? (y/n): "):
+        previous = read_state(output_dir, folder, include_subdirs)
+        if previous is None:
+            print("⚠️  The previous export was of another folder (or with other settings); exporting everything.")
+    counts = {'reused': 0, 'dropped': 0}
+    entry = [next(previous, None) if previous else None]
+
+    def unchanged(path, stat):
+        relative = path.relative_to(folder).as_posix()
+        key = walk_order(relative)
+        # Entries before this file in walk order are files that have since been deleted (or renamed away)
+        while entry[0] and walk_order(entry[0]['path']) < key:
+            counts['dropped'] += 1
+            entry[0] = next(previous, None)
+        if not entry[0] or entry[0]['path'] != relative:
+            return None
+        found, entry[0] = entry[0], next(previous, None)
+        if (found['size'] != stat.st_size or found['mtime_ns'] != stat.st_mtime_ns
+                or found.get('sidecar_mtime_ns') != sidecar_mtime_ns(path)):
+            return None
+        counts['reused'] += 1
+        return found['tags']
+
+    # Records are written as they are read (EXIF, IPTC and XMP are read together, a batch ahead, by worker
+    # processes), so memory use doesn't grow with the size of the library
+    writers = [open_writer(export_path(output_dir, fmt, compression), fmt, compression) for fmt in formats]
+    state = open_state_writer(output_dir, folder, include_subdirs)
+    failed = 0
+    complete = False
+    try:
+        with catalog_session() as conn:
+            media = walk_media(folder, include_subdirs, [IMAGE], workers=WALK_WORKERS)
+            workers = resolve_worker_count(EXPORT_WORKERS)
+            for file_path, stat, tags in catalog.iter_metadata(conn, media, workers, unchanged if previous else None):
+                error = stat if isinstance(stat, Exception) else tags
+                if isinstance(error, Exception):
+                    print(f"Error processing {file_path.name}: {error}")
+                    failed += 1
+                    continue
+                # Tag values come back as strings (or lists and dicts of them), ready for JSON serialization
+                metadata = {
+                    'File Name': file_path.name,
+                    'File Size': stat.st_size,
+                    'Date Created': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'Date Modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                    **tags,
+                }
+                for writer in writers:
+                    write_record(writer, metadata)
+                write_state(state, file_path.relative_to(folder).as_posix(), stat, tags, sidecar_mtime_ns(file_path))
+        # Whatever the walk didn't reach has been deleted
+        while entry[0]:
+            counts['dropped'] += 1
+            entry[0] = next(previous, None)
+        complete = True
+    finally:
+        # The previous state is still open for reading until here; it is closed before the new one replaces it,
+        # and the state goes last so it never describes an export that wasn't written
+        if previous:
+            previous.close()
+        for writer in writers + [state]:
+            close_writer(writer, complete)
+    for writer in writers:
+        print(f"Metadata for {writer['count']} image(s) exported to {writer['path']} ({writer['format'].upper()})")
+    if previous:
+        print(f"♻️  {counts['reused']} unchanged record(s) reused, {writers[0]['count'] - counts['reused']} new or changed "
+              f"file(s) read, {counts['dropped']} deleted file(s) dropped.")
+    return failed == 0
+
+
+def modify_metadata(img, changes) -> list:
+    # Applies {'EXIF': ..., 'IPTC': ..., 'XMP': ...} tag changes to a pyexiv2 image with one modify per
+    # namespace; returns (namespace, key, error) for the tags that couldn't be written
+    failures = []
+    for namespace, modify in (('EXIF', img.modify_exif), ('IPTC', img.modify_iptc), ('XMP', img.modify_xmp)):
+        if not changes.get(namespace):
             continue
         try:
-            img = Image.open(file_path)
-            raw = img._getexif() if hasattr(img, '_getexif') else None
-            exif_data = {ExifTags.TAGS.get(k, k): v for k, v in raw.items()} if raw else {}
-            # Convert all EXIF values to strings for JSON serialization
-            exif_data_str = {k: str(v) for k, v in exif_data.items()}
-            date_created = datetime.fromtimestamp(file_path.stat().st_ctime).strftime('%Y-%m-%d %H:%M:%S')
-            date_modified = datetime.fromtimestamp(file_path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-            metadata = {
-                'File Name': file_path.name,
-                'File Size': file_path.stat().st_size,
-                'Date Created': date_created,
-                'Date Modified': date_modified,
-                'EXIF Data': exif_data_str
-            }
-            metadata_list.append(metadata)
+            modify(changes[namespace])
+        except Exception:
+            # One bad value fails the whole namespace; retry tag by tag so only that one is lost
+            for key, value in changes[namespace].items():
+                try:
+                    modify({key: value})
+                except Exception as ex:
+                    failures.append((namespace, key, str(ex)))
+    return failures
+
+
+# Write one exported record's EXIF, IPTC and XMP tags to an image, with a single modify per namespace, or
+# with sidecar=True to its XMP sidecar (as XMP) without touching the image.
+# Returns (error, tag failures); an error means the file couldn't be updated at all.
+def write_metadata_record(img_path, meta, sidecar=False) -> tuple:
+    failures = []
+    exif_changes = {}
+    for tag, value in (meta.get('EXIF Data') or {}).items():
+        # Exports name common tags as PIL does and keep exiv2 keys for the rest
+        exif_key = EXIF_TAG_MAP.get(tag) or (tag if tag.startswith('Exif.') else None)
+        if exif_key in EXIF_LAYOUT_KEYS:
+            continue
+        if exif_key:
+            exif_changes[exif_key] = value
+        else:
+            failures.append(('EXIF', tag, "unknown tag"))
+    if not (exif_changes or meta.get('IPTC Data') or meta.get('XMP Data')):
+        return None, failures
+    if sidecar:
+        changes, unconverted = to_xmp(exif_changes, meta.get('IPTC Data'), meta.get('XMP Data'))
+        try:
+            return None, failures + unconverted + write_sidecar(img_path, changes)
         except Exception as e:
-            print(f"Error processing {file_path.name}: {e}")
-
-    if output_formats == 'json':
-        export_json(output_dir / "metadata.json", metadata_list)
-    elif output_formats == 'csv':
-        export_csv(output_dir / "metadata.csv", metadata_list)
-    elif output_formats == 'both':
-        export_json(output_dir / "metadata.json", metadata_list)
-        export_csv(output_dir / "metadata.csv", metadata_list)
-    else:
-        print("Unknown format. Please choose 'csv', 'json', or 'both'.")
+            return str(e), failures + unconverted
+    changes = {'EXIF': exif_changes, 'IPTC': meta.get('IPTC Data') or {}, 'XMP': meta.get('XMP Data') or {}}
+    edit = lambda img: failures.extend(modify_metadata(img, changes))
+    try:
+        # JPEGs have just their metadata segments replaced; other formats are rewritten by pyexiv2
+        if not splice_metadata(img_path, edit):
+            with pyexiv2.Image(str(img_path)) as meta_img:
+                edit(meta_img)
+    except Exception as e:
+        return str(e), failures
+    return None, failures
 
 
-def import_metadata() -> None:
+def import_metadata(meta_path=None, img_folder=None, assume_yes=False, workers=None, sidecar=None) -> bool:
     print("\n" + "═" * 50)
     print("✏️  Rewrite Metadata from File (using pyexiv2)  ✏️".center(50))
     print("═" * 50)
-    meta_path = input(" Enter path to metadata file (CSV or JSON): ").strip()
+    meta_path = ask(meta_path, " Enter path to metadata file (CSV, JSON, JSON Lines or SQLite): ")
     meta_file = Path(meta_path).expanduser().resolve()
     if not meta_file.exists():
         print(f"File not found: {meta_file}")
-        return
-    if meta_file.suffix.lower() not in ['.csv', '.json']:
-        print("File must be a .csv or .json")
-        return
+        return False
+    if metadata_format(meta_file)[0] is None:
+        print(f"File must be a {', '.join(EXPORT_FORMATS.values())} export (optionally compressed: {', '.join(COMPRESSIONS)})")
+        return False
 
     print(f"Found metadata file: {meta_file}")
-    confirm = input("Is this the correct file? (y/n): ").strip().lower()
-    if confirm != 'y':
+    if not confirm(assume_yes, "Is this the correct file? (y/n): "):
         print("Aborted.")
-        return
-
-    # Load metadata
-    metadata_list = []
-    if meta_file.suffix.lower() == '.json':
-        with open(meta_file, 'r', encoding='utf-8') as f:
-            metadata_list = json.load(f)
-    else:
-        with open(meta_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Expecting EXIF Data, IPTC Data, XMP Data as dicts or JSON strings
-                for key in ['EXIF Data', 'IPTC Data', 'XMP Data']:
-                    if key in row and isinstance(row[key], str):
-                        try:
-                            row[key] = json.loads(row[key])
-                        except Exception:
-                            row[key] = {}
-                metadata_list.append(row)
+        return False
 
     # Ask for folder containing images
-    img_folder = input("Enter folder containing images to update: ").strip()
+    img_folder = ask(img_folder, "Enter folder containing images to update: ")
     img_folder = Path(img_folder).expanduser().resolve()
     if not img_folder.is_dir():
         print(f"Not a directory: {img_folder}")
-        return
+        return False
+    sidecar = ask_yes_no(sidecar, "Write XMP sidecars instead of modifying the images? (y/n): ")
 
     # Build lookup for images in folder
-    all_files = {f.name: f for f in img_folder.glob('*') if f.is_file()}
+    all_files = {m.path.name: m.path for m in walk_media(img_folder, recursive=False)}
+
+    def tasks(skipped):
+        for meta in read_records(meta_file):
+            fname = meta.get('File Name')
+            if not fname or fname not in all_files:
+                skipped[0] += 1
+                if len(skipped) <= 10:
+                    skipped.append(fname)
+                continue
+            yield all_files[fname], meta
+
+    # Records are streamed from the file and written a batch at a time across worker processes
+    # (pyexiv2 isn't thread-safe); results are reported in file order
+    workers = resolve_worker_count(workers)
+    updated, failed, partial = 0, 0, 0
+    skipped = [0]  # Count, then the first few names
+    tag_failures = {}  # (namespace, tag, message) -> [files, first file]
+    start = time.perf_counter()
+    pending = tasks(skipped)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while batch := list(itertools.islice(pending, RESOLVE_BATCH)):
+            paths, records = zip(*batch)
+            if executor:
+                results = executor.map(write_metadata_record, paths, records, itertools.repeat(sidecar),
+                                       chunksize=max(1, len(batch) // (workers * 4)))
+            else:
+                results = map(write_metadata_record, paths, records, itertools.repeat(sidecar))
+            for path, (error, failures) in zip(paths, results):
+                for failure in failures:
+                    tag_failures.setdefault(failure, [0, path.name])[0] += 1
+                partial += bool(failures) and not error
+                if error:
+                    print(f"Failed to update {path.name}: {error}")
+                    failed += 1
+                else:
+                    updated += 1
+    finally:
+        if executor:
+            executor.shutdown()
 
-    updated = 0
-    for meta in metadata_list:
-        fname = meta.get('File Name')
-        if not fname or fname not in all_files:
-            print(f"Skipping {fname}: not found in folder.")
-            continue
-        img_path = all_files[fname]
-        exif_data = meta.get('EXIF Data', {})
-        iptc_data = meta.get('IPTC Data', {})
-        xmp_data = meta.get('XMP Data', {})
+    elapsed = time.perf_counter() - start
+    if skipped[0]:
+        print(f"Skipped {skipped[0]} record(s) not found in folder: {', '.join(map(str, skipped[1:]))}"
+              + (", ..." if skipped[0] > 10 else ""))
+    for (namespace, tag, message), (count, example) in sorted(tag_failures.items(), key=lambda item: -item[1][0]):
+        print(f"  {namespace} tag {tag} not written to {count} file(s), e.g. {example}: {message}")
+    print(f"\n📊 Updated {updated} file(s) in {elapsed:.1f}s ({workers} worker(s)): {updated - partial} fully, "
+          f"{partial} with some tags not written; {failed} failed, {skipped[0]} skipped.")
+    return failed == 0
 
-        try:
-            with pyexiv2.Image(str(img_path)) as meta_img:
-                # Overwrite EXIF
-                for tag, value in exif_data.items():
-                    exif_key = EXIF_TAG_MAP.get(tag)
-                    if exif_key:
-                        try:
-                            meta_img.modify_exif({exif_key: value})
-                        except Exception as ex:
-                            print(f"  Failed to set EXIF tag {tag} ({exif_key}): {ex}")
-                    else:
-                        print(f"  Skipping unknown EXIF tag {tag}")
-                # Overwrite IPTC
-                for tag, value in iptc_data.items():
-                    try:
-                        meta_img.modify_iptc({tag: value})
-                    except Exception as ex:
-                        print(f"  Failed to set IPTC tag {tag}: {ex}")
-                # Overwrite XMP
-                for tag, value in xmp_data.items():
-                    try:
-                        meta_img.modify_xmp({tag: value})
-                    except Exception as ex:
-                        print(f"  Failed to set XMP tag {tag}: {ex}")
-                print(f"Updated all metadata for {fname}")
-                updated += 1
-        except Exception as e:
-            print(f"Failed to update {fname}: {e}")
 
-    print(f"Done. Updated {updated} files.")
+# Source tags (and timestamps) for clone_to_target, set once per worker process
+CLONE_SOURCE = None
+
+
+def set_clone_source(exif_data, iptc_data, xmp_data, times, sidecar_xmp=None) -> None:
+    # sidecar_xmp holds the source tags converted to XMP when cloning to sidecars
+    global CLONE_SOURCE
+    CLONE_SOURCE = (exif_data, iptc_data, xmp_data, times, sidecar_xmp)
+
 
+def clone_tags(img, exif_data, iptc_data, xmp_data) -> None:
+    img.modify_exif(exif_data)
+    img.modify_iptc(iptc_data)
+    img.modify_xmp(xmp_data)
+
+
+def clone_to_target(target_path) -> tuple:
+    exif_data, iptc_data, xmp_data, times, sidecar_xmp = CLONE_SOURCE
+    failures = []
+    try:
+        if sidecar_xmp is not None:
+            failures = write_sidecar(target_path, sidecar_xmp)
+        elif not splice_metadata(target_path, lambda img: clone_tags(img, exif_data, iptc_data, xmp_data)):
+            with pyexiv2.Image(str(target_path)) as target_img:
+                clone_tags(target_img, exif_data, iptc_data, xmp_data)
+    except Exception as e:
+        return False, f"❌ Failed to clone metadata to {target_path.name}: {e}"
+    # Set file timestamps to match source
+    try:
+        os.utime(target_path, times)
+    except Exception as ts_e:
+        return True, f"⚠️  Could not set timestamps for {target_path.name}: {ts_e}"
+    if failures:
+        return True, f"⚠️  Metadata cloned to {target_path.name}, except {', '.join(key for _, key, _ in failures)}"
+    return True, f"✅ Metadata cloned to {target_path.name}"
 
-def clone_metadata() -> None:
+
+def clone_metadata(source_path=None, target_paths=None, include_subdirs=None, workers=None, sidecar=None) -> bool:
     print("\n" + "═" * 50)
     print("📂  Clone Metadata from One Image to Another  📂".center(50))
     print("═" * 50)
     
     # Ask user for input method
-    use_browser = input(" Use file browser to select files? (y/n): ").strip().lower() == 'y'
+    use_browser = source_path is None and ask_yes_no(None, " Use file browser to select files? (y/n): ")
     
     if use_browser:
         # Create a hidden root window
@@ -669,7 +1094,7 @@ def clone_metadata() -> None:
         
         # Select source image
         print(" Opening file browser to select source image...")
-        image_extensions = [f"*{ext}" for ext in IMAGE_EXTENSIONS]
+        image_extensions = [f"*{ext}" for ext in sorted(IMAGE_EXTENSIONS)]
         file_types = [
             ("Image files", " ".join(image_extensions)),
             ("All files", "*.*")
@@ -683,7 +1108,7 @@ def clone_metadata() -> None:
         if not source_path:
             print("No source file selected. Aborted.")
             root.destroy()
-            return
+            return False
         
         source_path = Path(source_path)
         print(f" Source image selected: {source_path}")
@@ -698,7 +1123,7 @@ def clone_metadata() -> None:
         if not target_paths:
             print("No destination files selected. Aborted.")
             root.destroy()
-            return
+            return False
         
         target_paths = [Path(path) for path in target_paths]
         print(f" Selected {len(target_paths)} destination image(s)")
@@ -706,33 +1131,45 @@ def clone_metadata() -> None:
         root.destroy()
     else:
         # Manual input method
-        source_input = input(" Enter path to source image: ").strip()
-        target_input = input(" Enter path(s) to target image(s) (separate multiple paths with ;): ").strip()
-        
+        source_input = ask(source_path, " Enter path to source image: ")
         source_path = Path(source_input).expanduser().resolve()
-        
-        # Handle multiple target paths separated by semicolon
-        if ';' in target_input:
-            target_paths = [Path(path.strip()).expanduser().resolve() for path in target_input.split(';')]
-        else:
-            target_paths = [Path(target_input).expanduser().resolve()]
+
+        if target_paths is None:
+            target_input = ask(None, " Enter target image(s), folder(s) or glob pattern(s) (separate multiple with ;): ")
+            # Handle multiple target paths separated by semicolon
+            target_paths = target_input.split(';') if ';' in target_input else [target_input]
 
     # Validate source file
     if not source_path.is_file():
         print(f"Source file not found: {source_path}")
-        return
-    
-    # Validate target files
-    valid_targets = []
-    for target_path in target_paths:
-        if not target_path.is_file():
-            print(f"Target file not found: {target_path}")
-            continue
-        valid_targets.append(target_path)
+        return False
     
+    # Expand folders and glob patterns, skipping the source itself and any target given twice
+    if any(Path(str(spec).strip()).expanduser().is_dir() for spec in target_paths):
+        include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories of target folders? (y/n): ")
+    valid_targets, seen, missing = [], {source_path.resolve()}, 0
+    for spec in target_paths:
+        spec = str(spec).strip()
+        path = Path(spec).expanduser()
+        if path.is_dir():
+            matches = media_paths(path, include_subdirs, [IMAGE], workers=WALK_WORKERS)
+        elif path.is_file():
+            matches = [path]
+        elif glob.has_magic(spec):
+            matches = [Path(match) for match in sorted(glob.glob(str(path), recursive=True)) if os.path.isfile(match)]
+        else:
+            matches = []
+        if not matches:
+            print(f"Target file not found: {spec}")
+            missing += 1
+        for match in map(Path.resolve, matches):
+            if match not in seen:
+                seen.add(match)
+                valid_targets.append(match)
+
     if not valid_targets:
         print("No valid target files found.")
-        return
+        return False
 
     # Clone metadata to each target, including file creation/modification dates
     try:
@@ -741,297 +1178,211 @@ def clone_metadata() -> None:
             exif_data = source_img.read_exif()
             iptc_data = source_img.read_iptc()
             xmp_data = source_img.read_xmp()
-
-        # Get source file timestamps
-        stat = source_path.stat()
-        created_time = stat.st_ctime
-        modified_time = stat.st_mtime
-
-        # Write metadata and timestamps to each target
-        successful_clones = 0
-        for target_path in valid_targets:
-            try:
-                with pyexiv2.Image(str(target_path)) as target_img:
-                    target_img.modify_exif(exif_data)
-                    target_img.modify_iptc(iptc_data)
-                    target_img.modify_xmp(xmp_data)
-                # Set file timestamps to match source
-                try:
-                    os.utime(target_path, (created_time, modified_time))
-                except Exception as ts_e:
-                    print(f"⚠️  Could not set timestamps for {target_path.name}: {ts_e}")
-                print(f"✅ Metadata cloned from {source_path.name} to {target_path.name}")
-                successful_clones += 1
-            except Exception as e:
-                print(f"❌ Failed to clone metadata to {target_path.name}: {e}")
-
-        print(f"\n📊 Summary: Successfully cloned metadata to {successful_clones} out of {len(valid_targets)} target files.")
-
+        xmp_data.update(read_sidecar(source_path))
     except Exception as e:
         print(f"❌ Failed to read metadata from source image {source_path.name}: {e}")
+        return False
+
+    # Get source file timestamps
+    stat = source_path.stat()
+    source = (exif_data, iptc_data, xmp_data, (stat.st_ctime, stat.st_mtime))
+    if ask_yes_no(sidecar, " Write XMP sidecars instead of modifying the targets? (y/n): "):
+        # Converted once here rather than for every target
+        sidecar_xmp, unconverted = to_xmp({k: v for k, v in exif_data.items() if k not in EXIF_LAYOUT_KEYS}, iptc_data, xmp_data)
+        if unconverted:
+            print(f"⚠️  {len(unconverted)} tag(s) have no XMP equivalent and are left out of the sidecars: "
+                  f"{', '.join(key for _, key, _ in unconverted[:10])}" + (", ..." if len(unconverted) > 10 else ""))
+        source += (sidecar_xmp,)
+
+    # Write metadata and timestamps to each target across worker processes (pyexiv2 isn't thread-safe).
+    # The source tags are handed to each worker once, not with every file; results print in target order.
+    workers = min(resolve_worker_count(workers), len(valid_targets))
+    successful_clones = 0
+    start = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=set_clone_source, initargs=source) as executor:
+            results = executor.map(clone_to_target, valid_targets, chunksize=max(1, len(valid_targets) // (workers * 8)))
+            for ok, message in results:
+                print(message)
+                successful_clones += ok
+    else:
+        set_clone_source(*source)
+        for target_path in valid_targets:
+            ok, message = clone_to_target(target_path)
+            print(message)
+            successful_clones += ok
+    elapsed = time.perf_counter() - start
+    rate = len(valid_targets) / elapsed if elapsed > 0 else 0.0
+
+    print(f"\n📊 Summary: Successfully cloned metadata from {source_path.name} to {successful_clones} out of "
+          f"{len(valid_targets)} target files in {elapsed:.1f}s ({rate:.2f} files/sec, {workers} worker(s)).")
+    return successful_clones == len(valid_targets) and not missing
 
 
 # Restructure photo/video folders based on naming conventions and date
-def restructure_folders() -> None:
+# group_year_gaps decides whether event files more than a year apart stay in one folder (None asks each time);
+# placement is how files reach a separate root folder (see run/placement.py; None uses RESTRUCTURE_PLACEMENT).
+# With sync, an existing root folder is brought up to date instead of being emptied and filled again: only new and
+# changed files are placed, files whose folder changed are moved, and orphans are deleted if delete_orphans.
+# compare ('mtime' or 'hash') is how placed files are checked against the source; dry_run only reports the counts.
+def restructure_folders(src_dir=None, root_dir=None, group_year_gaps=None, assume_yes=False, placement=None,
+                        sync=None, delete_orphans=None, dry_run=False, compare='mtime') -> bool:
     print("\n" + "═" * 50)
     print("📁  Restructure Photo/Video Folders  📁".center(50))
     print("═" * 50)
-    src_dir = input("Enter path to source photo/video directory: ").strip()
+    placement = placement or RESTRUCTURE_PLACEMENT
+    if placement not in PLACEMENTS:
+        print(f"Unknown placement {placement!r}: choose one of {', '.join(PLACEMENTS)}")
+        return False
+    src_dir = ask(src_dir, "Enter path to source photo/video directory: ")
     if platform.system() == 'Linux' and ':' in src_dir and '\\' in src_dir:
         src_dir = convert_windows_path_to_wsl(src_dir)
     src_dir = Path(src_dir).expanduser().resolve()
     if not src_dir.is_dir():
         print(f"Not a directory: {src_dir}")
-        return
-
-    # Regex for standard naming, capturing suffix before optional index (e.g., _bratislava or _bratislava_1)
-    # Accepts any filename starting with YYYYMMDD_HHMMSS and anything after, before the extension
-    pattern1 = re.compile(
-        r'^(\d{8})_(\d{6})((?:_[a-z0-9]+)*)(?:_([0-9]+))?\.[a-z0-9]+$', re.IGNORECASE
-    )
-    pattern2 = re.compile(
-        r'^(\d{6})_(\d{6})((?:_[a-z0-9]+)*)(?:_([0-9]+))?\.[a-z0-9]+$', re.IGNORECASE
-    )
-
-    all_exts = set(IMAGE_EXTENSIONS + RAW_EXTENSIONS + VIDEO_EXTENSIONS + ['.psd'])
-    files = [
-        f for f in src_dir.rglob('*')
-        if f.is_file()
-        and f.suffix.lower() in all_exts
-    ]
+        return False
+
+    files = [m.path for m in walk_media(src_dir, workers=WALK_WORKERS) if is_restructured(m.path)]
 
     if not files:
         print("No files found in the source directory!")
 
-    nonconforming = [f for f in files if not (pattern1.match(f.name) or pattern2.match(f.name))]
+    # Names are parsed once, here; the rest of the plan works from these
+    infos, nonconforming = [], []
+    for f in files:
+        info = restructure_info(f)
+        if info:
+            infos.append(info)
+        else:
+            nonconforming.append(f)
     if nonconforming:
         print("❌ The following files do not conform to the standard naming scheme:")
         for f in nonconforming:
             print(f"  {f}")
         print("Please rename these files before restructuring.")
-        return
+        return False
 
-    root_dir = input("Enter path to root folder for restructured files: ").strip()
+    root_dir = ask(root_dir, "Enter path to root folder for restructured files: ")
     if platform.system() == 'Linux' and ':' in root_dir and '\\' in root_dir:
         root_dir = convert_windows_path_to_wsl(root_dir)
     root_dir = Path(root_dir).expanduser().resolve()
     same_dir = (src_dir == root_dir)
+    if same_dir:
+        # Files are moved within the source, so there is no separate root folder to sync
+        sync = delete_orphans = False
+    else:
+        # A root folder inside the source folder isn't part of the source
+        infos = [info for info in infos if not info.path.is_relative_to(root_dir)]
+        sync = root_dir.is_dir() and any(root_dir.iterdir()) and ask_yes_no(
+            sync, f"Update {root_dir} in place, copying only new and changed files? (y/n): ")
+        if sync:
+            delete_orphans = ask_yes_no(delete_orphans, "Delete files in the root folder that are no longer in the source? (y/n): ")
+
+    def ask_year_gap(suffix, prev, curr):
+        print(f"\nThe following files in group '{suffix}' are more than 1 year apart:")
+        print(f"  {prev.path.name} ({prev.date.date()})")
+        print(f"  {curr.path.name} ({curr.date.date()})")
+        return ask_yes_no(None, "Should these be grouped together? (y/n): ")
+
+    layout = plan_restructure(infos, ask_year_gap if group_year_gaps is None else group_year_gaps)
+    tasks = [(src, target / src.name) for folder, sources in layout.items() for target in [root_dir / folder] for src in sources]
+
+    # Compare the planned layout with what is already there
+    moves, orphans = [], []
+    if same_dir:
+        in_place = sum(1 for src, dest in tasks if src == dest)
+        print(f"\n📋 {len(tasks) - in_place} file(s) to move, {in_place} already in place.")
+    elif sync:
+        existing = [m.path for m in walk_media(root_dir, workers=WALK_WORKERS) if is_restructured(m.path)]
+        plan = plan_sync(tasks, existing, compare)
+        tasks = plan['new'] + plan['changed']
+        moves = plan['moved']
+        orphans = plan['orphans'] if delete_orphans else []
+        print(f"\n📋 {len(plan['new'])} new, {len(plan['changed'])} changed, {len(moves)} moved and {len(plan['unchanged'])} "
+              f"unchanged file(s); {len(plan['orphans'])} orphan(s) in {root_dir} {'to delete' if delete_orphans else 'kept'}.")
+    else:
+        existing = list(root_dir.iterdir()) if root_dir.is_dir() else []
+        print(f"\n📋 {len(existing)} item(s) in {root_dir} to delete, {len(tasks)} file(s) to place.")
+    if dry_run:
+        print("Dry run: nothing was changed.")
+        return True
+
+    # The plan is settled and reported; only carrying it out needs confirming
     if same_dir:
         print("⚠️  WARNING: The root directory is the same as the source directory.")
         print("This operation will be PERMANENT and IRREVERSIBLE. All files will be moved and the original structure will be lost.")
-        confirm = input("Are you absolutely sure you want to proceed? (type 'yes' to continue): ").strip().lower()
-        if confirm != 'yes':
+        if not confirm(assume_yes, "Are you absolutely sure you want to proceed? (type 'yes' to continue): ", expected='yes'):
             print("Aborted.")
-            return
+            return False
+    elif sync:
+        if delete_orphans:
+            print(f"\nWARNING: Photos and videos in {root_dir} that aren't in {src_dir} will be deleted!")
+            if not confirm(assume_yes, "Proceed? (y/n): "):
+                print("Aborted.")
+                return False
     else:
         print(f"\nWARNING: All contents of {root_dir} will be deleted!")
-        confirm = input("Proceed? (y/n): ").strip().lower()
-        if confirm != 'y':
+        if not confirm(assume_yes, "Proceed? (y/n): "):
             print("Aborted.")
-            return
-        confirm2 = input("Are you absolutely sure? (y/n): ").strip().lower()
-        if confirm2 != 'y':
+            return False
+        if not confirm(assume_yes, "Are you absolutely sure? (y/n): "):
             print("Aborted.")
-            return
-
-    files_to_process = list(files)
-
-    # Only clear out the root_dir if it's not the same as src_dir
-    if not same_dir:
-        if root_dir.exists():
-            for item in root_dir.iterdir():
-                if item.is_dir():
-                    shutil.rmtree(item)
-                else:
-                    item.unlink()
-        else:
-            root_dir.mkdir(parents=True, exist_ok=True)
-    else:
-        if not root_dir.exists():
-            root_dir.mkdir(parents=True, exist_ok=True)
-
-    files = files_to_process
+            return False
 
-    # Parse file info and group by suffix
-    suffix_groups = defaultdict(list)
-    no_suffix_groups = defaultdict(list)  # For files with no event suffix
-
-    for f in files:
-        m1 = pattern1.match(f.name)
-        m2 = pattern2.match(f.name)
-        suffix = None
-        date_str = None
-        if m1:
-            date_str = m1.group(1)
-            suffixes = m1.group(3)
-            # Remove trailing _N index and clean up
-            cleaned_suffixes = re.sub(r'_\d+$', '', suffixes)
-            index = m1.group(4)
-            if cleaned_suffixes:
-                parts = cleaned_suffixes.strip('_').split('_')
-                # If the last part is a number and the second-to-last is not, treat as "Event Year"
-                if len(parts) >= 2 and parts[-1].isdigit() and not parts[-2].isdigit():
-                    suffix = f"{parts[-2].capitalize()} {parts[-1]}"
-                elif len(parts) == 1 and parts[-1].isdigit():
-                    suffix = None
-                else:
-                    # Join all as one event (e.g., beach_party2)
-                    suffix = '_'.join(parts).capitalize()
-
-        elif m2:
-            date_str = m2.group(1)
-            suffixes = m2.group(3)
-            # Remove trailing _N index and clean up
-            cleaned_suffixes = re.sub(r'_\d+$', '', suffixes)
-
-            index = m2.group(4)
-            if cleaned_suffixes:
-                parts = cleaned_suffixes.strip('_').split('_')
-                # If the last part is a number and the second-to-last is not, treat as "Event Year"
-                if len(parts) >= 2 and parts[-1].isdigit() and not parts[-2].isdigit():
-                    suffix = f"{parts[-2].capitalize()} {parts[-1]}"
-                elif len(parts) == 1 and parts[-1].isdigit():
-                    suffix = None
-                else:
-                    # Join all as one event (e.g., beach_party2)
-                    suffix = '_'.join(parts).capitalize()
-        else:
-            continue  # Should not happen
-
-        # Parse date
-        if len(date_str) == 8:
-            year = int(date_str[:4])
-            month = int(date_str[4:6])
-            day = int(date_str[6:8])
-        else:
-            year = int('20' + date_str[:2])
-            month = int(date_str[2:4])
-            day = 1
-        dt = datetime(year, month, day)
-
-        info = {
-            'path': f,
-            'year': year,
-            'month': month,
-            'day': day,
-            'date': dt,
-            'suffix': suffix,
-            'name': f.name
-        }
-
-        if suffix:
-            suffix_groups[suffix].append(info)
+    # Only clear out the root_dir if it's being replaced rather than synced
+    if not same_dir and not sync and root_dir.exists():
+        for item in root_dir.iterdir():
+            if item.is_dir():
+                shutil.rmtree(item)
+            else:
+                item.unlink()
+    elif sync:
+        for _, dest in plan['changed']:
+            dest.unlink()
+    root_dir.mkdir(parents=True, exist_ok=True)
+    create_folders(dest for _, dest in moves + tasks)
+    failed = 0
+    moved = []
+    for old, dest in moves:
+        try:
+            old.rename(dest)
+            moved.append((old, dest))
+            print(f"Moved {old.name} -> {dest}")
+        except OSError as e:
+            print(f"Error moving {old} -> {dest}: {e}")
+            failed += 1
+    for orphan in orphans:
+        try:
+            orphan.unlink()
+            print(f"Deleted orphan {orphan}")
+        except OSError as e:
+            print(f"Failed to delete {orphan}: {e}")
+            failed += 1
+
+    placed = []
+    actions = Counter()
+    for src, dest, ok, result in place_files(tasks, move=same_dir, placement=placement):
+        print(result)
+        if ok:
+            placed.append((src, dest))
+            actions[result.split(' ', 1)[0]] += 1
         else:
-            # Group by year and month for files with no suffix
-            no_suffix_groups[(year, month)].append(info)
+            failed += 1
+    if actions:
+        print(f"📊 {', '.join(f'{action} {count}' for action, count in actions.most_common())} file(s); {failed} failed.")
 
-    # Count suffix occurrences for folder logic
-    suffix_counts = {k: len(v) for k, v in suffix_groups.items()}
+    # Catalog entries follow the files to their new locations (the worker threads can't share the connection)
+    with catalog_session() as conn:
+        for src, dest in placed:
+            catalog.record_move(conn, src, dest, keep_old=not same_dir)
+        for old, dest in moved:
+            catalog.record_move(conn, old, dest)
 
-    # Track all destination files to avoid duplicate move attempts
-    copied_files = set()
-
-    def move_or_copy_file(info, dest, same_dir):
-        # Ensure the destination folder exists before moving/copying
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        # Avoid duplicate move/copy attempts
-        if dest in copied_files:
-            return f"Skipped {info['path'].name}: already processed."
-        try:
-            if info['path'].resolve() == dest.resolve():
-                return f"Skipped {info['path'].name}: source and destination are the same file."
-        except FileNotFoundError:
-            return f"Source file not found: {info['path']}. Skipping."
+    # Delete any folder inside the destination (root_dir) that does not contain images anywhere in its subtree
+    for folder in prune_empty_folders(root_dir):
         try:
-            if same_dir:
-                info['path'].rename(dest)
-                action = "Moved"
-            else:
-                shutil.copy2(info['path'], dest)
-                action = "Copied"
-            copied_files.add(dest)
-            return f"{action} {info['path'].name} -> {dest}"
-        except FileNotFoundError:
-            return f"File not found during operation: {info['path']} -> {dest}. Skipping."
+            shutil.rmtree(folder)
+            print(f"Deleted empty folder (no images in subtree): {folder}")
         except Exception as e:
-            return f"Error processing {info['path']} -> {dest}: {e}"
-
-    tasks = []
-
-    # Handle event groups
-    for suffix, group in suffix_groups.items():
-        # Sort by date
-        group = sorted(group, key=lambda x: x['date'])
-        # Partition into subgroups if >1 year apart
-        folders = []
-        current_folder = [group[0]]
-        for prev, curr in zip(group, group[1:]):
-            year_diff = (curr['date'].year - prev['date'].year)
-            if year_diff > 1:
-                print(f"\nThe following files in group '{suffix}' are more than 1 year apart:")
-                print(f"  {prev['name']} ({prev['date'].date()})")
-                print(f"  {curr['name']} ({curr['date'].date()})")
-                ans = input("Should these be grouped together? (y/n): ").strip().lower()
-                if ans == 'y':
-                    current_folder.append(curr)
-                else:
-                    folders.append(current_folder)
-                    current_folder = [curr]
-            else:
-                current_folder.append(curr)
-        if current_folder:
-            folders.append(current_folder)
-
-        # For each folder, use earliest date for folder name
-        for folder_files in folders:
-            earliest = min(folder_files, key=lambda x: x['date'])
-            folder_year = earliest['year']
-            decade = f"{(folder_year // 10) * 10}s"
-            year_folder = f"{folder_year}"
-            folder_suffix = earliest['suffix']
-            # Only create a suffix folder if there are at least 10 photos with the same suffix
-            if folder_suffix and suffix_counts.get(folder_suffix, 0) >= EVENT_FOLDER_THRESHOLD:
-                target_folder = root_dir / decade / year_folder / folder_suffix
-            else:
-                # fallback to month folder if not enough for event
-                month_name = datetime(folder_year, earliest['month'], 1).strftime("%B")
-                month_folder = f"{earliest['month']}. {month_name}"
-                target_folder = root_dir / decade / year_folder / month_folder
-            target_folder.mkdir(parents=True, exist_ok=True)
-            for info in folder_files:
-                dest = target_folder / info['name']
-                tasks.append((info, dest, same_dir))
-
-    # Handle files with no suffix: group by year and month
-    for (year, month), group in no_suffix_groups.items():
-        decade = f"{(year // 10) * 10}s"
-        year_folder = f"{year}"
-        month_name = datetime(year, month, 1).strftime("%B")
-        month_folder = f"{month}. {month_name}"
-        target_folder = root_dir / decade / year_folder / month_folder
-        target_folder.mkdir(parents=True, exist_ok=True)
-        for info in group:
-            dest = target_folder / info['name']
-            tasks.append((info, dest, same_dir))
-
-    # Use ThreadPoolExecutor for parallel move/copy
-    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-        future_to_task = {executor.submit(move_or_copy_file, info, dest, same_dir): (info, dest) for info, dest, same_dir in tasks}
-        for future in concurrent.futures.as_completed(future_to_task):
-            result = future.result()
-            print(result)
-
-    # Delete any folder inside the destination (root_dir) that does not contain images anywhere in its subtree
-    for folder in sorted(root_dir.rglob('*'), key=lambda f: -len(f.parts)):
-        if folder.is_dir():
-            # Check if the folder or any subfolder contains image or video files
-            has_media = any(
-                f.is_file() and f.suffix.lower() in (IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)
-                for f in folder.rglob('*')
-            )
-            if not has_media:
-                try:
-                    shutil.rmtree(folder)
-                    print(f"Deleted empty folder (no images in subtree): {folder}")
-                except Exception as e:
-                    print(f"Failed to delete folder {folder}: {e}")
+            print(f"Failed to delete folder {folder}: {e}")
+    return failed == 0
@@ -0,0 +1,83 @@
+'''
+How restructure puts a file at its new location when the destination tree is separate from the source.
+
+    reflink          a copy-on-write clone (FICLONE): instant, no extra space, yet an independent file
+                     (Btrfs, XFS, bcachefs, OCFS2; same filesystem only)
+    hardlink         another name for the same file: no extra space, but editing one edits both
+    copy_file_range  a copy made inside the kernel (server-side on NFS/SMB, shared extents where supported)
+    copy             a plain copy (shutil.copy2)
+    symlink          a link to the source, for a browsable view of it
+    auto             the cheapest of reflink, copy_file_range and copy that works, so the destination never
+                     shares its data with the source
+
+A strategy the filesystems involved don't support falls back to a copy. Strategies found unsupported for a
+pair of devices are remembered, so each one is only tried once per source/destination filesystem pair; one
+that fails for a single file (EPERM, EINVAL, EMLINK) falls back for that file only.
+'''
+
+from pathlib import Path
+import errno
+import os
+import shutil
+
+
+PLACEMENTS = ('auto', 'reflink', 'hardlink', 'copy_file_range', 'copy', 'symlink')
+AUTO_PLACEMENTS = ('reflink', 'copy_file_range', 'copy')
+PLACEMENT_VERBS = {'reflink': "Cloned", 'hardlink': "Linked", 'copy_file_range': "Copied", 'copy': "Copied", 'symlink': "Symlinked"}
+FICLONE = 0x40049409  # _IOW(0x94, 9, int), from linux/fs.h
+COPY_CHUNK = 1 << 30  # Bytes per copy_file_range call
+# Errors meaning a strategy isn't available between two filesystems, rather than that this file failed
+UNSUPPORTED_ERRNOS = frozenset([errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.ENOSYS])
+# Errors meaning a strategy didn't work for this file (e.g. a hard link to a file the user doesn't own, a link
+# count at its limit, a file copy_file_range or FICLONE refuses): the file falls back, the next file tries again
+FILE_FALLBACK_ERRNOS = frozenset([errno.EPERM, errno.EINVAL, errno.EMLINK])
+
+
+def reflink(src, dest) -> None:
+    import fcntl  # POSIX only
+    with open(src, 'rb') as fsrc, open(dest, 'xb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            os.unlink(dest)
+            raise
+    shutil.copystat(src, dest)
+
+
+def kernel_copy(src, dest) -> None:
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    with open(src, 'rb') as fsrc, open(dest, 'xb') as fdst:
+        try:
+            while os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK):
+                pass
+        except OSError:
+            os.unlink(dest)
+            raise
+    shutil.copystat(src, dest)
+
+
+def symlink(src, dest) -> None:
+    os.symlink(os.path.abspath(src), dest)
+
+
+PLACERS = {'reflink': reflink, 'hardlink': os.link, 'copy_file_range': kernel_copy, 'copy': shutil.copy2, 'symlink': symlink}
+
+
+def place_file(src, dest, placement='auto', unsupported=None) -> str:
+    # Puts src at dest (which mustn't exist yet) using placement and returns the strategy that was used.
+    # unsupported is a set of (strategy, source device, destination device) shared between calls.
+    unsupported = set() if unsupported is None else unsupported
+    devices = (os.stat(src).st_dev, os.stat(Path(dest).parent).st_dev)
+    candidates = AUTO_PLACEMENTS if placement == 'auto' else (placement, 'copy')
+    for name in dict.fromkeys(candidates):
+        if name != 'copy' and (name, *devices) in unsupported:
+            continue
+        try:
+            PLACERS[name](src, dest)
+            return name
+        except OSError as e:
+            if name == 'copy' or e.errno not in UNSUPPORTED_ERRNOS | FILE_FALLBACK_ERRNOS:
+                raise
+            if e.errno in UNSUPPORTED_ERRNOS:
+                unsupported.add((name, *devices))
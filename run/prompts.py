@@ -0,0 +1,32 @@
+'''
+Helpers for collecting options either from function arguments or, when running interactively, from the user.
+'''
+
+# Set to False by the command line interface so that a missing option fails instead of blocking on input()
+INTERACTIVE = True
+
+
+class MissingOptionError(Exception):
+    pass
+
+
+def ask(value, message) -> str:
+    if value is not None:
+        return value
+    if not INTERACTIVE:
+        raise MissingOptionError(f"Missing required option: {message.strip().rstrip(':').strip()}")
+    return input(message).strip()
+
+
+def ask_yes_no(value, message) -> bool:
+    if value is not None:
+        return bool(value)
+    return ask(None, message).lower() == 'y'
+
+
+def confirm(assume_yes, message, expected='y') -> bool:
+    if assume_yes:
+        return True
+    if not INTERACTIVE:
+        raise MissingOptionError(f"Confirmation required: {message.strip()} (pass --yes to proceed)")
+    return input(message).strip().lower() == expected
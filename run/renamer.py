@@ -0,0 +1,405 @@
+'''
+Bulk renaming shared by the photo and video rename operations.
+
+Renames happen in two phases: every source is first moved to a unique hidden temporary name in the same
+folder, then every temporary name is moved to its final name. Targets that are themselves sources in the
+same plan (e.g. swapping or shifting indices) therefore never collide, and a target that already exists
+on disk outside the plan is refused up front. Renames are relative to an open directory descriptor where
+the platform supports it, so each path isn't resolved from the root again for every file.
+
+Before anything is touched the plan is written to a journal (RENAME_JOURNAL_DIR) and fsynced; progress
+is appended and fsynced in batches. If a run is interrupted, `python -m run renames resume <journal>`
+finishes it and `python -m run renames rollback <journal>` restores the original names, using only
+the journal (no rescan of the folders or re-reading of metadata).
+
+A plan can also be saved instead of applied (JSON Lines or CSV, plus a .summary.json of counts per date
+and suffix and any conflicts), reviewed offline, and applied later with `python -m run renames apply
+<plan>`. Applying checks that each source still has the size and mtime recorded in the plan.
+'''
+
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import csv
+import json
+import os
+import re
+import uuid
+from .config import RENAME_JOURNAL_DIR, RENAME_JOURNAL_BATCH, RENAME_JOURNALS_KEPT, RENAME_PREVIEW_LINES
+from . import prompts
+
+
+PLAN_FIELDS = ['src', 'dst', 'size', 'mtime_ns']
+# Base names are DATE[_TIME][_suffix]; what follows the date (and time) is the suffix
+BASE_PATTERN = re.compile(r'^(\d{4,8})(?:_\d{6})?(?:_(.*))?$')
+
+
+DIR_FD_RENAME = os.rename in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY')
+
+
+# A journal is an append-only JSON Lines file: a header, one line per planned rename, then progress records.
+# In memory it is a dict holding the open file, the entries and the progress read back from it.
+def create_journal(entries, journal_dir=RENAME_JOURNAL_DIR) -> dict:
+    journal_dir = Path(journal_dir).expanduser()
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    path = journal_dir / f"rename-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl"
+    journal = {'path': path, 'file': open(path, 'x', encoding='utf-8'), 'entries': entries,
+               'phase_done': {1: 0, 2: 0}, 'failed': set(), 'state': 'planned'}
+    journal_write(journal, {'journal': 'archivist-rename', 'version': 1, 'created': datetime.now().isoformat(), 'count': len(entries)})
+    for entry in entries:
+        journal_write(journal, entry)
+    journal_sync(journal)
+    return journal
+
+
+def load_journal(path) -> dict:
+    path = Path(path).expanduser()
+    journal = {'path': path, 'entries': [], 'phase_done': {1: 0, 2: 0}, 'failed': set(), 'state': 'planned'}
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('journal') != 'archivist-rename':
+            raise ValueError(f"Not a rename journal: {path}")
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # A torn final line from a crash mid-write
+            if 'src' in record:
+                journal['entries'].append(record)
+            elif 'phase' in record:
+                journal['phase_done'][record['phase']] = max(journal['phase_done'][record['phase']], record['done'])
+            elif 'failed' in record:
+                journal['failed'].add(record['failed'])
+            elif 'state' in record:
+                journal['state'] = record['state']
+    journal['file'] = open(path, 'a', encoding='utf-8')
+    return journal
+
+
+def journal_write(journal, record) -> None:
+    journal['file'].write(json.dumps(record) + '\n')
+
+
+def journal_sync(journal) -> None:
+    journal['file'].flush()
+    os.fsync(journal['file'].fileno())
+
+
+def close_journal(journal) -> None:
+    journal_sync(journal)
+    journal['file'].close()
+
+
+def journal_finished(path) -> bool:
+    # Whether the run completed or was rolled back; the final state is always in the last few lines
+    with open(path, 'rb') as f:
+        f.seek(max(0, path.stat().st_size - 256))
+        tail = f.read().decode('utf-8', 'ignore')
+    return '"state": "complete"' in tail or '"state": "rolled back"' in tail
+
+
+def incomplete_journals(journal_dir=RENAME_JOURNAL_DIR) -> list:
+    # Journals of runs that were interrupted before finishing or rolling back
+    journal_dir = Path(journal_dir).expanduser()
+    if not journal_dir.is_dir():
+        return []
+    return [path for path in sorted(journal_dir.glob('rename-*.jsonl')) if not journal_finished(path)]
+
+
+def prune_journals(journal_dir=RENAME_JOURNAL_DIR, keep=RENAME_JOURNALS_KEPT) -> None:
+    # Deletes the journals of finished runs but the newest keep (names start with their creation time), so
+    # the folder doesn't grow with every run; interrupted runs' journals are never deleted
+    journal_dir = Path(journal_dir).expanduser()
+    if not journal_dir.is_dir():
+        return
+    finished = [path for path in sorted(journal_dir.glob('rename-*.jsonl'), reverse=True) if journal_finished(path)]
+    for path in finished[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def warn_incomplete_journals() -> None:
+    for path in incomplete_journals():
+        print(f"⚠️  An earlier rename run was interrupted. Finish it with `python -m run renames resume {path}`"
+              f" or undo it with `python -m run renames rollback {path}`.")
+
+
+def dir_fd(open_dir, directory):
+    # Descriptor for directory, reusing the one in open_dir ({'dir': ..., 'fd': ...}) if it is the same folder.
+    # Entries are grouped by folder, so each folder is opened once.
+    if open_dir.get('dir') != directory:
+        close_dir(open_dir)
+        open_dir['fd'] = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        open_dir['dir'] = directory
+    return open_dir['fd']
+
+
+def close_dir(open_dir) -> None:
+    if open_dir.get('fd') is not None:
+        os.close(open_dir['fd'])
+    open_dir.clear()
+
+
+def rename_in(open_dir, directory, src, dst) -> None:
+    if not DIR_FD_RENAME:
+        os.rename(os.path.join(directory, src), os.path.join(directory, dst))
+        return
+    fd = dir_fd(open_dir, directory)
+    os.rename(src, dst, src_dir_fd=fd, dst_dir_fd=fd)
+
+
+def exists_in(open_dir, directory, name) -> bool:
+    try:
+        if DIR_FD_RENAME:
+            os.lstat(name, dir_fd=dir_fd(open_dir, directory))
+        else:
+            os.lstat(os.path.join(directory, name))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def plan_entries(pairs) -> tuple:
+    # Turns (old path, new path) pairs into journal entries, refusing renames whose target is taken
+    # by a file outside the plan or by another entry. Returns (entries, [(old, new, reason), ...]).
+    run_id = uuid.uuid4().hex[:12]
+    pairs = [(Path(old), Path(new)) for old, new in pairs if Path(old) != Path(new)]
+    sources = {old for old, _ in pairs}
+    seen_targets = set()
+    entries, refused = [], []
+    # Grouped by folder so each directory is opened once
+    for old, new in sorted(pairs, key=lambda pair: (str(pair[0].parent), pair[0].name)):
+        if old.parent != new.parent:
+            refused.append((old, new, "renames must stay within the same folder"))
+        elif new in seen_targets:
+            refused.append((old, new, "another file in this run is being renamed to the same name"))
+        elif os.path.lexists(new) and new not in sources and not os.path.samefile(old, new):
+            refused.append((old, new, "target already exists"))
+        else:
+            seen_targets.add(new)
+            entries.append({'dir': str(old.parent), 'src': old.name, 'tmp': f".archivist-{run_id}-{len(entries)}.tmp", 'dst': new.name})
+    return entries, refused
+
+
+def run_phases(journal, on_renamed=None, resuming=False) -> int:
+    # Carries the journal's entries forward to their final names; returns the number of failures
+    open_dir = {}
+    failed = 0
+    try:
+        for phase, src_key, dst_key in ((1, 'src', 'tmp'), (2, 'tmp', 'dst')):
+            done_before = journal['phase_done'][phase]
+            for i, entry in enumerate(journal['entries']):
+                if i < done_before or i in journal['failed']:
+                    continue
+                # When resuming, the temporary name (unique to this entry) tells us where the file is;
+                # in a fresh run the journal already knows
+                if resuming:
+                    in_tmp = exists_in(open_dir, entry['dir'], entry['tmp'])
+                    if (phase == 1 and in_tmp) or (phase == 2 and not in_tmp):
+                        continue
+                try:
+                    if phase == 2 and exists_in(open_dir, entry['dir'], entry['dst']):
+                        raise FileExistsError(f"{entry['dst']} appeared during the rename")
+                    rename_in(open_dir, entry['dir'], entry[src_key], entry[dst_key])
+                    if phase == 2:
+                        print(f"Renamed {entry['src']} -> {entry['dst']}")
+                        if on_renamed: on_renamed(Path(entry['dir'], entry['src']), Path(entry['dir'], entry['dst']))
+                except OSError as e:
+                    failed += 1
+                    journal['failed'].add(i)
+                    journal_write(journal, {'failed': i})
+                    if phase == 2 and not exists_in(open_dir, entry['dir'], entry['src']):
+                        # Put it back under its original name rather than leaving a hidden temporary file
+                        try: rename_in(open_dir, entry['dir'], entry['tmp'], entry['src'])
+                        except OSError: print(f"⚠️  {entry['src']} was left as {Path(entry['dir'], entry['tmp'])}")
+                    print(f"Failed to rename {entry['src']}: {e}")
+                if (i + 1) % RENAME_JOURNAL_BATCH == 0:
+                    journal_write(journal, {'phase': phase, 'done': i + 1})
+                    journal_sync(journal)
+            # Phase 2 must not start until phase 1 is durably complete for every entry
+            journal['phase_done'][phase] = len(journal['entries'])
+            journal_write(journal, {'phase': phase, 'done': len(journal['entries'])})
+            journal_sync(journal)
+        journal['state'] = 'complete'
+        journal_write(journal, {'state': 'complete', 'finished': datetime.now().isoformat()})
+    finally:
+        close_dir(open_dir)
+        close_journal(journal)
+    return failed
+
+
+def rename_files(pairs, on_renamed=None, journal_dir=RENAME_JOURNAL_DIR) -> int:
+    # Applies (old path, new path) renames safely; returns the number of files not renamed.
+    # on_renamed(old, new) is called after each successful rename, e.g. to update the catalog.
+    entries, refused = plan_entries(pairs)
+    for old, new, reason in refused:
+        print(f"Failed to rename {old.name} -> {new.name}: {reason}")
+    if not entries:
+        return len(refused)
+    journal = create_journal(entries, journal_dir)
+    failed = run_phases(journal, on_renamed)
+    prune_journals(journal_dir)
+    return failed + len(refused)
+
+
+def resume_renames(journal_path, on_renamed=None) -> int:
+    journal = load_journal(journal_path)
+    if journal['state'] != 'planned':
+        close_journal(journal)
+        print(f"Nothing to resume: this run is already {journal['state']}.")
+        return 0
+    print(f"Resuming {len(journal['entries'])} rename(s) from {journal['path']}")
+    failed = run_phases(journal, on_renamed, resuming=True)
+    prune_journals(journal['path'].parent)
+    return failed
+
+
+def rollback_renames(journal_path, on_renamed=None) -> int:
+    # Restores every file in the journal to its original name (also undoes a completed run)
+    journal = load_journal(journal_path)
+    if journal['state'] == 'rolled back':
+        close_journal(journal)
+        print("Nothing to roll back: this run was already rolled back.")
+        return 0
+    open_dir = {}
+    failed = 0
+    phase1_complete = journal['phase_done'][1] == len(journal['entries'])
+    try:
+        # Phase 1: everything at its final name goes to its temporary name, freeing up the original names
+        for i, entry in enumerate(journal['entries']):
+            if i in journal['failed'] or not phase1_complete or exists_in(open_dir, entry['dir'], entry['tmp']):
+                continue
+            try: rename_in(open_dir, entry['dir'], entry['dst'], entry['tmp'])
+            except OSError as e: failed += 1; print(f"Failed to roll back {entry['dst']}: {e}")
+        # Phase 2: temporary names back to the originals
+        for entry in journal['entries']:
+            if not exists_in(open_dir, entry['dir'], entry['tmp']):
+                continue
+            try:
+                rename_in(open_dir, entry['dir'], entry['tmp'], entry['src'])
+                print(f"Restored {entry['src']}")
+                if on_renamed: on_renamed(Path(entry['dir'], entry['dst']), Path(entry['dir'], entry['src']))
+            except OSError as e:
+                failed += 1
+                print(f"Failed to restore {entry['src']} (currently {entry['tmp']}): {e}")
+        if not failed:
+            journal_write(journal, {'state': 'rolled back', 'finished': datetime.now().isoformat()})
+    finally:
+        close_dir(open_dir)
+        close_journal(journal)
+    return failed
+
+
+############# Saved Plans #############
+
+
+def plan_summary(preview, groups) -> dict:
+    # groups maps each base name to the number of files sharing it (and so given a _n index)
+    per_date, per_suffix = Counter(), Counter()
+    for base, count in groups.items():
+        m = BASE_PATTERN.match(base)
+        per_date[m.group(1) if m else base] += count
+        per_suffix[(m.group(2) if m else None) or '(none)'] += count
+    shared = [count for count in groups.values() if count > 1]
+    _, refused = plan_entries(preview)
+    return {
+        'files': len(preview),
+        'unchanged': sum(1 for old, new in preview if old == new),
+        'per_date': dict(sorted(per_date.items())),
+        'per_suffix': dict(sorted(per_suffix.items())),
+        'shared_names': len(shared),
+        'files_with_shared_names': sum(shared),
+        'conflicts': [{'src': str(old), 'dst': str(new), 'reason': reason} for old, new, reason in refused],
+    }
+
+
+def print_counts(label, counts) -> None:
+    shown = [f"{key} ({count})" for key, count in list(counts.items())[:10]]
+    more = f", ... and {len(counts) - 10} more" if len(counts) > 10 else ""
+    print(f"{label}: {', '.join(shown)}{more}")
+
+
+def print_summary(summary) -> None:
+    print(f"\n{summary['files']} file(s), {summary['unchanged']} already named correctly.")
+    print_counts("By date", summary['per_date'])
+    print_counts("By suffix", summary['per_suffix'])
+    if summary['shared_names']:
+        print(f"{summary['files_with_shared_names']} file(s) share {summary['shared_names']} name(s) and will be numbered _1, _2, ...")
+    for conflict in summary['conflicts']:
+        print(f"⚠️  {Path(conflict['src']).name} -> {Path(conflict['dst']).name}: {conflict['reason']}")
+
+
+def review_plan(preview, groups, assume_yes) -> bool:
+    # Shows the summary and the first RENAME_PREVIEW_LINES renames, then asks to proceed. If the answer
+    # is no, the plan can be saved so that the scan doesn't have to be repeated.
+    summary = plan_summary(preview, groups)
+    print("\nPlanned renames:")
+    for old, new in preview[:RENAME_PREVIEW_LINES]:
+        print(f"{old.name} -> {new.name}")
+    if len(preview) > RENAME_PREVIEW_LINES:
+        print(f"... and {len(preview) - RENAME_PREVIEW_LINES} more")
+    print_summary(summary)
+    if prompts.confirm(assume_yes, "\nProceed with renaming? (y/n): "):
+        return True
+    print("Aborted.")
+    if prompts.INTERACTIVE:
+        plan_file = input(" Save the plan to apply later? Enter a .jsonl or .csv path (leave blank to discard): ").strip()
+        if plan_file:
+            write_plan(plan_file, preview, groups, summary)
+    return False
+
+
+def write_plan(plan_file, preview, groups, summary=None) -> bool:
+    # Streams the plan to JSON Lines or CSV (by extension), with the summary alongside as <plan>.summary.json
+    plan_file = Path(plan_file).expanduser()
+    if plan_file.suffix.lower() not in ('.jsonl', '.csv'):
+        raise ValueError("Rename plans must be .jsonl or .csv files")
+    summary = summary or plan_summary(preview, groups)
+    plan_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(plan_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS) if plan_file.suffix.lower() == '.csv' else None
+        if writer: writer.writeheader()
+        for old, new in preview:
+            if old == new: continue
+            stat = os.stat(old)
+            row = {'src': str(old), 'dst': str(new), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            if writer: writer.writerow(row)
+            else: f.write(json.dumps(row) + '\n')
+    summary_file = plan_file.with_suffix('.summary.json')
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print_summary(summary)
+    print(f"\nRename plan saved to {plan_file} (summary in {summary_file}).")
+    print(f"Apply it with `python -m run renames apply {plan_file}`.")
+    return True
+
+
+def read_plan(plan_file):
+    plan_file = Path(plan_file).expanduser()
+    with open(plan_file, 'r', newline='', encoding='utf-8') as f:
+        rows = csv.DictReader(f) if plan_file.suffix.lower() == '.csv' else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield Path(row['src']), Path(row['dst']), int(row['size']), int(row['mtime_ns'])
+
+
+def apply_plan(plan_file, assume_yes=False, on_renamed=None) -> int:
+    # Renames every file in a saved plan whose size and mtime are unchanged; returns the number not renamed
+    pairs, changed = [], []
+    for src, dst, size, mtime_ns in read_plan(plan_file):
+        try:
+            stat = os.stat(src)
+        except FileNotFoundError:
+            changed.append((src, "no longer exists"))
+            continue
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            changed.append((src, "has been modified since the plan was made"))
+            continue
+        pairs.append((src, dst))
+    for src, reason in changed:
+        print(f"Skipping {src.name}: {reason}")
+    print(f"\n{len(pairs)} rename(s) to apply, {len(changed)} skipped.")
+    if not pairs:
+        return len(changed)
+    if not prompts.confirm(assume_yes, "Proceed with renaming? (y/n): "):
+        print("Aborted.")
+        return len(pairs) + len(changed)
+    return rename_files(pairs, on_renamed) + len(changed)
@@ -0,0 +1,213 @@
+'''
+Planning and carrying out a restructure into decade / year / event-or-month folders.
+
+plan_restructure is pure: given parsed file names and an answer (or a callback) for whether event files more
+than a year apart share a folder, it returns the layout as {folder relative to the root: [source paths]},
+without touching the filesystem or prompting. plan_sync compares a layout with what a root folder already
+holds. place_files carries a layout out once its folders exist (create_folders makes each one once), and
+prune_empty_folders removes folders left without media in a single bottom-up pass over the tree.
+'''
+
+from calendar import month_name
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+import concurrent.futures
+import hashlib
+import os
+import re
+from .config import EVENT_FOLDER_THRESHOLD, SYNC_MTIME_WINDOW
+from .placement import PLACEMENT_VERBS, place_file
+from .walker import OTHER, SYSTEM_DIRS, classify
+
+
+# Standard names, YYYYMMDD_HHMMSS or YYMMDD_HHMMSS, then optional _suffixes and an optional _n index
+NAME_PATTERN = re.compile(r'^(\d{8}|\d{6})_(\d{6})((?:_[a-z0-9]+)*)(?:_([0-9]+))?\.[a-z0-9]+$', re.IGNORECASE)
+TRAILING_INDEX = re.compile(r'_\d+$')
+PLACE_WORKERS = 8  # Threads moving or placing files
+
+
+class RestructureFile(NamedTuple):
+    path: Path
+    date: datetime
+    suffix: str  # Event folder name, or None
+
+
+def is_restructured(path) -> bool:
+    # Photos, RAW files and videos, plus Photoshop documents kept alongside them
+    return classify(path) != OTHER or os.path.splitext(path)[1].lower() == '.psd'
+
+
+def event_suffix(suffixes):
+    # "_beach_party_2" -> "Beach_party", "_party_2019" -> "Party 2019", "_2019" -> None
+    cleaned = TRAILING_INDEX.sub('', suffixes)
+    if not cleaned:
+        return None
+    parts = cleaned.strip('_').split('_')
+    # If the last part is a number and the second-to-last is not, treat as "Event Year"
+    if len(parts) >= 2 and parts[-1].isdigit() and not parts[-2].isdigit():
+        return f"{parts[-2].capitalize()} {parts[-1]}"
+    if len(parts) == 1 and parts[-1].isdigit():
+        return None
+    # Join all as one event (e.g., beach_party2)
+    return '_'.join(parts).capitalize()
+
+
+def restructure_info(path):
+    # RestructureFile for a standard name, or None if path doesn't follow the naming scheme
+    m = NAME_PATTERN.match(path.name)
+    if not m:
+        return None
+    date_str = m.group(1)
+    try:
+        if len(date_str) == 8:
+            date = datetime(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+        else:
+            date = datetime(int('20' + date_str[:2]), int(date_str[2:4]), 1)
+    except ValueError:
+        return None
+    return RestructureFile(path, date, event_suffix(m.group(3)))
+
+
+def month_folder(year, month) -> Path:
+    return Path(f"{(year // 10) * 10}s", str(year), f"{month}. {month_name[month]}")
+
+
+def plan_restructure(files, group_year_gaps=False, event_threshold=EVENT_FOLDER_THRESHOLD) -> dict:
+    # {folder relative to the root: [source paths]} for RestructureFiles. Event files are split into separate
+    # folders where consecutive dates are more than a year apart, unless group_year_gaps is True or, if it is
+    # a function, returns True for (suffix, earlier file, later file). An event with fewer than event_threshold
+    # files goes in the month folder of its earliest date; files without an event go by year and month.
+    layout = defaultdict(list)
+    events, undated = defaultdict(list), defaultdict(list)
+    for info in files:
+        if info.suffix:
+            events[info.suffix].append(info)
+        else:
+            undated[(info.date.year, info.date.month)].append(info.path)
+
+    for suffix, group in events.items():
+        group.sort(key=lambda info: info.date)
+        runs = [[group[0]]]
+        for prev, curr in zip(group, group[1:]):
+            gap = curr.date.year - prev.date.year > 1
+            if gap and not (group_year_gaps(suffix, prev, curr) if callable(group_year_gaps) else group_year_gaps):
+                runs.append([curr])
+            else:
+                runs[-1].append(curr)
+        for run in runs:
+            earliest = run[0].date
+            if len(group) >= event_threshold:
+                folder = Path(f"{(earliest.year // 10) * 10}s", str(earliest.year), suffix)
+            else:
+                folder = month_folder(earliest.year, earliest.month)
+            layout[folder].extend(info.path for info in run)
+
+    for (year, month), paths in undated.items():
+        layout[month_folder(year, month)].extend(paths)
+    return dict(layout)
+
+
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_match(src, dest, compare='mtime') -> bool:
+    # Whether dest already holds src: same size and either the same modification time (within
+    # SYNC_MTIME_WINDOW seconds, as FAT and some network shares round it) or, with compare='hash', the same content
+    try:
+        src_stat, dest_stat = os.stat(src), os.stat(dest)
+    except OSError:
+        return False
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if compare == 'hash':
+        return file_digest(src) == file_digest(dest)
+    return abs(src_stat.st_mtime - dest_stat.st_mtime) <= SYNC_MTIME_WINDOW
+
+
+def plan_sync(placements, existing, compare='mtime') -> dict:
+    # Sorts (source, destination) placements into a root folder already holding the existing files into
+    # new, changed (destination differs from the source), moved ((old, new) for a matching file elsewhere in
+    # the root, e.g. after its event folder changed) and unchanged, plus the orphans no placement accounts for
+    existing = set(existing)
+    elsewhere = defaultdict(list)  # Existing files not at any destination, by name
+    for path in sorted(existing - {dest for _, dest in placements}):
+        elsewhere[path.name].append(path)
+    plan = {'new': [], 'changed': [], 'moved': [], 'unchanged': []}
+    for src, dest in placements:
+        if dest in existing:
+            plan['unchanged' if files_match(src, dest, compare) else 'changed'].append((src, dest))
+            continue
+        old = next((path for path in elsewhere.get(dest.name, ()) if files_match(src, path, compare)), None)
+        if old:
+            elsewhere[dest.name].remove(old)
+            plan['moved'].append((old, dest))
+        else:
+            plan['new'].append((src, dest))
+    plan['orphans'] = [path for paths in elsewhere.values() for path in paths]
+    return plan
+
+
+def create_folders(paths) -> None:
+    # Creates each distinct parent folder of paths once
+    for folder in dict.fromkeys(Path(path).parent for path in paths):
+        folder.mkdir(parents=True, exist_ok=True)
+
+
+def place_file_safely(src, dest, move, placement, unsupported) -> tuple:
+    try:
+        if src.resolve() == dest.resolve():
+            return True, f"Skipped {src.name}: source and destination are the same file."
+    except FileNotFoundError:
+        return False, f"Source file not found: {src}. Skipping."
+    try:
+        if move:
+            src.rename(dest)
+            action = "Moved"
+        else:
+            action = PLACEMENT_VERBS[place_file(src, dest, placement, unsupported)]
+        return True, f"{action} {src.name} -> {dest}"
+    except FileNotFoundError:
+        return False, f"File not found during operation: {src} -> {dest}. Skipping."
+    except Exception as e:
+        return False, f"Error processing {src} -> {dest}: {e}"
+
+
+def place_files(pairs, move=False, placement='auto', workers=PLACE_WORKERS):
+    # Moves, or places with run/placement.py, each (source, destination) pair across a thread pool; destination
+    # folders must already exist. Yields (source, destination, ok, message) in the order of pairs. A destination
+    # given twice is only placed the first time.
+    unsupported = set()  # Placement strategies found not to work between two devices
+    seen = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for src, dest in pairs:
+            if dest in seen:
+                futures.append((src, dest, None))
+                continue
+            seen.add(dest)
+            futures.append((src, dest, executor.submit(place_file_safely, src, dest, move, placement, unsupported)))
+        for src, dest, future in futures:
+            if future is None:
+                yield src, dest, True, f"Skipped {src.name}: already processed."
+            else:
+                yield (src, dest, *future.result())
+
+
+def prune_empty_folders(root, keep=is_restructured) -> list:
+    # Folders under root with no file kept by keep(name) anywhere in their subtree (hidden files included;
+    # system folders such as @eaDir and symlinked folders don't count), found in one bottom-up walk. Only the
+    # topmost such folders are returned, as removing them removes the rest.
+    has_media = {}
+    for folder, subdirs, names in os.walk(root, topdown=False):
+        has_media[folder] = (any(keep(name) for name in names)
+                             or any(has_media.get(os.path.join(folder, d), False) for d in subdirs if d not in SYSTEM_DIRS))
+    root = os.fspath(root)
+    return [Path(folder) for folder, media in has_media.items()
+            if not media and folder != root and (os.path.dirname(folder) == root or has_media[os.path.dirname(folder)])]
@@ -0,0 +1,211 @@
+'''
+XMP sidecars: metadata kept in a small IMAGE.xmp file next to the image (the Adobe convention, shared by a
+RAW file and its JPEG), so tagging a multi-gigabyte TIFF scan or RAW file doesn't rewrite it.
+
+EXIF and IPTC tags are converted to their XMP equivalents when written: EXIF_TAG_MAP tags go under the XMP
+namespace of their EXIF group (see EXIF_XMP_OVERRIDES), with dates in ISO 8601 (sub-seconds and time zone
+folded in) and GPS coordinates in XMP's "DDD,MM.mmmmk" form; IPTC tags follow IPTC_XMP_MAP. Readers (capture
+date resolution, export) give a sidecar's XMP precedence over what is embedded in the image.
+'''
+
+from datetime import datetime
+from fractions import Fraction
+from pathlib import Path
+import os
+from .config import EXIF_XMP_OVERRIDES, IPTC_XMP_MAP
+from .capture_date import PYEXIV2_LOCK, parse_exif_date
+
+
+SIDECAR_SUFFIX = '.xmp'
+EMPTY_PACKET = (
+    '<?xpacket begin="﻿" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+    ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"/>\n'
+    '</x:xmpmeta>\n'
+    '<?xpacket end="w"?>\n'
+)
+
+XMP_NAMESPACE_BY_EXIF_GROUP = {'Exif.Image': 'Xmp.tiff', 'Exif.Photo': 'Xmp.exif', 'Exif.GPSInfo': 'Xmp.exif'}
+# EXIF dates and the tags holding their sub-seconds and UTC offset
+EXIF_DATE_PARTS = {
+    'Exif.Image.DateTime': ('Exif.Photo.SubSecTime', 'Exif.Photo.OffsetTime'),
+    'Exif.Photo.DateTimeOriginal': ('Exif.Photo.SubSecTimeOriginal', 'Exif.Photo.OffsetTimeOriginal'),
+    'Exif.Photo.DateTimeDigitized': ('Exif.Photo.SubSecTimeDigitized', 'Exif.Photo.OffsetTimeDigitized'),
+}
+GPS_COORDINATES = {'Exif.GPSInfo.GPSLatitude': 'Exif.GPSInfo.GPSLatitudeRef', 'Exif.GPSInfo.GPSLongitude': 'Exif.GPSInfo.GPSLongitudeRef'}
+# Tags with no XMP property of their own, carried by the one they belong to
+FOLDED_EXIF_KEYS = frozenset([part for parts in EXIF_DATE_PARTS.values() for part in parts] + list(GPS_COORDINATES.values())
+                             + ['Exif.GPSInfo.GPSDateStamp'])
+FOLDED_IPTC_KEYS = frozenset(['Iptc.Application2.TimeCreated', 'Iptc.Application2.RecordVersion'])
+XMP_SEQ_KEYS = frozenset(['Xmp.exif.ISOSpeedRatings', 'Xmp.exif.ComponentsConfiguration', 'Xmp.exif.SubjectArea'])
+XMP_LIST_KEYS = frozenset(['Xmp.dc.subject', 'Xmp.dc.creator', 'Xmp.photoshop.SupplementalCategories'])
+XMP_VERSION_KEYS = frozenset(['Xmp.exif.ExifVersion', 'Xmp.exif.FlashpixVersion', 'Xmp.exif.FlashPixVersion'])
+# Sidecar properties giving the capture date, most specific first
+XMP_CAPTURE_DATE_KEYS = ['Xmp.exif.DateTimeOriginal', 'Xmp.photoshop.DateCreated', 'Xmp.xmp.CreateDate']
+
+
+def sidecar_path(path) -> Path:
+    return Path(path).with_suffix(SIDECAR_SUFFIX)
+
+
+def sidecar_mtime_ns(path):
+    try:
+        return os.stat(sidecar_path(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_sidecar(path) -> dict:
+    # The XMP in path's sidecar, or {} if it has none (or it can't be read)
+    import pyexiv2
+    sidecar = sidecar_path(path)
+    if not sidecar.is_file():
+        return {}
+    try:
+        with PYEXIV2_LOCK, pyexiv2.Image(str(sidecar)) as img:
+            return img.read_xmp()
+    except (RuntimeError, UnicodeDecodeError):
+        return {}
+
+
+def sidecar_capture_date(path):
+    xmp = read_sidecar(path)
+    for key in XMP_CAPTURE_DATE_KEYS:
+        value = xmp.get(key)
+        if not isinstance(value, str):
+            continue
+        try:
+            # Local time, as in EXIF
+            return datetime.fromisoformat(value).replace(tzinfo=None)
+        except ValueError:
+            continue
+    return None
+
+
+############# EXIF / IPTC to XMP #############
+
+
+def xmp_date(value, subsec=None, offset=None):
+    dt = parse_exif_date(value)
+    if not dt:
+        return None
+    text = dt.strftime('%Y-%m-%dT%H:%M:%S')
+    if subsec and str(subsec).strip().isdigit():
+        text += '.' + str(subsec).strip()
+    if offset and len(str(offset).strip()) == 6:
+        text += str(offset).strip()
+    return text
+
+
+def xmp_coordinate(value, ref):
+    # EXIF "51/1 30/1 1234/100" with ref "N" -> XMP "51,30.205667N"
+    try:
+        degrees, minutes, seconds = (Fraction(part) for part in str(value).split())
+    except (ValueError, ZeroDivisionError):
+        return None
+    if not ref:
+        return None
+    minutes_total = float(minutes + seconds / 60)
+    return f"{int(degrees)},{minutes_total:.6f}".rstrip('0').rstrip('.') + str(ref).strip()[:1]
+
+
+def xmp_gps_time(value, date_stamp):
+    try:
+        hours, minutes, seconds = (Fraction(part) for part in str(value).split())
+        day = datetime.strptime(str(date_stamp).strip(), '%Y:%m:%d')
+    except (ValueError, ZeroDivisionError):
+        return None
+    return f"{day:%Y-%m-%d}T{int(hours):02}:{int(minutes):02}:{int(seconds):02}Z"
+
+
+def xmp_version(value):
+    # Undefined-type EXIF versions read back as byte values, e.g. "48 50 51 50" for "0232"
+    parts = str(value).split()
+    if len(parts) == 4 and all(p.isdigit() and int(p) < 128 for p in parts):
+        return bytes(int(p) for p in parts).decode('ascii')
+    return value
+
+
+def exif_xmp_key(key):
+    if key in EXIF_XMP_OVERRIDES:
+        return EXIF_XMP_OVERRIDES[key]
+    group, _, name = key.rpartition('.')
+    namespace = XMP_NAMESPACE_BY_EXIF_GROUP.get(group)
+    return f"{namespace}.{name}" if namespace else None
+
+
+def to_xmp(exif=None, iptc=None, xmp=None) -> tuple:
+    # (XMP changes, failures) for EXIF (by exiv2 key), IPTC and XMP tags; failures are (namespace, key, reason)
+    # for tags with no XMP equivalent or a value that couldn't be converted. XMP tags win over converted ones.
+    exif, iptc = exif or {}, iptc or {}
+    changes, failures = {}, []
+    for key, value in exif.items():
+        if key in FOLDED_EXIF_KEYS:
+            continue
+        xmp_key = exif_xmp_key(key)
+        if key in EXIF_DATE_PARTS:
+            subsec, offset = (exif.get(part) for part in EXIF_DATE_PARTS[key])
+            value = xmp_date(value, subsec, offset)
+        elif key in GPS_COORDINATES:
+            value = xmp_coordinate(value, exif.get(GPS_COORDINATES[key]))
+        elif key == 'Exif.GPSInfo.GPSTimeStamp':
+            value = xmp_gps_time(value, exif.get('Exif.GPSInfo.GPSDateStamp'))
+        elif xmp_key in XMP_SEQ_KEYS:
+            value = str(value).split()
+        elif xmp_key in XMP_VERSION_KEYS:
+            value = xmp_version(value)
+        if not xmp_key:
+            failures.append(('EXIF', key, "no XMP equivalent"))
+        elif value is None:
+            failures.append(('EXIF', key, "value can't be converted to XMP"))
+        else:
+            changes[xmp_key] = value
+    for key, value in iptc.items():
+        if key in FOLDED_IPTC_KEYS or key.startswith('Iptc.Envelope.'):
+            continue
+        xmp_key = IPTC_XMP_MAP.get(key)
+        if not xmp_key:
+            failures.append(('IPTC', key, "no XMP equivalent"))
+            continue
+        if xmp_key in XMP_LIST_KEYS:
+            value = value if isinstance(value, list) else [value]
+        elif isinstance(value, list):
+            value = ', '.join(map(str, value))
+        if key == 'Iptc.Application2.DateCreated' and iptc.get('Iptc.Application2.TimeCreated'):
+            value = f"{value}T{iptc['Iptc.Application2.TimeCreated']}"
+        changes[xmp_key] = value
+    changes.update(xmp or {})
+    return changes, failures
+
+
+def write_sidecar(path, changes) -> list:
+    # Merges XMP changes into path's sidecar, creating it if needed; returns (namespace, key, error) failures
+    import pyexiv2
+    sidecar = sidecar_path(path)
+    if not sidecar.exists():
+        with open(sidecar, 'x', encoding='utf-8') as f:
+            f.write(EMPTY_PACKET)
+    failures = []
+    with PYEXIV2_LOCK, pyexiv2.Image(str(sidecar)) as img:
+        try:
+            img.modify_xmp(changes)
+        except Exception:
+            # One bad value fails the whole batch; retry tag by tag so only that one is lost
+            for key, value in changes.items():
+                try:
+                    img.modify_xmp({key: value})
+                except Exception as e:
+                    failures.append(('XMP', key, str(e)))
+    return failures
+
+
+def with_sidecars(pairs) -> list:
+    # (old, new) renames plus one for each old file's sidecar, so renaming IMG.tif doesn't orphan IMG.xmp.
+    # A sidecar shared by a RAW file and its JPEG follows the first of them.
+    result, moved = list(pairs), set()
+    for old, new in pairs:
+        sidecar = sidecar_path(old)
+        if old != new and sidecar not in moved and old.suffix.lower() != SIDECAR_SUFFIX and sidecar.is_file():
+            moved.add(sidecar)
+            result.append((sidecar, sidecar_path(new)))
+    return result
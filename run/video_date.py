@@ -0,0 +1,126 @@
+'''
+Creation time of ISO-BMFF / QuickTime videos (MP4, MOV, 3GP, ...) read directly from the container,
+instead of spawning ffprobe for every file.
+
+Only box headers are read while walking to moov/mvhd, so a large mdat is skipped with a single seek
+whether it comes before or after moov. mvhd holds the creation time ffprobe reports as `creation_time`
+(seconds since 1904 in UTC); if a recorder left it at zero, a udta ©day tag is used instead.
+'''
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import struct
+
+
+BMFF_EXTENSIONS = frozenset(['.mp4', '.m4v', '.mov', '.qt', '.3gp', '.3g2', '.mj2'])
+
+MAC_EPOCH = datetime(1904, 1, 1)
+MAX_BOXES = 4096
+MAX_TAG_BYTES = 256
+
+
+def iter_boxes(f, start, end):
+    # Yields (type, payload offset, payload size) for each box between start and end
+    offset = start
+    for _ in range(MAX_BOXES):
+        if offset + 8 > end:
+            return
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            (size,) = struct.unpack('>Q', large)
+            header_size = 16
+        elif size == 0:
+            size = end - offset  # Box extends to the end of its parent (or the file)
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def find_box(f, start, end, box_type):
+    for found, payload, size in iter_boxes(f, start, end):
+        if found == box_type:
+            return payload, size
+    return None
+
+
+def read_mvhd_creation(f, payload, size):
+    f.seek(payload)
+    data = f.read(min(size, 20))
+    if len(data) < 8:
+        return None
+    if data[0] == 1:
+        if len(data) < 12:
+            return None
+        (seconds,) = struct.unpack('>Q', data[4:12])
+    else:
+        (seconds,) = struct.unpack('>I', data[4:8])
+    if not seconds:
+        return None
+    try:
+        return MAC_EPOCH + timedelta(seconds=seconds)
+    except OverflowError:
+        return None
+
+
+def parse_day_tag(text):
+    # ©day is usually ISO 8601, sometimes with a UTC offset (e.g. 2021-05-06T07:08:09+0100); report UTC like mvhd
+    text = text.strip('\x00 ')
+    for fmt in ('%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            dt = datetime.strptime(text[:24], fmt)
+        except ValueError:
+            continue
+        return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+    return None
+
+
+def read_day_tag(f, udta, udta_size):
+    found = find_box(f, udta, udta + udta_size, b'\xa9day')
+    if found:
+        # QuickTime user data text: 2-byte length, 2-byte language, then the string
+        payload, size = found
+        f.seek(payload)
+        data = f.read(min(size, MAX_TAG_BYTES))
+        if len(data) >= 4:
+            (length,) = struct.unpack('>H', data[:2])
+            return parse_day_tag(data[4:4 + length].decode('utf-8', 'ignore'))
+        return None
+    # iTunes-style metadata: udta/meta (a full box, 4 bytes of version/flags)/ilst/©day/data
+    meta = find_box(f, udta, udta + udta_size, b'meta')
+    ilst = meta and find_box(f, meta[0] + 4, meta[0] + meta[1], b'ilst')
+    day = ilst and find_box(f, ilst[0], ilst[0] + ilst[1], b'\xa9day')
+    data = day and find_box(f, day[0], day[0] + day[1], b'data')
+    if not data:
+        return None
+    f.seek(data[0] + 8)  # Type indicator and locale
+    return parse_day_tag(f.read(min(data[1] - 8, MAX_TAG_BYTES)).decode('utf-8', 'ignore'))
+
+
+def read_bmff_creation_date(path):
+    # Returns a naive UTC datetime, or None if the file has no usable creation time (or isn't ISO-BMFF)
+    path = Path(path)
+    if path.suffix.lower() not in BMFF_EXTENSIONS:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            end = f.seek(0, 2)
+            moov = find_box(f, 0, end, b'moov')
+            if not moov:
+                return None
+            mvhd = find_box(f, moov[0], moov[0] + moov[1], b'mvhd')
+            dt = read_mvhd_creation(f, *mvhd) if mvhd else None
+            if dt:
+                return dt
+            udta = find_box(f, moov[0], moov[0] + moov[1], b'udta')
+            return read_day_tag(f, *udta) if udta else None
+    except (OSError, struct.error, ValueError):
+        return None
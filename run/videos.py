@@ -1,4 +1,11 @@
-from run.config import VIDEO_EXTENSIONS
+from run.config import VIDEO_EXTENSIONS, WALK_WORKERS
+from run.prompts import ask, ask_yes_no
+from run.captions import load_caption_manifest, caption_for
+from run.catalog import catalog_session
+from run.video_date import read_bmff_creation_date
+from run.renamer import rename_files, review_plan, write_plan, warn_incomplete_journals
+from run.walker import walk_media, media_paths, VIDEO
+from run import catalog
 import platform
 import re
 from pathlib import Path
@@ -41,7 +48,7 @@ def format_custom_date(date_str) -> str:
     return date_str
 
 
-def get_video_creation_date(video_path: Path) -> datetime:
+def get_ffprobe_creation_date(video_path: Path):
     try:
         cmd = [
             "ffprobe", "-v", "error", "-select_streams", "v:0",
@@ -57,35 +64,56 @@ def get_video_creation_date(video_path: Path) -> datetime:
                 pass
     except Exception:
         pass
+    return None
+
+
+def resolve_video_date(video_path: Path) -> tuple:
+    # Returns (datetime, source) where source is 'video' (the container's creation time), 'filename' or 'mtime'.
+    # MP4/MOV/3GP are read in-process; ffprobe is only spawned for other containers (MTS, MKV, AVI, ...)
+    # or when the native reader finds no creation time
+    dt = read_bmff_creation_date(video_path) or get_ffprobe_creation_date(video_path)
+    if dt:
+        return dt, 'video'
     m = re.search(r'(\d{8})[_\-]?(\d{6})', video_path.name)
     if m:
         try:
-            return datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S")
+            return datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S"), 'filename'
         except Exception:
             pass
     m = re.search(r'(\d{8})', video_path.name)
     if m:
         try:
-            return datetime.strptime(m.group(1), "%Y%m%d")
+            return datetime.strptime(m.group(1), "%Y%m%d"), 'filename'
         except Exception:
             pass
     stat = video_path.stat()
-    return datetime.fromtimestamp(stat.st_mtime)
+    return datetime.fromtimestamp(stat.st_mtime), 'mtime'
+
+
+def get_video_creation_date(video_path: Path) -> datetime:
+    return resolve_video_date(video_path)[0]
 
 
 ############ Main Functions ###########
 
 
-def burn_in_metadata_video() -> None:
+def burn_in_metadata_video(video_path=None, output_path=None, per_video_suffix=None, custom_text=None,
+                           custom_date=None, include_subdirs=None, caption_manifest=None) -> bool:
     print("\n" + "═" * 50)
     print("🎥  Burn-in Metadata to Videos  🎥".center(50))
     print("═" * 50)
-    video_path = input(" Enter path to the video or folder: ").strip()
-    output_path = input(" Enter output path (leave blank to overwrite original): ").strip()
-    per_video_suffix = input(" Add suffix to each video individually? (y/n): ").strip().lower() == 'y'
-    custom_text = None if per_video_suffix else input(" Enter custom text to burn in to all videos: ").strip()
-    use_custom_date = input(" Use custom date? (y/n): ").strip().lower() == 'y'
-    custom_date = input(" Enter date (YYYYMMDD, YYYYMM, or YYYY): ").strip() if use_custom_date else None
+    video_path = ask(video_path, " Enter path to the video or folder: ")
+    output_path = ask(output_path, " Enter output path (leave blank to overwrite original): ")
+    per_video_suffix = ask_yes_no(per_video_suffix, " Add suffix to each video individually? (y/n): ")
+    custom_text = None if per_video_suffix else ask(custom_text, " Enter custom text to burn in to all videos: ")
+    caption_manifest = ask(caption_manifest, " Caption manifest file (CSV/JSON, leave blank to type each caption): ") if per_video_suffix else None
+    try:
+        manifest = load_caption_manifest(caption_manifest) if caption_manifest else None
+    except Exception as e:
+        print(f"Could not read caption manifest {caption_manifest}: {e}")
+        return False
+    use_custom_date = ask_yes_no(None if custom_date is None else bool(custom_date), " Use custom date? (y/n): ")
+    custom_date = ask(custom_date, " Enter date (YYYYMMDD, YYYYMM, or YYYY): ") if use_custom_date else None
 
     # Convert Windows paths to WSL format if running on Linux
     if platform.system() == 'Linux' and ':' in video_path and '\\' in video_path:
@@ -95,7 +123,7 @@ def burn_in_metadata_video() -> None:
 
     path = Path(video_path)
     if path.is_dir():
-        include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
+        include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
     else:
         include_subdirs = False
 
@@ -145,12 +173,12 @@ def burn_in_metadata_video() -> None:
             pass
         return (None, [])
 
-    def process_video(in_path, out_path, custom_text=None) -> None:
-        dt_obj = get_video_creation_date(in_path)
+    def process_video(conn, in_path, out_path, custom_text=None) -> bool:
+        # conn is the run's catalog connection; the creation date is only looked up without a custom date
         if custom_date:
             timestamp = format_custom_date_str(custom_date)
         else:
-            timestamp = format_date_with_suffix(dt_obj)
+            timestamp = format_date_with_suffix(catalog.video_created(conn, in_path, resolve_video_date))
         display_text = f"{timestamp}{f' | {custom_text}' if custom_text else ''}"
 
         fontfile = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
@@ -202,74 +230,92 @@ def burn_in_metadata_video() -> None:
                 print(f"Burned-in metadata to {in_path} (overwritten)")
             else:
                 print(f"Burned-in metadata to {out_file}")
+            return True
         except subprocess.CalledProcessError as e:
             # Clean up temp file if it exists and there was an error
             if is_temp_file and out_file.exists():
                 out_file.unlink()
             print(f"Error processing video {in_path}: {e}")
+            return False
 
     if not path.exists():
         print(f"Path not found: {video_path}")
-        return
-    video_exts = [ext.lower() for ext in VIDEO_EXTENSIONS]
-    if path.is_dir():
-        output_folder = Path(output_path) if output_path else None
-        if output_folder:
-            output_folder.mkdir(parents=True, exist_ok=True)
-        files = path.rglob('*') if include_subdirs else path.glob('*')
-        videos = [p for p in files if p.suffix.lower() in video_exts]
-        if not videos:
-            print(f"No videos found in {video_path}")
-            return
-        for vid_path in videos:
-            out_file = (output_folder / vid_path.name) if output_folder else vid_path
-            if per_video_suffix:
+        return False
+    # One catalog connection for the whole run, committed once at the end
+    with catalog_session() as conn:
+        if path.is_dir():
+            output_folder = Path(output_path) if output_path else None
+            if output_folder:
+                output_folder.mkdir(parents=True, exist_ok=True)
+            videos = media_paths(path, include_subdirs, [VIDEO])
+            if not videos:
+                print(f"No videos found in {video_path}")
+                return False
+            # Collect every caption before encoding starts so the batch runs unattended
+            captions = {}
+            uncaptioned = []
+            for vid_path in videos:
+                if manifest:
+                    captions[vid_path] = caption_for(manifest, vid_path, path)
+                    if captions[vid_path] is None:
+                        uncaptioned.append(vid_path.name)
+                elif per_video_suffix:
+                    try:
+                        captions[vid_path] = ask(None, f"Enter custom suffix for '{vid_path.name}' (leave blank for none): ")
+                    except EOFError:
+                        captions[vid_path] = ""
+                else:
+                    captions[vid_path] = custom_text
+            if uncaptioned:
+                print(f"⚠️  {len(uncaptioned)} video(s) have no entry in the caption manifest and will only show the date: {', '.join(uncaptioned[:10])}{' ...' if len(uncaptioned) > 10 else ''}")
+            failed = 0
+            for vid_path in videos:
+                out_file = (output_folder / vid_path.name) if output_folder else vid_path
+                if not process_video(conn, vid_path, out_file, captions[vid_path] if captions[vid_path] else None):
+                    failed += 1
+            return failed == 0
+        else:
+            if not path.suffix.lower() in VIDEO_EXTENSIONS:
+                print(f"File is not a supported video: {video_path}")
+                return False
+            out_file = Path(output_path) if output_path else path
+            if manifest:
+                custom_text = caption_for(manifest, path)
+                return process_video(conn, path, out_file, custom_text if custom_text else None)
+            elif per_video_suffix:
                 try:
-                    custom_text = input(f"Enter custom suffix for '{vid_path.name}' (leave blank for none): ").strip()
+                    custom_text = ask(None, f"Enter custom suffix for '{path.name}' (leave blank for none): ")
                 except EOFError:
                     custom_text = ""
-                process_video(vid_path, out_file, custom_text if custom_text else None)
+                return process_video(conn, path, out_file, custom_text if custom_text else None)
             else:
-                process_video(vid_path, out_file, custom_text)
-    else:
-        if not path.suffix.lower() in video_exts:
-            print(f"File is not a supported video: {video_path}")
-            return
-        out_file = Path(output_path) if output_path else path
-        if per_video_suffix:
-            try:
-                custom_text = input(f"Enter custom suffix for '{path.name}' (leave blank for none): ").strip()
-            except EOFError:
-                custom_text = ""
-            process_video(path, out_file, custom_text if custom_text else None)
-        else:
-            process_video(path, out_file, custom_text)
+                return process_video(conn, path, out_file, custom_text)
 
 
-def rename_videos() -> None:
+def rename_videos(folder_path=None, include_subdirs=None, custom_suffix=None, custom_date=None, assume_yes=False,
+                  plan_file=None) -> bool:
     print("\n" + "═" * 50)
     print("🎬  Rename Videos  🎬".center(50))
     print("═" * 50)
-    folder_path = input(" Enter folder path: ").strip()
-    include_subdirs = input(" Include subdirectories? (y/n): ").strip().lower() == 'y'
-    custom_suffix = input(" Custom suffix (leave blank for none): ").strip()
-    use_custom_date = input(" Use custom date? (y/n): ").strip().lower() == 'y'
-    custom_date = input(" Enter date (YYYYMMDD): ").strip() if use_custom_date else None
+    warn_incomplete_journals()
+    folder_path = ask(folder_path, " Enter folder path: ")
+    include_subdirs = ask_yes_no(include_subdirs, " Include subdirectories? (y/n): ")
+    custom_suffix = ask(custom_suffix, " Custom suffix (leave blank for none): ")
+    use_custom_date = ask_yes_no(None if custom_date is None else bool(custom_date), " Use custom date? (y/n): ")
+    custom_date = ask(custom_date, " Enter date (YYYYMMDD): ") if use_custom_date else None
 
     # Convert Windows paths to WSL format if running on Linux
     folder = convert_windows_path_to_wsl(folder_path) if (platform.system() == 'Linux' and ':' in folder_path and '\\' in folder_path) else folder_path
     folder = Path(folder).resolve()
     if not folder.is_dir():
         raise ValueError(f"Not a directory: {folder}")
-    files = folder.rglob('*') if include_subdirs else folder.iterdir()
-    valid_exts = [ext.lower() for ext in VIDEO_EXTENSIONS]
     custom_suffix = '_'.join(custom_suffix.split()).lower() if custom_suffix else ""
     base_name_to_files = {}
-    for file_path in files:
-        if not file_path.is_file() or file_path.suffix.lower() not in valid_exts:
-            continue
-        # --- Get video creation or fallback date ---
-        dt = get_video_creation_date(file_path)
+    candidates = list(walk_media(folder, include_subdirs, [VIDEO], workers=WALK_WORKERS))
+    # --- Get video creation or fallback dates (from the catalog, or concurrent ffprobe calls) ---
+    with catalog_session() as conn:
+        dates = catalog.videos_created(conn, candidates, resolve_video_date)
+    for file_path, dt in zip((m.path for m in candidates), dates):
         if custom_date:
             try:
                 custom_date_obj = datetime.strptime(custom_date, "%Y%m%d")
@@ -295,18 +341,12 @@ def rename_videos() -> None:
             new_path = file_path.with_name(new_name)
             preview.append((file_path, new_path))
 
-    print("\nPlanned renames:")
-    for old, new in preview:
-        print(f"{old.name} -> {new.name}")
-
-    confirm = input("\nProceed with renaming? (y/n): ").strip().lower()
-    if confirm != 'y':
-        print("Aborted.")
-        return
+    groups = {base: len(files_list) for base, files_list in base_name_to_files.items()}
+    if plan_file:
+        return write_plan(plan_file, preview, groups)
+    if not review_plan(preview, groups, assume_yes):
+        return False
 
-    for old, new in preview:
-        try:
-            old.rename(new)
-            print(f"Renamed {old.name} -> {new.name}")
-        except Exception as e:
-            print(f"Failed to rename {old.name}: {e}")
+    with catalog_session() as conn:
+        failed = rename_files(preview, lambda old, new: catalog.record_move(conn, old, new))
+    return failed == 0
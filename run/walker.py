@@ -0,0 +1,113 @@
+'''
+Directory walking shared by every photo and video operation.
+
+Folders are listed with os.scandir, so file types come from the directory listing itself and each file's
+stat (used for sizes, mtimes and catalog lookups) is fetched at most once and cached on its DirEntry.
+Extensions are classified with a single dict lookup into image / raw / video / other.
+
+Hidden files and folders (names starting with '.', e.g. macOS '._IMG_0001.JPG' resource forks) and
+system folders such as '@eaDir' or '$RECYCLE.BIN' are skipped, and symlinked folders aren't followed.
+Entries are yielded folder by folder, sorted by name within each folder, in the same order whether or
+not subfolders are listed in parallel.
+'''
+
+import concurrent.futures
+import os
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+from .config import IMAGE_EXTENSIONS, RAW_EXTENSIONS, VIDEO_EXTENSIONS
+
+
+IMAGE = 'image'
+RAW = 'raw'
+VIDEO = 'video'
+OTHER = 'other'
+
+# Formats listed as both images and RAW (TIFF, HEIC) count as images, so they are included with or without RAW files
+KIND_BY_EXTENSION = {
+    **{ext: VIDEO for ext in VIDEO_EXTENSIONS},
+    **{ext: RAW for ext in RAW_EXTENSIONS},
+    **{ext: IMAGE for ext in IMAGE_EXTENSIONS},
+}
+
+SYSTEM_DIRS = frozenset([
+    '@eaDir', '#recycle', '#snapshot', '$RECYCLE.BIN', 'System Volume Information', 'lost+found', '__MACOSX',
+])
+
+
+class MediaEntry(NamedTuple):
+    path: Path
+    kind: str
+    ext: str
+    entry: os.DirEntry
+
+    def stat(self) -> os.stat_result:
+        # DirEntry caches the result, so repeated calls cost nothing
+        return self.entry.stat()
+
+
+def classify(path) -> str:
+    return KIND_BY_EXTENSION.get(os.path.splitext(path)[1].lower(), OTHER)
+
+
+def scan_dir(directory, include_hidden) -> tuple:
+    # One folder's files (as MediaEntry) and subfolders, each sorted by name
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except (PermissionError, FileNotFoundError, NotADirectoryError) as e:
+        print(f"⚠️  Skipping {directory}: {e}")
+        return files, subdirs
+    for entry in entries:
+        if not include_hidden and entry.name.startswith('.'):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SYSTEM_DIRS:
+                    subdirs.append(entry.path)
+            elif entry.is_file():
+                ext = os.path.splitext(entry.name)[1].lower()
+                files.append(MediaEntry(Path(entry.path), KIND_BY_EXTENSION.get(ext, OTHER), ext, entry))
+        except OSError:
+            continue
+    return files, subdirs
+
+
+def walk_media(root, recursive=True, kinds=None, include_hidden=False, workers=1):
+    # Yields a MediaEntry for every file under root (only root itself if not recursive) whose kind is in
+    # kinds (all files if kinds is None). With workers > 1, folders are listed ahead of time by a thread
+    # pool, which mostly helps on network drives and other high-latency storage.
+    kinds = frozenset(kinds) if kinds is not None else None
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers) if recursive and workers > 1 else None
+
+    def scan(directory):
+        if executor:
+            return executor.submit(scan_dir, directory, include_hidden)
+        return scan_dir(directory, include_hidden)
+
+    try:
+        # Depth-first, so output order matches a serial walk; the pool only works ahead
+        stack = [scan(str(root))]
+        while stack:
+            listing = stack.pop()
+            files, subdirs = listing.result() if executor else listing
+            for media in files:
+                if kinds is None or media.kind in kinds:
+                    yield media
+            if recursive:
+                stack.extend(scan(d) for d in reversed(subdirs))
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def walk_order(relative_path) -> tuple:
+    # Sort key giving walk_media's order for paths relative to its root: depth first, and within a folder
+    # its files by name, then its subfolders by name
+    *folders, name = PurePosixPath(relative_path).parts
+    return tuple((1, folder) for folder in folders) + ((0, name),)
+
+
+def media_paths(root, recursive=True, kinds=None, include_hidden=False, workers=1) -> list:
+    return [media.path for media in walk_media(root, recursive, kinds, include_hidden, workers)]
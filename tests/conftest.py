@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(tmp_path_factory, monkeypatch):
+    # The catalog, rename journals and thumbnail cache all live under ~/.cache
+    monkeypatch.setenv('HOME', str(tmp_path_factory.mktemp('home')))
@@ -0,0 +1,43 @@
+from PIL import Image, ImageChops
+
+from run import catalog, photos
+
+
+def test_strip_render_in_place_keeps_pixels(tmp_path, monkeypatch):
+    # The default burn-in output is the original file itself, which the strip renderer is still reading
+    monkeypatch.setattr(photos, 'STRIP_RENDER_MIN_PIXELS', 0)
+    monkeypatch.setattr(photos, 'STRIP_ROWS', 16)
+    original = Image.linear_gradient('L').resize((300, 200)).convert('RGB')
+    scan = tmp_path / 'scan.tif'
+    original.save(scan)
+
+    with Image.open(scan) as img:
+        assert photos.can_render_in_strips(img, scan)
+    assert photos.process_image(scan, scan, "Roll 12, frame 3")
+
+    with Image.open(scan) as result:
+        result.load()
+        assert result.width == original.width
+        assert result.height > original.height
+        assert ImageChops.difference(result.crop((0, 0, 300, 200)), original).getbbox() is None
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_custom_date_skips_capture_date_lookup(tmp_path, monkeypatch):
+    def unexpected(path):
+        raise AssertionError(f"capture date looked up for {path}")
+    monkeypatch.setattr(photos, 'resolve_capture_date', unexpected)
+    path = tmp_path / 'photo.jpg'
+    Image.new('RGB', (300, 200)).save(path)
+    ok, message = photos.process_image_basic(path, path, custom_date='20010203')
+    assert ok, message
+
+
+def test_single_file_capture_date_comes_from_the_catalog(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    Image.new('RGB', (300, 200)).save(path)
+    out = tmp_path / 'out.jpg'
+    assert photos.burn_in_metadata_basic(str(path), str(out), False, 'Roll 12', '', False)
+    with catalog.catalog_session() as conn:
+        assert [row['path'] for row in conn.execute('SELECT path FROM files')] == [catalog.catalog_key(path)]
+    assert out.exists()
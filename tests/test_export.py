@@ -0,0 +1,79 @@
+import io
+import json
+import os
+
+import pyexiv2
+import pytest
+from PIL import Image
+
+from run import photos
+from run.metadata_files import (COMPRESSIONS, EXPORT_FORMATS, close_writer, export_path, export_state_path, iter_json_array,
+                                open_writer, read_records, write_record)
+
+
+def make_photos(folder, count):
+    folder.mkdir()
+    for i in range(count):
+        path = folder / f"IMG_{i:04}.jpg"
+        Image.new('RGB', (8, 8)).save(path)
+        with pyexiv2.Image(str(path)) as img:
+            img.modify_exif({'Exif.Image.Make': 'Canon', 'Exif.Photo.DateTimeOriginal': f'2001:02:03 04:05:{i:02}'})
+    return folder
+
+
+RECORDS = [
+    {'File Name': 'IMG_0001.jpg', 'File Size': 1234, 'Date Created': '2001-02-03 04:05:06',
+     'EXIF Data': {'Make': 'Canon', 'DateTimeOriginal': '2001:02:03 04:05:06', 'FNumber': '28/10'},
+     'IPTC Data': {'Keywords': ['beach', 'Ærø'], 'City': 'Marstal'},
+     'XMP Data': {'Xmp.dc.title': {'lang="x-default"': 'Sunset, "late"'}}},
+    {'File Name': 'scan, 2.tif', 'File Size': 5, 'EXIF Data': {'Model': '9000\nF'}},
+]
+
+
+@pytest.mark.parametrize('fmt,compression', [(fmt, compression) for fmt in EXPORT_FORMATS for compression in [None, *COMPRESSIONS]
+                                             if fmt != 'sqlite' or compression is None])
+def test_every_format_reads_back_as_written(tmp_path, fmt, compression):
+    path = export_path(tmp_path, fmt, compression)
+    writer = open_writer(path, fmt, compression)
+    for record in RECORDS:
+        write_record(writer, record)
+    close_writer(writer)
+    assert list(read_records(path)) == RECORDS
+    assert sorted(p.name for p in tmp_path.iterdir()) == [path.name]
+
+
+def export(folder, out, fmt='jsonl', incremental=False):
+    assert photos.export_metadata(str(folder), False, str(out), fmt, 'none', incremental)
+    return {record['File Name']: record for record in read_records(out / f'metadata.{fmt}')}
+
+
+def test_incremental_export_matches_full_export(tmp_path):
+    folder = make_photos(tmp_path / 'photos', 4)
+    out = tmp_path / 'out'
+    export(folder, out)
+    state = export_state_path(out)
+    assert state.exists()
+
+    (folder / 'IMG_0001.jpg').unlink()
+    with pyexiv2.Image(str(folder / 'IMG_0002.jpg')) as img:
+        img.modify_exif({'Exif.Image.Make': 'Nikon'})
+    make_photos(tmp_path / 'more', 1)
+    os.replace(tmp_path / 'more' / 'IMG_0000.jpg', folder / 'IMG_0009.jpg')
+
+    incremental = export(folder, out, incremental=True)
+    assert not list(out.glob('*.part'))
+    assert incremental == export(folder, tmp_path / 'full')
+    assert sorted(incremental) == ['IMG_0000.jpg', 'IMG_0002.jpg', 'IMG_0003.jpg', 'IMG_0009.jpg']
+    assert incremental['IMG_0002.jpg']['EXIF Data']['Make'] == 'Nikon'
+
+
+def test_json_array_streams_across_chunk_boundaries():
+    records = [{'File Name': 'a ], b.jpg', 'File Size': 1.5e10}, [1, [2]], -12345, None, True, {}]
+    for indent in (None, 2):
+        text = json.dumps(records, indent=indent)
+        for chunk_size in (1, 3, 7, 64):
+            assert list(iter_json_array(io.StringIO(text), chunk_size)) == records
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+    for broken in ('', '{}', '[1,', '[1 2]', '[1,]'):
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.StringIO(broken), 2))
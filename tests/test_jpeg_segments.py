@@ -0,0 +1,65 @@
+import os
+
+import pyexiv2
+from PIL import Image, ImageCms
+
+from run.jpeg_segments import header_segments, is_metadata, splice_metadata
+
+
+def make_jpeg(path):
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    exif = Image.Exif()
+    exif[0x010f] = 'Canon'
+    Image.linear_gradient('L').convert('RGB').save(path, quality=90, exif=exif.tobytes(), icc_profile=icc)
+    return path
+
+
+def split(path):
+    # (non-metadata segments, image data)
+    data = path.read_bytes()
+    segments, image_start = header_segments(data)
+    return [data[start:end] for marker, start, end in segments if not is_metadata(data, marker, start)], data[image_start:]
+
+
+def test_splice_keeps_image_data_and_other_segments(tmp_path):
+    photo = make_jpeg(tmp_path / 'photo.jpg')
+    before = split(photo)
+    assert splice_metadata(photo, lambda img: (img.modify_exif({'Exif.Image.Artist': 'Someone else entirely'}),
+                                               img.modify_iptc({'Iptc.Application2.Keywords': ['a', 'b']}),
+                                               img.modify_xmp({'Xmp.dc.subject': ['x']})))
+    assert split(photo) == before
+    with pyexiv2.Image(str(photo)) as img:
+        assert img.read_exif()['Exif.Image.Make'] == 'Canon'
+        assert img.read_exif()['Exif.Image.Artist'] == 'Someone else entirely'
+        assert img.read_iptc() == {'Iptc.Application2.Keywords': ['a', 'b']}
+        assert img.read_xmp()['Xmp.dc.subject'] == ['x']
+    Image.open(photo).load()
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_same_size_header_is_replaced_atomically(tmp_path):
+    photo = make_jpeg(tmp_path / 'photo.jpg')
+    link = tmp_path / 'link.jpg'
+    os.link(photo, link)
+    assert splice_metadata(photo, lambda img: img.modify_exif({'Exif.Image.Make': 'Nikon'}))
+    assert os.stat(photo).st_ino != os.stat(link).st_ino
+    assert os.path.getsize(photo) == os.path.getsize(link)
+    with pyexiv2.Image(str(photo)) as img:
+        assert img.read_exif()['Exif.Image.Make'] == 'Nikon'
+    with pyexiv2.Image(str(link)) as img:
+        assert img.read_exif()['Exif.Image.Make'] == 'Canon'
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_resized_header_keeps_mode(tmp_path):
+    photo = make_jpeg(tmp_path / 'photo.jpg')
+    os.chmod(photo, 0o640)
+    assert splice_metadata(photo, lambda img: img.modify_xmp({'Xmp.dc.subject': ['a much longer list', 'of keywords']}))
+    assert os.stat(photo).st_mode & 0o777 == 0o640
+
+
+def test_other_formats_are_left_to_pyexiv2(tmp_path):
+    Image.new('RGB', (4, 4)).save(tmp_path / 'a.png')
+    (tmp_path / 'empty.jpg').touch()
+    assert not splice_metadata(tmp_path / 'a.png', None)
+    assert not splice_metadata(tmp_path / 'empty.jpg', None)
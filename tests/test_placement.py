@@ -0,0 +1,35 @@
+import errno
+
+from run import placement
+
+
+def failing(code, calls):
+    def placer(src, dest):
+        calls.append(dest)
+        raise OSError(code, "refused")
+    return placer
+
+
+def test_per_file_errors_fall_back_without_being_remembered(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(placement.PLACERS, 'hardlink', failing(errno.EPERM, calls))
+    src = tmp_path / 'a.jpg'
+    src.write_bytes(b'data')
+    unsupported = set()
+    for name in ('b.jpg', 'c.jpg'):
+        assert placement.place_file(src, tmp_path / name, 'hardlink', unsupported) == 'copy'
+        assert (tmp_path / name).read_bytes() == b'data'
+    assert len(calls) == 2
+    assert not unsupported
+
+
+def test_unsupported_strategy_is_only_tried_once(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(placement.PLACERS, 'hardlink', failing(errno.EXDEV, calls))
+    src = tmp_path / 'a.jpg'
+    src.write_bytes(b'data')
+    unsupported = set()
+    for name in ('b.jpg', 'c.jpg'):
+        assert placement.place_file(src, tmp_path / name, 'hardlink', unsupported) == 'copy'
+    assert len(calls) == 1
+    assert [name for name, *_ in unsupported] == ['hardlink']
@@ -0,0 +1,93 @@
+import pytest
+
+from run import renamer
+from run.config import RENAME_JOURNALS_KEPT
+
+
+def make_files(folder, names):
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_text(name)
+    return folder
+
+
+def contents(folder):
+    # {name: original name} for every file, temporary ones included
+    return {path.name: path.read_text() for path in folder.iterdir()}
+
+
+def test_swap_and_cycle(tmp_path):
+    folder = make_files(tmp_path / 'photos', ['a.jpg', 'b.jpg', 'x.jpg', 'y.jpg', 'z.jpg'])
+    renames = {'a.jpg': 'b.jpg', 'b.jpg': 'a.jpg', 'x.jpg': 'y.jpg', 'y.jpg': 'z.jpg', 'z.jpg': 'x.jpg'}
+    renamed = []
+    failures = renamer.rename_files([(folder / old, folder / new) for old, new in renames.items()],
+                                    lambda old, new: renamed.append((old.name, new.name)), tmp_path / 'journals')
+    assert failures == 0
+    assert contents(folder) == {new: old for old, new in renames.items()}
+    assert sorted(renamed) == sorted(renames.items())
+    assert renamer.incomplete_journals(tmp_path / 'journals') == []
+
+    # Finished runs' journals are kept for rollback, but only the newest RENAME_JOURNALS_KEPT of them
+    journals = tmp_path / 'journals'
+    for _ in range(RENAME_JOURNALS_KEPT + 1):
+        assert renamer.rename_files([(folder / 'a.jpg', folder / 'b.jpg'), (folder / 'b.jpg', folder / 'a.jpg')],
+                                    journal_dir=journals) == 0
+    assert len(list(journals.iterdir())) == RENAME_JOURNALS_KEPT
+    assert contents(folder)['a.jpg'] == 'a.jpg'
+
+
+def test_existing_target_is_refused(tmp_path):
+    folder = make_files(tmp_path / 'photos', ['a.jpg', 'b.jpg', 'c.jpg'])
+    pairs = [(folder / 'a.jpg', folder / 'b.jpg'), (folder / 'c.jpg', folder / 'd.jpg')]
+    entries, refused = renamer.plan_entries(pairs)
+    assert [entry['src'] for entry in entries] == ['c.jpg']
+    assert refused == [(folder / 'a.jpg', folder / 'b.jpg', "target already exists")]
+    assert renamer.rename_files(pairs, journal_dir=tmp_path / 'journals') == 1
+    assert contents(folder) == {'a.jpg': 'a.jpg', 'b.jpg': 'b.jpg', 'd.jpg': 'c.jpg'}
+
+
+def test_two_files_to_one_name_are_refused(tmp_path):
+    folder = make_files(tmp_path / 'photos', ['a.jpg', 'b.jpg'])
+    entries, refused = renamer.plan_entries([(folder / 'a.jpg', folder / 'c.jpg'), (folder / 'b.jpg', folder / 'c.jpg')])
+    assert len(entries) == 1
+    assert [(old.name, reason) for old, _, reason in refused] == [('b.jpg', "another file in this run is being renamed to the same name")]
+
+
+def crash_in_phase_2(monkeypatch):
+    # The process dies on the first move from a temporary name to a final one
+    rename_in = renamer.rename_in
+
+    def crashing(open_dir, directory, src, dst):
+        if src.startswith('.archivist-'):
+            raise KeyboardInterrupt
+        rename_in(open_dir, directory, src, dst)
+    monkeypatch.setattr(renamer, 'rename_in', crashing)
+
+
+def interrupted_swap(tmp_path, monkeypatch):
+    folder = make_files(tmp_path / 'photos', ['a.jpg', 'b.jpg', 'c.jpg'])
+    renames = {'a.jpg': 'b.jpg', 'b.jpg': 'a.jpg', 'c.jpg': 'd.jpg'}
+    with monkeypatch.context() as patch:
+        crash_in_phase_2(patch)
+        with pytest.raises(KeyboardInterrupt):
+            renamer.rename_files([(folder / old, folder / new) for old, new in renames.items()], journal_dir=tmp_path / 'journals')
+    # Everything is under its temporary name, and the journal is left incomplete
+    assert all(name.startswith('.archivist-') for name in contents(folder))
+    journals = renamer.incomplete_journals(tmp_path / 'journals')
+    assert len(journals) == 1
+    return folder, renames, journals[0]
+
+
+def test_resume_after_crash_between_phases(tmp_path, monkeypatch):
+    folder, renames, journal = interrupted_swap(tmp_path, monkeypatch)
+    assert renamer.resume_renames(journal) == 0
+    assert contents(folder) == {new: old for old, new in renames.items()}
+    assert renamer.incomplete_journals(tmp_path / 'journals') == []
+    assert renamer.resume_renames(journal) == 0
+
+
+def test_rollback_after_crash_between_phases(tmp_path, monkeypatch):
+    folder, renames, journal = interrupted_swap(tmp_path, monkeypatch)
+    assert renamer.rollback_renames(journal) == 0
+    assert contents(folder) == {old: old for old in renames}
+    assert renamer.incomplete_journals(tmp_path / 'journals') == []
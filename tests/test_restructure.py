@@ -0,0 +1,154 @@
+import os
+import random
+import re
+import shutil
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from run import photos
+from run.restructure import plan_restructure, prune_empty_folders, restructure_info
+
+
+NAMES = ['20190105_101500.jpg', '20190105_101501_2.jpg', '20190712_080000_beach.jpg', '20210301_120000.mp4']
+
+
+def make_source(folder):
+    folder.mkdir()
+    for i, name in enumerate(NAMES):
+        (folder / name).write_bytes(name.encode())
+        os.utime(folder / name, ns=(10**18 + i, 10**18 + i))
+    return folder
+
+
+def snapshot(root):
+    # Every path under root with its content and modification time
+    return {path.relative_to(root): (path.read_bytes() if path.is_file() else None, path.stat().st_mtime_ns)
+            for path in sorted(root.rglob('*'))}
+
+
+def restructure(src, root, **options):
+    return photos.restructure_folders(str(src), str(root), group_year_gaps=False, assume_yes=True,
+                                      placement='copy', **options)
+
+
+def test_dry_run_leaves_both_trees_unchanged(tmp_path):
+    src = make_source(tmp_path / 'src')
+    root = tmp_path / 'root'
+    root.mkdir()
+    (root / 'old.txt').write_text('keep me')
+    before = snapshot(tmp_path)
+    assert restructure(src, root, sync=False, dry_run=True)
+    assert restructure(src, root, sync=True, delete_orphans=True, dry_run=True)
+    assert restructure(src, src, dry_run=True)
+    assert snapshot(tmp_path) == before
+
+
+def test_sync_of_an_up_to_date_root_changes_nothing(tmp_path):
+    src = make_source(tmp_path / 'src')
+    root = tmp_path / 'root'
+    assert restructure(src, root)
+    assert (root / '2010s' / '2019' / '1. January' / '20190105_101501_2.jpg').exists()
+    before = snapshot(tmp_path)
+    assert restructure(src, root, sync=True, delete_orphans=True)
+    assert snapshot(tmp_path) == before
+
+
+def test_sync_into_the_source_itself_restructures_in_place(tmp_path):
+    src = make_source(tmp_path / 'src')
+    assert restructure(src, src, sync=True, delete_orphans=True)
+    assert sorted(p.relative_to(src).as_posix() for p in src.rglob('*') if p.is_file()) == [
+        '2010s/2019/1. January/20190105_101500.jpg', '2010s/2019/1. January/20190105_101501_2.jpg',
+        '2010s/2019/7. July/20190712_080000_beach.jpg', '2020s/2021/3. March/20210301_120000.mp4']
+
+
+def old_layout(paths, group_year_gaps, threshold=10):
+    # Destinations as restructure_folders worked them out before planning moved to run/restructure.py
+    suffix_groups, no_suffix_groups = defaultdict(list), defaultdict(list)
+    for path in paths:
+        m = re.match(r'^(\d{8}|\d{6})_(\d{6})((?:_[a-z0-9]+)*)(?:_([0-9]+))?\.[a-z0-9]+$', path.name, re.IGNORECASE)
+        date_str, cleaned, suffix = m.group(1), re.sub(r'_\d+$', '', m.group(3)), None
+        if cleaned:
+            parts = cleaned.strip('_').split('_')
+            if len(parts) >= 2 and parts[-1].isdigit() and not parts[-2].isdigit():
+                suffix = f"{parts[-2].capitalize()} {parts[-1]}"
+            elif not (len(parts) == 1 and parts[-1].isdigit()):
+                suffix = '_'.join(parts).capitalize()
+        if len(date_str) == 8:
+            date = datetime(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+        else:
+            date = datetime(int('20' + date_str[:2]), int(date_str[2:4]), 1)
+        info = {'path': path, 'date': date}
+        if suffix:
+            suffix_groups[suffix].append(info)
+        else:
+            no_suffix_groups[(date.year, date.month)].append(info)
+
+    def month_folder(date):
+        return Path(f"{(date.year // 10) * 10}s", str(date.year), f"{date.month}. {date.strftime('%B')}")
+
+    destinations = {}
+    for suffix, group in suffix_groups.items():
+        group = sorted(group, key=lambda x: x['date'])
+        folders, current = [], [group[0]]
+        for prev, curr in zip(group, group[1:]):
+            if curr['date'].year - prev['date'].year > 1 and not group_year_gaps:
+                folders.append(current)
+                current = [curr]
+            else:
+                current.append(curr)
+        folders.append(current)
+        for folder_files in folders:
+            earliest = min(folder_files, key=lambda x: x['date'])['date']
+            if len(group) >= threshold:
+                target = Path(f"{(earliest.year // 10) * 10}s", str(earliest.year), suffix)
+            else:
+                target = month_folder(earliest)
+            for info in folder_files:
+                destinations[info['path']] = target
+    for group in no_suffix_groups.values():
+        for info in group:
+            destinations[info['path']] = month_folder(info['date'])
+    return destinations
+
+
+def random_names(rng, count):
+    events = ['trip', 'beach_party', 'party_2019', 'wedding', '2019', 'xmas']
+    for i in range(count):
+        taken = datetime(1995, 1, 1) + (datetime(2025, 1, 1) - datetime(1995, 1, 1)) * rng.random()
+        date = f"{taken:%Y%m%d}" if rng.random() < 0.8 else f"{taken:%y%m%d}"
+        event = f"_{rng.choice(events)}" if rng.random() < 0.4 else ''
+        if rng.random() < 0.02:
+            event = f"_visit{rng.randint(1, 20)}"  # Events too small for a folder of their own
+        index = f"_{rng.randint(1, 5)}" if rng.random() < 0.2 else ''
+        yield Path('/photos', f"{date}_{taken:%H%M%S}{event}{index}_{i}.jpg")
+
+
+@pytest.mark.parametrize('group_year_gaps', [False, True])
+def test_planner_matches_previous_layout(group_year_gaps):
+    paths = list(random_names(random.Random(0), 3000))
+    layout = plan_restructure([restructure_info(path) for path in paths], group_year_gaps)
+    planned = {src: folder for folder, sources in layout.items() for src in sources}
+    assert len(planned) == len(paths)
+    assert planned == old_layout(paths, group_year_gaps)
+
+
+def test_prune_removes_only_folders_without_media(tmp_path):
+    files = ['2010s/2015/1. January/a.jpg', '2010s/2015/Trip/notes.txt', '2010s/2015/Trip/@eaDir/a.jpg',
+             '2010s/2016/Hidden/.b.mp4', '2010s/2016/Deep/x/y/z.cr2', '2010s/2016/Deep/empty/README',
+             '2000s/2001/1. January/Thumbs.db', 'notes.txt']
+    for name in files:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(name)
+    (tmp_path / '2000s' / '2002' / 'Empty').mkdir(parents=True)
+
+    pruned = prune_empty_folders(tmp_path)
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in pruned) == [
+        '2000s', '2010s/2015/Trip', '2010s/2016/Deep/empty']
+    media = {name for name in files if Path(name).suffix in ('.jpg', '.mp4', '.cr2') and '@eaDir' not in name}
+    for folder in pruned:
+        shutil.rmtree(folder)
+    assert media <= {p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob('*') if p.is_file()}
+    assert prune_empty_folders(tmp_path) == []
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pyexiv2
+from PIL import Image
+
+from run.capture_date import resolve_capture_date
+from run.sidecar import sidecar_capture_date, sidecar_path, to_xmp, with_sidecars, write_sidecar
+
+
+def jpeg_with_exif_date(path, value):
+    Image.new('RGB', (8, 8)).save(path)
+    with pyexiv2.Image(str(path)) as img:
+        img.modify_exif({'Exif.Photo.DateTimeOriginal': value})
+    return path
+
+
+def test_embedded_date_without_sidecar(tmp_path):
+    photo = jpeg_with_exif_date(tmp_path / 'IMG_0001.jpg', '2010:05:06 07:08:09')
+    assert resolve_capture_date(photo) == (datetime(2010, 5, 6, 7, 8, 9), 'exif')
+
+
+def test_sidecar_date_takes_precedence_over_exif(tmp_path):
+    photo = jpeg_with_exif_date(tmp_path / 'IMG_0001.jpg', '2010:05:06 07:08:09')
+    write_sidecar(photo, {'Xmp.exif.DateTimeOriginal': '2001-02-03T04:05:06+02:00'})
+    assert resolve_capture_date(photo) == (datetime(2001, 2, 3, 4, 5, 6), 'xmp')
+
+
+def test_sidecar_falls_back_to_later_date_properties(tmp_path):
+    photo = jpeg_with_exif_date(tmp_path / 'IMG_0001.jpg', '2010:05:06 07:08:09')
+    write_sidecar(photo, {'Xmp.photoshop.DateCreated': '2001-02-03T04:05:06'})
+    assert sidecar_capture_date(photo) == datetime(2001, 2, 3, 4, 5, 6)
+    assert resolve_capture_date(photo) == (datetime(2001, 2, 3, 4, 5, 6), 'xmp')
+
+    write_sidecar(photo, {'Xmp.exif.DateTimeOriginal': '1999-12-31T23:59:59'})
+    assert sidecar_capture_date(photo) == datetime(1999, 12, 31, 23, 59, 59)
+
+
+def test_to_xmp_folds_date_parts_and_gps():
+    changes, failures = to_xmp({
+        'Exif.Photo.DateTimeOriginal': '2001:02:03 04:05:06',
+        'Exif.Photo.SubSecTimeOriginal': '25',
+        'Exif.Photo.OffsetTimeOriginal': '+02:00',
+        'Exif.GPSInfo.GPSLatitude': '51/1 30/1 0/1',
+        'Exif.GPSInfo.GPSLatitudeRef': 'N',
+        'Exif.Image.Make': 'Canon',
+    }, {'Iptc.Application2.Keywords': ['a', 'b']})
+    assert changes['Xmp.exif.DateTimeOriginal'] == '2001-02-03T04:05:06.25+02:00'
+    assert changes['Xmp.exif.GPSLatitude'] == '51,30N'
+    assert changes['Xmp.tiff.Make'] == 'Canon'
+    assert changes['Xmp.dc.subject'] == ['a', 'b']
+    assert failures == []
+
+
+def test_renames_carry_sidecars_once(tmp_path):
+    raw, jpeg = tmp_path / 'IMG_1.cr2', tmp_path / 'IMG_1.jpg'
+    raw.touch(); jpeg.touch(); sidecar_path(raw).touch()
+    pairs = [(raw, tmp_path / 'a.cr2'), (jpeg, tmp_path / 'a_2.jpg')]
+    assert with_sidecars(pairs) == pairs + [(tmp_path / 'IMG_1.xmp', tmp_path / 'a.xmp')]
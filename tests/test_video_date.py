@@ -0,0 +1,67 @@
+import struct
+from datetime import datetime
+
+from run.video_date import read_bmff_creation_date
+
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def large_box(box_type, payload=b''):
+    # 64-bit largesize header
+    return struct.pack('>I4sQ', 1, box_type, 16 + len(payload)) + payload
+
+
+def mvhd(seconds, version=0):
+    if version == 1:
+        times = struct.pack('>QQIQ', seconds, seconds, 1000, 0)
+    else:
+        times = struct.pack('>IIII', seconds, seconds, 1000, 0)
+    return box(b'mvhd', bytes([version, 0, 0, 0]) + times + bytes(80))
+
+
+FTYP = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+# 2021-05-06 07:08:09 UTC in seconds since 1904
+SECONDS = int((datetime(2021, 5, 6, 7, 8, 9) - datetime(1904, 1, 1)).total_seconds())
+
+
+def video(tmp_path, *boxes, name='clip.mp4'):
+    path = tmp_path / name
+    path.write_bytes(b''.join(boxes))
+    return path
+
+
+def test_mvhd_version_0_after_a_large_mdat(tmp_path):
+    path = video(tmp_path, FTYP, large_box(b'mdat', bytes(1000)), box(b'moov', mvhd(SECONDS)))
+    assert read_bmff_creation_date(path) == datetime(2021, 5, 6, 7, 8, 9)
+
+
+def test_mvhd_version_1_before_an_open_ended_mdat(tmp_path):
+    # A size of 0 means the box runs to the end of the file
+    path = video(tmp_path, FTYP, box(b'moov', mvhd(SECONDS, version=1)), struct.pack('>I4s', 0, b'mdat') + bytes(100),
+                 name='clip.MOV')
+    assert read_bmff_creation_date(path) == datetime(2021, 5, 6, 7, 8, 9)
+
+
+def test_quicktime_day_tag_when_mvhd_is_zero(tmp_path):
+    text = b'2021-05-06T08:08:09+0100'
+    day = box(b'\xa9day', struct.pack('>HH', len(text), 0x55c4) + text)
+    path = video(tmp_path, FTYP, box(b'moov', mvhd(0) + box(b'udta', day)), box(b'mdat'))
+    assert read_bmff_creation_date(path) == datetime(2021, 5, 6, 7, 8, 9)
+
+
+def test_itunes_day_tag_when_mvhd_is_zero(tmp_path):
+    data = box(b'data', struct.pack('>II', 1, 0) + b'2021-05-06T07:08:09Z')
+    meta = box(b'meta', bytes(4) + box(b'hdlr', bytes(25)) + box(b'ilst', box(b'\xa9day', data)))
+    path = video(tmp_path, FTYP, box(b'moov', mvhd(0) + box(b'udta', meta)))
+    assert read_bmff_creation_date(path) == datetime(2021, 5, 6, 7, 8, 9)
+
+
+def test_unusable_files_give_none(tmp_path):
+    whole = FTYP + box(b'moov', mvhd(SECONDS))
+    assert read_bmff_creation_date(video(tmp_path, whole[:len(FTYP) + 20], name='truncated.mp4')) is None
+    assert read_bmff_creation_date(video(tmp_path, FTYP, box(b'mdat', bytes(10)), name='no_moov.mp4')) is None
+    assert read_bmff_creation_date(video(tmp_path, FTYP, box(b'moov', mvhd(0)), name='no_date.mp4')) is None
+    assert read_bmff_creation_date(video(tmp_path, b'\x00\x00\x00\x04junk', name='bad_size.mp4')) is None
+    assert read_bmff_creation_date(video(tmp_path, whole, name='clip.avi')) is None
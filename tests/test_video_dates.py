@@ -0,0 +1,42 @@
+import os
+from datetime import datetime
+
+from run import catalog
+from run.videos import resolve_video_date
+
+
+def test_fallback_video_dates_keep_their_source(tmp_path):
+    named = tmp_path / 'clip_20200102_030405.avi'
+    unnamed = tmp_path / 'clip.avi'
+    for path in (named, unnamed):
+        path.write_bytes(b'not a video')
+    os.utime(unnamed, (1_000_000_000, 1_000_000_000))
+    assert resolve_video_date(named) == (datetime(2020, 1, 2, 3, 4, 5), 'filename')
+    assert resolve_video_date(unnamed) == (datetime.fromtimestamp(1_000_000_000), 'mtime')
+
+    conn = catalog.open_catalog(tmp_path / 'catalog.sqlite3')
+    assert catalog.videos_created(conn, [named, unnamed], resolve_video_date, workers=1) == [
+        datetime(2020, 1, 2, 3, 4, 5), datetime.fromtimestamp(1_000_000_000)]
+    sources = dict(conn.execute('SELECT path, video_source FROM files'))
+    assert sources == {catalog.catalog_key(named): 'filename', catalog.catalog_key(unnamed): 'mtime'}
+    # Cached rows give the same dates back
+    assert catalog.video_created(conn, named, lambda path: None) == datetime(2020, 1, 2, 3, 4, 5)
+
+
+def test_video_dates_stay_apart_from_capture_dates(tmp_path):
+    clip = tmp_path / 'clip.avi'
+    clip.write_bytes(b'not a video')
+    os.utime(clip, (1_000_000_000, 1_000_000_000))
+    conn = catalog.open_catalog(tmp_path / 'catalog.sqlite3')
+    assert catalog.video_created(conn, clip, lambda path: (datetime(2020, 1, 2, 3, 4, 5), 'video'))
+    # resolve_capture_date's answer is unaffected by the video date cached before it
+    assert catalog.capture_date(conn, clip) == (datetime.fromtimestamp(1_000_000_000), 'mtime')
+    assert catalog.video_created(conn, clip, lambda path: None) == datetime(2020, 1, 2, 3, 4, 5)
+    day = datetime.fromtimestamp(1_000_000_000).strftime('%Y%m%d')
+    assert catalog.query(conn, start=day, end=day) == [clip]
+
+    # A video only ever read for its creation time is found by that
+    other = tmp_path / 'other.avi'
+    other.write_bytes(b'not a video either')
+    catalog.video_created(conn, other, lambda path: (datetime(2020, 1, 2, 3, 4, 5), 'video'))
+    assert catalog.query(conn, start='20200102', end='20200102') == [other]